@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-2021 Greenbone Networks GmbH
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+""" Collector for the results of all running scans. """
+
+import logging
+import time
+
+from threading import Event, Thread
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from ospd_openvas.db import (
+    LIST_FIRST_POS,
+    LIST_LAST_POS,
+    MainDB,
+    OpenvasDB,
+    RedisCtx,
+)
+
+logger = logging.getLogger(__name__)
+
+# Max number of seconds between two collection cycles
+COLLECTOR_INTERVAL = 1
+
+# Max number of results taken from each kb in a collection cycle
+COLLECTOR_CHUNK_SIZE = 1000
+
+# Max number of seconds to wait for the end of a collection cycle
+COLLECTOR_WAIT_TIMEOUT = 10
+
+ResultDispatcher = Callable[[str, List[str]], None]
+
+
+class ResultCollector(Thread):
+    """Thread collecting the results of all the running scans.
+
+    The kbs of the running scans are taken from the scan id registry of the
+    main db. In each cycle, the oldest results of every kb are removed in a
+    single redis transaction over a dedicated connection, which selects each
+    kb in turn. The results are passed to the dispatcher together with the
+    scan id stored in the kb, so a kb reused by another scan in the meantime
+    can't mix up the results. Registry entries of kbs which don't belong to
+    the registered scan anymore are removed.
+
+    Each finished cycle is counted in the main db. Before releasing its kb,
+    a scan removes the kb from the registry and waits for the end of the
+    current cycle, so no collected result of the kb is still pending.
+    """
+
+    def __init__(
+        self,
+        main_db: MainDB,
+        dispatcher: ResultDispatcher,
+        *,
+        interval: Optional[int] = COLLECTOR_INTERVAL,
+        count: Optional[int] = COLLECTOR_CHUNK_SIZE,
+    ):
+        super().__init__(name='ResultCollector', daemon=True)
+
+        self.main_db = main_db
+        self.dispatcher = dispatcher
+        self.interval = interval
+        self.count = count
+
+        self._ctx = None
+        self._stop_event = Event()
+
+    @property
+    def ctx(self) -> RedisCtx:
+        if self._ctx is None:
+            self._ctx = OpenvasDB.create_context(
+                MainDB.DEFAULT_INDEX, shared=False
+            )
+        return self._ctx
+
+    def _pop_results(
+        self, kbindexes: List[int]
+    ) -> Iterator[Tuple[Optional[str], List[str]]]:
+        """Remove the oldest results of each kb and get the scan id stored
+        in it, all within a single transaction."""
+        pipe = self.ctx.pipeline()
+        for kbindex in kbindexes:
+            pipe.execute_command('SELECT', kbindex)
+            pipe.lindex('internal/scanid', LIST_FIRST_POS)
+            pipe.lrange('internal/results', -self.count, LIST_LAST_POS)
+            pipe.ltrim('internal/results', LIST_FIRST_POS, -self.count - 1)
+
+        replies = pipe.execute()
+
+        for i in range(0, len(replies), 4):
+            _, scan_id, results, _ = replies[i : i + 4]
+            if results:
+                # The results are left-pushed. To preserve the order
+                # the result list must be reversed.
+                results.reverse()
+            yield (scan_id, results or [])
+
+    def collect(self) -> int:
+        """Run a single collection cycle.
+
+        Return the number of collected results.
+        """
+        scans: Dict[str, int] = self.main_db.get_scan_id_index()
+        if not scans:
+            return 0
+
+        collected = 0
+        for registered_scan_id, (scan_id, results) in zip(
+            scans, self._pop_results(list(scans.values()))
+        ):
+            if scan_id != registered_scan_id:
+                # The kb was released or is used by another scan now
+                self.main_db.remove_scan_id_index(registered_scan_id)
+
+            if not results:
+                continue
+
+            if not scan_id:
+                logger.debug(
+                    'Discarding %d results of a kb without scan.', len(results)
+                )
+                continue
+
+            collected += len(results)
+            try:
+                self.dispatcher(scan_id, results)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception(
+                    'Not possible to report the results of scan %s.', scan_id
+                )
+
+        return collected
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                try:
+                    collected = self.collect()
+                finally:
+                    self.main_db.increase_collector_cycle()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Error while collecting scan results.')
+                collected = 0
+
+            # Start the next cycle right away if the chunk of any kb was
+            # full, as there are more results waiting.
+            if collected < self.count:
+                self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+    @staticmethod
+    def wait_for_cycle(
+        main_db: MainDB, timeout: Optional[int] = COLLECTOR_WAIT_TIMEOUT
+    ) -> bool:
+        """Wait for the end of the current collection cycle. It is called
+        from the scan processes after removing their kb from the registry,
+        so the kb isn't part of the following cycles anymore.
+
+        Return False if no cycle ended within the timeout.
+        """
+        cycle = main_db.get_collector_cycle()
+        deadline = time.monotonic() + timeout
+
+        while main_db.get_collector_cycle() == cycle:
+            if time.monotonic() >= deadline:
+                logger.warning(
+                    'The result collector did not finish a cycle within '
+                    '%s seconds.',
+                    timeout,
+                )
+                return False
+            time.sleep(0.1)
+
+        return True
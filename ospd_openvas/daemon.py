@@ -22,14 +22,16 @@
 """ Setup for the OSP OpenVAS Server. """
 
 import logging
+import signal
 import time
-import copy
 
+from bisect import bisect_left, bisect_right
 from typing import Optional, Dict, List, Tuple, Iterator
 from datetime import datetime
 
 from pathlib import Path
-from os import geteuid
+from os import cpu_count, geteuid
+from xml.etree.ElementTree import Element as XmlElement, fromstring
 from lxml.etree import tostring, SubElement, Element
 
 import psutil
@@ -38,19 +40,24 @@ from ospd.ospd import OSPDaemon
 from ospd.scan import ScanProgress
 from ospd.server import BaseServer
 from ospd.main import main as daemon_main
-from ospd.cvss import CVSS
+from ospd.parser import create_parser
 from ospd.vtfilter import VtsFilter
 from ospd.resultlist import ResultList
+from ospd.xml import XmlStringHelper
 
 from ospd_openvas import __version__
 from ospd_openvas.errors import OspdOpenvasError
 
+from ospd_openvas.collector import ResultCollector
 from ospd_openvas.nvticache import NVTICache
 from ospd_openvas.db import MainDB, BaseDB
 from ospd_openvas.lock import LockFile
 from ospd_openvas.preferencehandler import PreferenceHandler
+from ospd_openvas.resultparser import OpenvasResult, parse_results
+from ospd_openvas.snapshot import VtSnapshot
 from ospd_openvas.openvas import Openvas
-from ospd_openvas.vthelper import VtHelper
+from ospd_openvas.vthelper import VtHelper, VtCache, get_severity_score
+from ospd_openvas.vtstore import VtStore
 from ospd_openvas.notus.metadata import NotusMetadataHandler
 
 logger = logging.getLogger(__name__)
@@ -375,6 +382,25 @@ OSPD_PARAMS = {
 
 VT_BASE_OID = "1.3.6.1.4.1.25623."
 
+# Max number of seconds to block while waiting for new scan results
+RESULTS_WAIT_TIMEOUT = 1
+
+# Max number of results taken from the kb and processed at once
+RESULTS_CHUNK_SIZE = 1000
+
+# Max number of result chunks processed between two checks of the scan
+# status, so that a flood of results doesn't delay stopping the scan.
+RESULTS_MAX_CHUNKS = 2
+
+# Number of processes parsing the Notus metadata files in parallel
+NOTUS_WORKERS = min(4, cpu_count() or 1)
+
+# VT tags holding the value of each element which can be used in a VT filter
+VT_FILTER_TAGS = {
+    'creation_time': 'creation_date',
+    'modification_time': 'last_modification',
+}
+
 
 def safe_int(value: str) -> Optional[int]:
     """Convert a string into an integer and return None in case of errors
@@ -395,6 +421,9 @@ class OpenVasVtsFilter(VtsFilter):
 
         self.nvti = nvticache
 
+        self._oids = None
+        self._indexes = None
+
     def format_vt_modification_time(self, value: str) -> str:
         """Convert the string seconds since epoch into a 19 character
         string representing YearMonthDayHourMinuteSecond,
@@ -403,6 +432,85 @@ class OpenVasVtsFilter(VtsFilter):
 
         return datetime.utcfromtimestamp(int(value)).strftime("%Y%m%d%H%M%S")
 
+    def load_index(self):
+        """Build a sorted index of the formatted values of each filter
+        element for all VTs. It must be rebuilt every time the feed is
+        loaded into the cache. The Notus drivers are not part of the index.
+        """
+        drivers = VtHelper(self.nvti).get_notus_driver_oids()
+        oids = [
+            vtlist[1]
+            for vtlist in self.nvti.get_oids()
+            if vtlist[1] not in drivers
+        ]
+
+        elements_values = {element: list() for element in VT_FILTER_TAGS}
+        for vt_oid, tags in self.nvti.get_nvt_tags_many(oids):
+            if not tags:
+                continue
+
+            for element, tag in VT_FILTER_TAGS.items():
+                elem_val = tags.get(tag)
+                if not elem_val:
+                    continue
+
+                try:
+                    val = self.format_filter_value(element, elem_val)
+                except (ValueError, OverflowError):
+                    logger.debug(
+                        'Invalid %s value %s of VT %s. It is not indexed.',
+                        element,
+                        elem_val,
+                        vt_oid,
+                    )
+                    continue
+
+                elements_values[element].append((val, vt_oid))
+
+        indexes = dict()
+        for element, values in elements_values.items():
+            values.sort()
+            indexes[element] = (
+                [val for val, _ in values],
+                [vt_oid for _, vt_oid in values],
+            )
+
+        self._oids = oids
+        self._indexes = indexes
+
+    def get_index(self) -> Optional[Dict]:
+        """Get the index of the filter elements, to be stored in a
+        snapshot. Return None if the index was not built yet."""
+        if self._indexes is None:
+            return None
+
+        return {'oids': self._oids, 'indexes': self._indexes}
+
+    def set_index(self, index: Dict):
+        """Set an index of the filter elements returned by get_index(),
+        e.g. loaded from a snapshot."""
+        self._oids = index['oids']
+        self._indexes = {
+            element: (values, oids)
+            for element, (values, oids) in index['indexes'].items()
+        }
+
+    def _get_matching_oids(
+        self, element: str, oper: str, filter_val: str
+    ) -> List[str]:
+        """Get the OIDs of the VTs matching a single filter from the
+        sorted index of the filter element."""
+        values, oids = self._indexes[element]
+
+        if oper == '<':
+            return oids[: bisect_left(values, filter_val)]
+        if oper == '>':
+            return oids[bisect_right(values, filter_val) :]
+
+        return oids[
+            bisect_left(values, filter_val) : bisect_right(values, filter_val)
+        ]
+
     def get_filtered_vts_list(self, vts, vt_filter: str) -> Optional[List[str]]:
         """Gets a collection of vulnerability test from the redis cache,
         which match the filter.
@@ -422,29 +530,18 @@ class OpenVasVtsFilter(VtsFilter):
         if not self.nvti:
             return None
 
-        vt_oid_list = [vtlist[1] for vtlist in self.nvti.get_oids()]
-        vt_oid_list_temp = copy.copy(vt_oid_list)
-        vthelper = VtHelper(self.nvti)
+        if self._indexes is None:
+            self.load_index()
 
+        matching_oids = None
         for element, oper, filter_val in filters:
-            for vt_oid in vt_oid_list_temp:
-                if vt_oid not in vt_oid_list:
-                    continue
-
-                vt = vthelper.get_single_vt(vt_oid)
-                if vt is None or not vt.get(element):
-                    vt_oid_list.remove(vt_oid)
-                    continue
-
-                elem_val = vt.get(element)
-                val = self.format_filter_value(element, elem_val)
-
-                if self.filter_operator[oper](val, filter_val):
-                    continue
-                else:
-                    vt_oid_list.remove(vt_oid)
+            oids = set(self._get_matching_oids(element, oper, filter_val))
+            if matching_oids is None:
+                matching_oids = oids
+            else:
+                matching_oids &= oids
 
-        return vt_oid_list
+        return [vt_oid for vt_oid in self._oids if vt_oid in matching_oids]
 
 
 class OSPDopenvas(OSPDaemon):
@@ -452,11 +549,28 @@ class OSPDopenvas(OSPDaemon):
     """ Class for ospd-openvas daemon. """
 
     def __init__(
-        self, *, niceness=None, lock_file_dir='/var/run/ospd', **kwargs
+        self,
+        *,
+        niceness=None,
+        lock_file_dir='/var/run/ospd',
+        result_collector=False,
+        vt_store=False,
+        **kwargs,
     ):
         """ Initializes the ospd-openvas daemon's internal data. """
         self.main_db = MainDB()
         self.nvti = NVTICache(self.main_db)
+        # VT data used to report results. It is filled by each scan
+        # process, so it only lives as long as the scan.
+        self.vt_cache = VtCache()
+        self.vts_hash_data = dict()
+
+        self.result_collector = None
+        if result_collector:
+            self.result_collector = ResultCollector(
+                self.main_db, self._report_collected_results
+            )
+            self.collector_vt_cache = VtCache()
 
         super().__init__(
             customvtfilter=OpenVasVtsFilter(self.nvti),
@@ -470,6 +584,15 @@ class OSPDopenvas(OSPDaemon):
         self._niceness = str(niceness)
 
         self.feed_lock = LockFile(Path(lock_file_dir) / 'feed-update.lock')
+        self.vt_snapshot = VtSnapshot(Path(lock_file_dir) / 'vts-snapshot.json')
+
+        self.vt_store_path = None
+        self.vt_xml_store_path = None
+        if vt_store:
+            self.vt_store_path = Path(lock_file_dir) / 'vts.store'
+            self.vt_xml_store_path = Path(lock_file_dir) / 'vts-xml.store'
+        self.vt_xml_store = None
+
         self.daemon_info['name'] = 'OSPd OpenVAS'
         self.scanner_info['name'] = 'openvas'
         self.scanner_info['version'] = ''  # achieved during self.init()
@@ -483,29 +606,183 @@ class OSPDopenvas(OSPDaemon):
 
         self.scan_only_params = dict()
 
+        # Handlers adding each type of result message to a result list
+        self._result_handlers = {
+            'ERRMSG': self._add_result_error,
+            'HOST_START': self._add_result_host_start_end,
+            'HOST_END': self._add_result_host_start_end,
+            'LOG': self._add_result_log,
+            'HOST_DETAIL': self._add_result_host_detail,
+            'ALARM': self._add_result_alarm,
+        }
+
     def init(self, server: BaseServer) -> None:
 
         self.scan_collection.init()
 
         server.start(self.handle_client_stream)
 
+        if self.result_collector:
+            self.result_collector.start()
+
         self.scanner_info['version'] = Openvas.get_version()
 
         self.set_params_from_openvas_settings()
 
         with self.feed_lock.wait_for_lock():
-            Openvas.load_vts_into_redis()
-            notushandler = NotusMetadataHandler(nvti=self.nvti)
-            notushandler.update_metadata()
-            current_feed = self.nvti.get_feed_version()
-            self.set_vts_version(vts_version=current_feed)
-
-            logger.debug("Calculating vts integrity check hash...")
-            vthelper = VtHelper(self.nvti)
-            self.vts.sha256_hash = vthelper.calculate_vts_collection_hash()
+            if not self._load_vts_snapshot():
+                # The settings have just been parsed
+                self.load_vts(reload_settings=False)
 
         self.initialized = True
 
+    def load_vts(self, reload_settings: bool = True):
+        """Load the VTs of the feed into redis and build all the data
+        derived from them. The data is stored in a snapshot afterwards.
+
+        Arguments:
+            reload_settings: Whether to parse the settings of the openvas
+                executable again, since a feed update may come with new
+                settings.
+        """
+        # The VTs in the store are outdated from now on
+        self.nvti.set_vt_store(None)
+
+        Openvas.load_vts_into_redis()
+        if reload_settings:
+            Openvas.reload_settings()
+
+        notushandler = NotusMetadataHandler(
+            nvti=self.nvti, workers=NOTUS_WORKERS
+        )
+        notushandler.update_metadata()
+        self.nvti.load_family_index()
+        self.vts_filter.load_index()
+        current_feed = self.nvti.get_feed_version()
+        self.set_vts_version(vts_version=current_feed)
+
+        logger.debug("Calculating vts integrity check hash...")
+        vthelper = VtHelper(self.nvti)
+        self.vts.sha256_hash = vthelper.calculate_vts_collection_hash(
+            self.vts_hash_data
+        )
+
+        self._save_vts_snapshot(current_feed)
+        self._load_vt_store(current_feed)
+        self._load_vt_xml_store(current_feed)
+
+    def _load_vt_store(self, feed_version: str):
+        """Open the memory-mapped VT store of the given feed version, if
+        the VT store is enabled. The store is built from the VTs in redis
+        if there is no store of the feed version yet."""
+        if not self.vt_store_path or not feed_version:
+            return
+
+        vt_store = VtStore.open(self.vt_store_path)
+        if vt_store and vt_store.feed_version != feed_version:
+            vt_store.close()
+            vt_store = None
+
+        if not vt_store:
+            oids = (oid for _, oid in self.nvti.get_oids())
+            if VtStore.build(
+                self.vt_store_path,
+                feed_version,
+                self.nvti.get_nvt_raw_many(oids),
+            ):
+                vt_store = VtStore.open(self.vt_store_path)
+
+        self.nvti.set_vt_store(vt_store)
+
+    def _load_vt_xml_store(self, feed_version: str):
+        """Open the store with the serialized <vt> element of each VT of
+        the given feed version, if the VT store is enabled. The store is
+        built if there is no store of the feed version yet."""
+        if self.vt_xml_store:
+            self.vt_xml_store.close()
+            self.vt_xml_store = None
+
+        if not self.vt_xml_store_path or not feed_version:
+            return
+
+        vt_xml_store = VtStore.open(self.vt_xml_store_path)
+        if vt_xml_store and vt_xml_store.feed_version != feed_version:
+            vt_xml_store.close()
+            vt_xml_store = None
+
+        if not vt_xml_store:
+            logger.debug("Serializing the VTs...")
+            xml_helper = XmlStringHelper()
+            records = (
+                (vt[0], xml_helper.add_element(self.get_vt_xml(vt)))
+                for vt in self.get_vt_iterator()
+            )
+            if VtStore.build_records(
+                self.vt_xml_store_path, feed_version, records
+            ):
+                vt_xml_store = VtStore.open(self.vt_xml_store_path)
+
+        self.vt_xml_store = vt_xml_store
+
+    def _save_vts_snapshot(self, feed_version: str):
+        """Store the data derived from the VTs of the given feed version
+        in the snapshot."""
+        self.vt_snapshot.save(
+            feed_version,
+            {
+                'vts_hash': self.vts.sha256_hash,
+                'vts_hash_data': {
+                    vt_id: [timestamp, data.decode('utf-8')]
+                    for vt_id, (timestamp, data) in self.vts_hash_data.items()
+                },
+                'family_index': self.nvti.get_family_index(),
+                'filter_index': self.vts_filter.get_index(),
+            },
+        )
+
+    def _load_vts_snapshot(self) -> bool:
+        """Load the data derived from the VTs from the snapshot, instead of
+        loading the VTs again. It is only possible if the VTs in redis are
+        up to date with the feed on disk and the snapshot belongs to the
+        same feed version.
+
+        Return True if the snapshot was loaded.
+        """
+        current_feed = self.nvti.get_feed_version()
+        if not current_feed or self.feed_is_outdated(current_feed) is not False:
+            return False
+
+        snapshot = self.vt_snapshot.load(current_feed)
+        if not snapshot:
+            return False
+
+        try:
+            vts_hash_data = {
+                vt_id: (timestamp, data.encode('utf-8'))
+                for vt_id, (timestamp, data) in snapshot[
+                    'vts_hash_data'
+                ].items()
+            }
+            vts_hash = snapshot['vts_hash']
+            family_index = snapshot['family_index']
+            filter_index = snapshot['filter_index']
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            logger.warning('Invalid VTs snapshot. %s', e)
+            return False
+
+        self.nvti.set_family_index(family_index)
+        if filter_index:
+            self.vts_filter.set_index(filter_index)
+        self.vts_hash_data = vts_hash_data
+        self.vts.sha256_hash = vts_hash
+        self.set_vts_version(vts_version=current_feed)
+        self._load_vt_store(current_feed)
+        self._load_vt_xml_store(current_feed)
+
+        logger.debug('Loaded VTs snapshot of feed version %s', current_feed)
+
+        return True
+
     def set_params_from_openvas_settings(self):
         """Set OSPD_PARAMS with the params taken from the openvas executable."""
         param_list = Openvas.get_settings()
@@ -578,16 +855,7 @@ class OSPDopenvas(OSPDaemon):
             with self.feed_lock as fl:
                 if fl.has_lock():
                     self.initialized = False
-                    Openvas.load_vts_into_redis()
-                    notushandler = NotusMetadataHandler(nvti=self.nvti)
-                    notushandler.update_metadata()
-                    current_feed = self.nvti.get_feed_version()
-                    self.set_vts_version(vts_version=current_feed)
-
-                    vthelper = VtHelper(self.nvti)
-                    self.vts.sha256_hash = (
-                        vthelper.calculate_vts_collection_hash()
-                    )
+                    self.load_vts()
                     self.initialized = True
                 else:
                     logger.debug(
@@ -604,8 +872,54 @@ class OSPDopenvas(OSPDaemon):
     def get_vt_iterator(
         self, vt_selection: List[str] = None, details: bool = True
     ) -> Iterator[Tuple[str, Dict]]:
+        """Yield the VTs of the selection, all VTs if it is empty.
+
+        The VTs with details found in the VT XML store of the feed version
+        are yielded with their serialized <vt> element instead of their
+        metadata. get_vt_xml takes it as is.
+        """
         vthelper = VtHelper(self.nvti)
-        return vthelper.get_vt_iterator(vt_selection, details)
+
+        vt_xml_store = self.vt_xml_store if details else None
+        if not vt_xml_store or (
+            vt_xml_store.feed_version != self.get_vts_version()
+        ):
+            return vthelper.get_vt_iterator(vt_selection, details)
+
+        return self._get_vt_iterator_from_xml_store(
+            vthelper, vt_xml_store, vt_selection
+        )
+
+    def _get_vt_iterator_from_xml_store(
+        self,
+        vthelper: VtHelper,
+        vt_xml_store: VtStore,
+        vt_selection: Optional[List[str]],
+    ) -> Iterator[Tuple[str, Dict]]:
+        if vt_selection:
+            vt_selection = list(vt_selection)
+        else:
+            vt_selection = [oid for _, oid in self.nvti.get_oids()]
+
+        # Only the VTs missing in the store are fetched from redis, e.g.
+        # the Notus drivers, which are skipped by the VT helper.
+        missing = [vt_id for vt_id in vt_selection if vt_id not in vt_xml_store]
+        from_redis = (
+            dict(vthelper.get_vt_iterator(missing, True)) if missing else {}
+        )
+
+        for vt_id in vt_selection:
+            vt_xml = vt_xml_store.get_record(vt_id)
+            if vt_xml is not None:
+                yield (vt_id, vt_xml)
+            elif vt_id in from_redis:
+                yield (vt_id, from_redis[vt_id])
+
+    def get_vt_xml(self, single_vt: Tuple[str, Dict]) -> XmlElement:
+        if single_vt and isinstance(single_vt[1], bytes):
+            return fromstring(single_vt[1])
+
+        return super().get_vt_xml(single_vt)
 
     @staticmethod
     def get_custom_vt_as_xml_str(vt_id: str, custom: Dict) -> str:
@@ -975,7 +1289,10 @@ class OSPDopenvas(OSPDaemon):
             kbdb: KB context where to get the status from.
             scan_id: Scan ID to identify the current scan.
         """
-        all_status = kbdb.get_scan_status()
+        self._report_openvas_scan_status(scan_id, kbdb.get_scan_status())
+
+    def _report_openvas_scan_status(self, scan_id: str, all_status: List[str]):
+        """ Update the host progress of a scan from the status entries. """
         all_hosts = dict()
         finished_hosts = list()
         for res in all_status:
@@ -1012,67 +1329,99 @@ class OSPDopenvas(OSPDaemon):
             vt_aux: VT element from which to get the severity vector
         Returns:
             The calculated cvss base value. None if there is no severity
-            vector or severity type is not cvss base version 2.
+            vector or severity type is not cvss base version 2 or 3.
         """
-        if vt_aux:
-            severity_type = vt_aux['severities'].get('severity_type')
-            severity_vector = vt_aux['severities'].get('severity_base_vector')
+        if not vt_aux:
+            return None
 
-            if severity_type == "cvss_base_v2" and severity_vector:
-                return CVSS.cvss_base_v2_value(severity_vector)
-            elif severity_type == "cvss_base_v3" and severity_vector:
-                return CVSS.cvss_base_v3_value(severity_vector)
+        # Already calculated for the VTs used to report results
+        if 'severity_score' in vt_aux:
+            return vt_aux['severity_score']
 
-        return None
+        return get_severity_score(
+            vt_aux['severities'].get('severity_type'),
+            vt_aux['severities'].get('severity_base_vector'),
+        )
 
-    def report_openvas_results(self, db: BaseDB, scan_id: str) -> bool:
-        """ Get all result entries from redis kb. """
+    def report_openvas_results(
+        self,
+        db: BaseDB,
+        scan_id: str,
+        timeout: Optional[int] = None,
+        max_chunks: Optional[int] = None,
+    ) -> bool:
+        """Get all result entries from redis kb. The results are taken
+        from the kb and added to the scan collection in chunks of
+        RESULTS_CHUNK_SIZE results, to keep the memory usage bounded.
 
-        vthelper = VtHelper(self.nvti)
+        Arguments:
+            db: KB from which to get the results.
+            scan_id: Scan ID.
+            timeout: If given, block up to timeout seconds until a result
+                is available in the kb.
+            max_chunks: If given, take at most max_chunks chunks of
+                results. The remaining results are left in the kb.
+
+        Return True if any result was reported.
+        """
+
+        vthelper = VtHelper(self.nvti, self.vt_cache)
+        feed_version = self.get_vts_version()
+
+        got_results = False
+        chunks = 0
+        while True:
+            results = db.get_result(timeout, count=RESULTS_CHUNK_SIZE)
+            if self._report_openvas_results_chunk(
+                results, scan_id, vthelper, feed_version
+            ):
+                got_results = True
+
+            chunks += 1
+            if len(results) < RESULTS_CHUNK_SIZE or chunks == max_chunks:
+                break
+
+            # Only wait for the first result. The remaining ones are
+            # already in the kb.
+            timeout = None
+
+        return got_results
+
+    def _report_collected_results(self, scan_id: str, results: List[str]):
+        """Add the results collected by the result collector to the scan
+        collection. It runs in the daemon process.
+
+        Arguments:
+            scan_id: Scan ID.
+            results: Results of the scan, the oldest one first.
+        """
+        vthelper = VtHelper(self.nvti, self.collector_vt_cache)
+        self._report_openvas_results_chunk(
+            results, scan_id, vthelper, self.get_vts_version()
+        )
+
+    def _report_openvas_results_chunk(
+        self,
+        results: List[str],
+        scan_id: str,
+        vthelper: VtHelper,
+        feed_version: Optional[str],
+    ) -> bool:
+        """ Process a chunk of results and add them to the scan collection. """
 
-        # Result messages come in the next form, with optional uri field
-        # type ||| host ip ||| hostname ||| port ||| OID ||| value [|||uri]
-        all_results = db.get_result()
         res_list = ResultList()
         total_dead = 0
-        for res in all_results:
-            if not res:
-                continue
-
-            msg = res.split('|||')
-            roid = msg[4].strip()
+        for result in parse_results(results):
             rqod = ''
             rname = ''
-            current_host = msg[1].strip() if msg[1] else ''
-            rhostname = msg[2].strip() if msg[2] else ''
-            host_is_dead = "Host dead" in msg[5] or msg[0] == "DEADHOST"
-            host_deny = "Host access denied" in msg[5]
-            start_end_msg = msg[0] == "HOST_START" or msg[0] == "HOST_END"
-            host_count = msg[0] == "HOSTS_COUNT"
             vt_aux = None
 
-            # URI is optional and msg list length must be checked
-            ruri = ''
-            if len(msg) > 6:
-                ruri = msg[6]
+            if result.is_vt_result():
+                if result.oid:
+                    vt_aux = vthelper.get_result_vt(result.oid, feed_version)
 
-            if (
-                roid
-                and not host_is_dead
-                and not host_deny
-                and not start_end_msg
-                and not host_count
-            ):
-                vt_aux = vthelper.get_single_vt(roid)
-
-            if (
-                not vt_aux
-                and not host_is_dead
-                and not host_deny
-                and not start_end_msg
-                and not host_count
-            ):
-                logger.warning('Invalid VT oid %s for a result', roid)
+                if not vt_aux:
+                    logger.warning('Invalid VT oid %s for a result', result.oid)
 
             if vt_aux:
                 if vt_aux.get('qod_type'):
@@ -1083,73 +1432,24 @@ class OSPDopenvas(OSPDaemon):
 
                 rname = vt_aux.get('name')
 
-            if msg[0] == 'ERRMSG':
-                res_list.add_scan_error_to_list(
-                    host=current_host,
-                    hostname=rhostname,
-                    name=rname,
-                    value=msg[5],
-                    port=msg[3],
-                    test_id=roid,
-                    uri=ruri,
-                )
-
-            elif msg[0] == 'HOST_START' or msg[0] == 'HOST_END':
-                res_list.add_scan_log_to_list(
-                    host=current_host,
-                    name=msg[0],
-                    value=msg[5],
-                )
-
-            elif msg[0] == 'LOG':
-                res_list.add_scan_log_to_list(
-                    host=current_host,
-                    hostname=rhostname,
-                    name=rname,
-                    value=msg[5],
-                    port=msg[3],
-                    qod=rqod,
-                    test_id=roid,
-                    uri=ruri,
-                )
-
-            elif msg[0] == 'HOST_DETAIL':
-                res_list.add_scan_host_detail_to_list(
-                    host=current_host,
-                    hostname=rhostname,
-                    name=rname,
-                    value=msg[5],
-                    uri=ruri,
-                )
-
-            elif msg[0] == 'ALARM':
-                rseverity = self.get_severity_score(vt_aux)
-                res_list.add_scan_alarm_to_list(
-                    host=current_host,
-                    hostname=rhostname,
-                    name=rname,
-                    value=msg[5],
-                    port=msg[3],
-                    test_id=roid,
-                    severity=rseverity,
-                    qod=rqod,
-                    uri=ruri,
-                )
+            add_result = self._result_handlers.get(result.type)
+            if add_result:
+                add_result(res_list, result, rname, rqod, vt_aux)
 
             # To process non-scanned dead hosts when
             # test_alive_host_only in openvas is enable
-            elif msg[0] == 'DEADHOST':
+            elif result.type == 'DEADHOST':
                 try:
-                    total_dead = int(msg[5])
-                except TypeError:
+                    total_dead = int(result.value)
+                except (TypeError, ValueError):
                     logger.debug('Error processing dead host count')
 
             # To update total host count
-            if msg[0] == 'HOSTS_COUNT':
+            elif result.type == 'HOSTS_COUNT':
                 try:
-                    count_total = int(msg[5])
+                    count_total = int(result.value)
                     self.set_scan_total_hosts(scan_id, count_total)
-                except TypeError:
+                except (TypeError, ValueError):
                     logger.debug('Error processing total host count')
 
         # Insert result batch into the scan collection table.
@@ -1163,6 +1463,93 @@ class OSPDopenvas(OSPDaemon):
 
         return len(res_list) > 0
 
+    @staticmethod
+    def _add_result_error(
+        res_list: ResultList,
+        result: OpenvasResult,
+        name: str,
+        _qod: str,
+        _vt_aux: Optional[Dict],
+    ):
+        res_list.add_scan_error_to_list(
+            host=result.host,
+            hostname=result.hostname,
+            name=name,
+            value=result.value,
+            port=result.port,
+            test_id=result.oid,
+            uri=result.uri,
+        )
+
+    @staticmethod
+    def _add_result_host_start_end(
+        res_list: ResultList,
+        result: OpenvasResult,
+        _name: str,
+        _qod: str,
+        _vt_aux: Optional[Dict],
+    ):
+        res_list.add_scan_log_to_list(
+            host=result.host,
+            name=result.type,
+            value=result.value,
+        )
+
+    @staticmethod
+    def _add_result_log(
+        res_list: ResultList,
+        result: OpenvasResult,
+        name: str,
+        qod: str,
+        _vt_aux: Optional[Dict],
+    ):
+        res_list.add_scan_log_to_list(
+            host=result.host,
+            hostname=result.hostname,
+            name=name,
+            value=result.value,
+            port=result.port,
+            qod=qod,
+            test_id=result.oid,
+            uri=result.uri,
+        )
+
+    @staticmethod
+    def _add_result_host_detail(
+        res_list: ResultList,
+        result: OpenvasResult,
+        name: str,
+        _qod: str,
+        _vt_aux: Optional[Dict],
+    ):
+        res_list.add_scan_host_detail_to_list(
+            host=result.host,
+            hostname=result.hostname,
+            name=name,
+            value=result.value,
+            uri=result.uri,
+        )
+
+    def _add_result_alarm(
+        self,
+        res_list: ResultList,
+        result: OpenvasResult,
+        name: str,
+        qod: str,
+        vt_aux: Optional[Dict],
+    ):
+        res_list.add_scan_alarm_to_list(
+            host=result.host,
+            hostname=result.hostname,
+            name=name,
+            value=result.value,
+            port=result.port,
+            test_id=result.oid,
+            severity=self.get_severity_score(vt_aux),
+            qod=qod,
+            uri=result.uri,
+        )
+
     def is_openvas_process_alive(
         self, kbdb: BaseDB, ovas_pid: str, scan_id: str
     ) -> bool:
@@ -1249,6 +1636,7 @@ class OSPDopenvas(OSPDaemon):
             scan_id, kbdb, self.scan_collection, self.nvti
         )
         kbdb.add_scan_id(scan_id)
+        self.main_db.add_scan_id_index(scan_id, kbdb.index)
         scan_prefs.prepare_target_for_openvas()
 
         if not scan_prefs.prepare_ports_for_openvas():
@@ -1286,7 +1674,7 @@ class OSPDopenvas(OSPDaemon):
         del scan_prefs
 
         if do_not_launch or kbdb.scan_is_stopped(scan_id):
-            self.main_db.release_database(kbdb)
+            self.main_db.release_database(kbdb, scan_id=scan_id)
             return
 
         result = Openvas.start_scan(
@@ -1296,7 +1684,7 @@ class OSPDopenvas(OSPDaemon):
         )
 
         if result is None:
-            self.main_db.release_database(kbdb)
+            self.main_db.release_database(kbdb, scan_id=scan_id)
             return
 
         ovas_pid = result.pid
@@ -1317,58 +1705,118 @@ class OSPDopenvas(OSPDaemon):
 
             time.sleep(1)
 
-        got_results = False
+        # The results are reported by the result collector of the daemon
+        # process, if enabled.
+        results_count = 0 if self.result_collector else RESULTS_CHUNK_SIZE
+
         while True:
-            if not kbdb.target_is_finished(
-                scan_id
-            ) and not self.is_openvas_process_alive(kbdb, ovas_pid, scan_id):
-                logger.error(
-                    'Task %s was unexpectedly stopped or killed.',
-                    scan_id,
-                )
-                self.add_scan_error(
-                    scan_id,
-                    name='',
-                    host='',
-                    value='Task was unexpectedly stopped or killed.',
-                )
-                kbdb.stop_scan(scan_id)
-                for scan_db in kbdb.get_scan_databases():
-                    self.main_db.release_database(scan_db)
-                self.main_db.release_database(kbdb)
-                return
+            tick = kbdb.get_scan_tick(scan_id, results_count)
 
-            # Wait a second before trying to get result from redis if there
-            # was no results before.
-            # Otherwise, wait 50 msec to give access other process to redis.
-            if not got_results:
-                time.sleep(1)
-            else:
-                time.sleep(0.05)
-            got_results = False
+            if not tick.finished and not self.is_openvas_process_alive(
+                kbdb, ovas_pid, scan_id
+            ):
+                self._stop_killed_scan(kbdb, scan_id)
+                return
 
             # Check if the client stopped the whole scan
-            if kbdb.scan_is_stopped(scan_id):
+            if tick.stopped:
                 # clean main_db, but wait for scanner to finish.
                 while not kbdb.target_is_finished(scan_id):
                     time.sleep(1)
-                self.main_db.release_database(kbdb)
+                self.main_db.release_database(kbdb, scan_id=scan_id)
                 return
 
-            got_results = self.report_openvas_results(kbdb, scan_id)
-            self.report_openvas_scan_status(kbdb, scan_id)
+            if tick.results:
+                self._report_openvas_results_chunk(
+                    tick.results,
+                    scan_id,
+                    VtHelper(self.nvti, self.vt_cache),
+                    self.get_vts_version(),
+                )
+            if len(tick.results) == RESULTS_CHUNK_SIZE:
+                # Take more results without waiting. All of them once the
+                # scan finished, since the kb is released afterwards.
+                self.report_openvas_results(
+                    kbdb,
+                    scan_id,
+                    max_chunks=None if tick.finished else RESULTS_MAX_CHUNKS,
+                )
+            self._report_openvas_scan_status(scan_id, tick.host_status)
 
             # Scan end. No kb in use for this scan id
-            if kbdb.target_is_finished(scan_id):
+            if tick.finished:
                 break
 
+            if self.result_collector:
+                time.sleep(RESULTS_WAIT_TIMEOUT)
+            elif not tick.results:
+                # Block until openvas pushes new results, so they are
+                # reported as soon as they arrive and idle scans don't poll
+                # redis.
+                self.report_openvas_results(
+                    kbdb,
+                    scan_id,
+                    timeout=RESULTS_WAIT_TIMEOUT,
+                    max_chunks=RESULTS_MAX_CHUNKS,
+                )
+
+        if self.result_collector:
+            self._take_kb_from_collector(kbdb, scan_id)
+
         # Delete keys from KB related to this scan task.
-        self.main_db.release_database(kbdb)
+        self.main_db.release_database(kbdb, scan_id=scan_id)
+
+    def _take_kb_from_collector(self, kbdb: BaseDB, scan_id: str):
+        """Remove the kb of a finished scan from the result collector and
+        report the results which have not been collected yet, before the
+        kb is flushed. The scan process only ends once the results collected
+        from the kb have been reported."""
+        self.main_db.remove_scan_id_index(scan_id)
+        ResultCollector.wait_for_cycle(self.main_db)
+
+        self.report_openvas_results(kbdb, scan_id)
+
+    def _stop_killed_scan(self, kbdb: BaseDB, scan_id: str):
+        """ Report and clean up a scan whose openvas process is gone. """
+        logger.error(
+            'Task %s was unexpectedly stopped or killed.',
+            scan_id,
+        )
+        self.add_scan_error(
+            scan_id,
+            name='',
+            host='',
+            value='Task was unexpectedly stopped or killed.',
+        )
+        kbdb.stop_scan(scan_id)
+        for scan_db in kbdb.get_scan_databases():
+            self.main_db.release_database(scan_db)
+        self.main_db.release_database(kbdb, scan_id=scan_id)
 
 
 def main():
     """ OSP openvas main function. """
-    daemon_main('OSPD - openvas', OSPDopenvas)
+    parser = create_parser('OSPD - openvas')
+    parser.parser.add_argument(
+        '--result-collector',
+        action='store_true',
+        help='Collect the results of all running scans in a single thread '
+        'of the daemon process, instead of polling the kb of each scan '
+        'from its own scan process.',
+    )
+
+    parser.parser.add_argument(
+        '--vt-store',
+        action='store_true',
+        help='Read the VT metadata and the <vt> elements sent by GET_VTS '
+        'from memory-mapped files built per feed version, instead of '
+        'building them from redis.',
+    )
+
+    # Parse the settings of the openvas executable again on SIGHUP
+    signal.signal(signal.SIGHUP, lambda signum, frame: Openvas.clear_settings())
+
+    daemon_main('OSPD - openvas', OSPDopenvas, parser)
 
 
 if __name__ == '__main__':
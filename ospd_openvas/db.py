@@ -22,19 +22,36 @@ import logging
 import sys
 import time
 
-from typing import List, NewType, Optional, Iterable, Iterator, Tuple
+from itertools import islice
+from typing import (
+    Dict,
+    List,
+    NamedTuple,
+    NewType,
+    Optional,
+    Iterable,
+    Iterator,
+    Tuple,
+)
 
 import redis
 
 from ospd.errors import RequiredArgument
 from ospd_openvas.errors import OspdOpenvasError
 from ospd_openvas.openvas import Openvas
+from ospd_openvas.scanregistry import ScanRegistryMixin
 
 SOCKET_TIMEOUT = 60  # in seconds
 LIST_FIRST_POS = 0
 LIST_LAST_POS = -1
 LIST_ALL = 0
 
+# Max number of commands sent to redis in a single pipeline
+PIPELINE_CHUNK_SIZE = 1000
+
+# Number of keys redis walks through in each SCAN call
+SCAN_COUNT = 1000
+
 # Possible positions of nvt values in cache list.
 NVT_META_FIELDS = [
     "NVT_FILENAME_POS",
@@ -69,6 +86,11 @@ class OpenvasDB:
 
     _db_address = None
 
+    # Connection pools shared by all the contexts of the same redis db
+    _connection_pools: Dict[
+        Tuple[Optional[str], int, str], redis.ConnectionPool
+    ] = dict()
+
     @classmethod
     def get_database_address(cls) -> Optional[str]:
         if not cls._db_address:
@@ -80,27 +102,49 @@ class OpenvasDB:
 
     @classmethod
     def create_context(
-        cls, dbnum: Optional[int] = 0, encoding: Optional[str] = 'latin-1'
+        cls,
+        dbnum: Optional[int] = 0,
+        encoding: Optional[str] = 'latin-1',
+        shared: Optional[bool] = True,
     ) -> RedisCtx:
         """Connect to redis to the given database or to the default db 0 .
 
+        The connections are taken from a connection pool per db and
+        encoding, which is shared by all contexts of the process. A new
+        pool is only registered after the connection to redis has been
+        checked successfully.
+
         Arguments:
             dbnum: The db number to connect to.
             encoding: The encoding to be used to read and write.
+            shared: If False, the context gets its own connection pool,
+                e.g. to be able to SELECT another db on its connections.
 
         Return a new redis context on success.
         """
+        db_address = cls.get_database_address()
+        pool_key = (db_address, dbnum, encoding)
+
         tries = 5
         while tries:
             try:
-                ctx = redis.Redis(
-                    unix_socket_path=cls.get_database_address(),
+                pool = cls._connection_pools.get(pool_key) if shared else None
+                if pool:
+                    ctx = redis.Redis(connection_pool=pool)
+                    break
+
+                pool = redis.ConnectionPool(
+                    connection_class=redis.UnixDomainSocketConnection,
+                    path=db_address,
                     db=dbnum,
                     socket_timeout=SOCKET_TIMEOUT,
                     encoding=encoding,
                     decode_responses=True,
                 )
-                ctx.keys("test")
+                ctx = redis.Redis(connection_pool=pool)
+                ctx.ping()
+                if shared:
+                    cls._connection_pools[pool_key] = pool
             except (redis.exceptions.ConnectionError, FileNotFoundError) as err:
                 logger.debug(
                     'Redis connection lost: %s. Trying again in 5 seconds.', err
@@ -127,7 +171,7 @@ class OpenvasDB:
         """
         for i in range(0, max_database_index):
             ctx = cls.create_context(i)
-            if ctx.keys(pattern):
+            if next(cls.iter_keys(ctx, pattern), None) is not None:
                 return (ctx, i)
 
         return (None, None)
@@ -172,6 +216,103 @@ class OpenvasDB:
 
         return ctx.lrange(name, start, end)
 
+    @staticmethod
+    def get_list_items_many(
+        ctx: RedisCtx,
+        names: Iterable[str],
+        start: Optional[int] = LIST_FIRST_POS,
+        end: Optional[int] = LIST_LAST_POS,
+        chunk_size: Optional[int] = PIPELINE_CHUNK_SIZE,
+    ) -> Iterator[List[str]]:
+        """Returns the specified elements from `start` to `end` of each
+        list stored under the given names. The lists are fetched with a
+        single pipeline per chunk of names.
+
+        Arguments:
+            ctx: Redis context to use.
+            names: key names of the lists.
+            start: first range element to get.
+            end: last range element to get.
+            chunk_size: max number of lists fetched per pipeline.
+
+        Return an iterator yielding the specified elements of each list,
+        in the same order as the given names.
+        """
+        if not ctx:
+            raise RequiredArgument('get_list_items_many', 'ctx')
+
+        names = iter(names)
+        while True:
+            chunk = list(islice(names, chunk_size))
+            if not chunk:
+                return
+
+            pipe = ctx.pipeline(transaction=False)
+            for name in chunk:
+                pipe.lrange(name, start, end)
+
+            yield from pipe.execute()
+
+    @staticmethod
+    def get_single_items_many(
+        ctx: RedisCtx,
+        names: Iterable[str],
+        index: Optional[int] = LIST_FIRST_POS,
+        chunk_size: Optional[int] = PIPELINE_CHUNK_SIZE,
+    ) -> Iterator[Optional[str]]:
+        """Get a single element of each list stored under the given names.
+        The elements are fetched with a single pipeline per chunk of names.
+
+        Arguments:
+            ctx: Redis context to use.
+            names: key names of the lists.
+            index: index of the element to get from each list.
+            chunk_size: max number of elements fetched per pipeline.
+
+        Return an iterator yielding the element of each list or None if
+        the name couldn't be found, in the same order as the given names.
+        """
+        if not ctx:
+            raise RequiredArgument('get_single_items_many', 'ctx')
+
+        names = iter(names)
+        while True:
+            chunk = list(islice(names, chunk_size))
+            if not chunk:
+                return
+
+            pipe = ctx.pipeline(transaction=False)
+            for name in chunk:
+                pipe.lindex(name, index)
+
+            yield from pipe.execute()
+
+    @staticmethod
+    def get_list_items_by_index(
+        ctx: RedisCtx, name: str, indexes: Iterable[int]
+    ) -> List[Optional[str]]:
+        """Get the elements at the given indexes of the list stored under
+        the given name. The elements are fetched with a single pipeline.
+
+        Arguments:
+            ctx: Redis context to use.
+            name: key name of the list.
+            indexes: indexes of the elements to get.
+
+        Return a list with the elements or None for each index out of the
+        list, in the same order as the given indexes.
+        """
+        if not ctx:
+            raise RequiredArgument('get_list_items_by_index', 'ctx')
+        if not name:
+            raise RequiredArgument('get_list_items_by_index', 'name')
+
+        pipe = ctx.pipeline(transaction=False)
+        for index in indexes:
+            pipe.lindex(name, index)
+
+        return pipe.execute()
+
     @staticmethod
     def get_last_list_item(ctx: RedisCtx, name: str) -> str:
         if not ctx:
@@ -203,20 +344,102 @@ class OpenvasDB:
         return results
 
     @staticmethod
-    def get_key_count(ctx: RedisCtx, pattern: Optional[str] = None) -> int:
-        """Get the number of keys matching with the pattern.
+    def pop_list_items_chunk(ctx: RedisCtx, name: str, count: int) -> List[str]:
+        """Remove and return the `count` oldest elements of the list stored
+        as `name`. As the elements are left-pushed, the oldest ones are at
+        the end of the list.
+
+        Arguments:
+            ctx: Redis context to use.
+            name: key name of a list.
+            count: Max number of elements to remove.
+
+        Return the removed elements, the oldest one first.
+        """
+        if not ctx:
+            raise RequiredArgument('pop_list_items_chunk', 'ctx')
+        if not name:
+            raise RequiredArgument('pop_list_items_chunk', 'name')
+        if not count or count < 1:
+            raise RequiredArgument('pop_list_items_chunk', 'count')
+
+        pipe = ctx.pipeline()
+        pipe.lrange(name, -count, LIST_LAST_POS)
+        pipe.ltrim(name, LIST_FIRST_POS, -count - 1)
+        results, _ = pipe.execute()
+
+        if not results:
+            return []
+
+        results.reverse()
+
+        return results
+
+    @staticmethod
+    def wait_list_item(ctx: RedisCtx, name: str, timeout: int) -> Optional[str]:
+        """Wait until an element is available in the list stored as `name`
+        and remove it. As the elements are left-pushed, the oldest element
+        of the list is returned.
+
+        Arguments:
+            ctx: Redis context to use.
+            name: key name of a list.
+            timeout: Max number of seconds to wait for an element.
+
+        Return the removed element or None if the timeout was reached.
+        """
+        if not ctx:
+            raise RequiredArgument('wait_list_item', 'ctx')
+        if not name:
+            raise RequiredArgument('wait_list_item', 'name')
+
+        item = ctx.brpop(name, timeout=timeout)
+        if not item:
+            return None
+
+        _, value = item
+        return value
+
+    @staticmethod
+    def iter_keys(
+        ctx: RedisCtx,
+        pattern: Optional[str] = None,
+        count: Optional[int] = SCAN_COUNT,
+    ) -> Iterator[str]:
+        """Iterate over the keys matching with the pattern. In contrast to
+        KEYS, the keyspace is walked incrementally with SCAN, so redis
+        doesn't block other clients until all keys have been found.
+
+        A key may be returned more than once if the keyspace is modified
+        during the iteration.
 
         Arguments:
             ctx: Redis context to use.
             pattern: pattern used as filter.
+            count: Number of keys walked through in each SCAN call.
+
+        Return an iterator over the matched keys.
         """
+        if not ctx:
+            raise RequiredArgument('iter_keys', 'ctx')
+
         if not pattern:
             pattern = "*"
 
+        return ctx.scan_iter(match=pattern, count=count)
+
+    @classmethod
+    def get_key_count(cls, ctx: RedisCtx, pattern: Optional[str] = None) -> int:
+        """Get the number of keys matching with the pattern.
+
+        Arguments:
+            ctx: Redis context to use.
+            pattern: pattern used as filter.
+        """
         if not ctx:
             raise RequiredArgument('get_key_count', 'ctx')
 
-        return len(ctx.keys(pattern))
+        return len(set(cls.iter_keys(ctx, pattern)))
 
     @staticmethod
     def remove_list_item(ctx: RedisCtx, key: str, value: str):
@@ -260,6 +483,36 @@ class OpenvasDB:
 
         return ctx.lindex(name, index)
 
+    @staticmethod
+    def set_lists_many(
+        ctx: RedisCtx,
+        items: Iterable[Tuple[str, List]],
+        chunk_size: Optional[int] = PIPELINE_CHUNK_SIZE,
+    ):
+        """Replace several lists. The lists are written with a single
+        pipeline per chunk of lists.
+
+        Arguments:
+            ctx: Redis context to use.
+            items: Iterable of tuples with the key name and the values of
+                each list.
+            chunk_size: Max number of lists written in a single pipeline.
+        """
+        if not ctx:
+            raise RequiredArgument('set_lists_many', 'ctx')
+
+        items = iter(items)
+        while True:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                break
+
+            pipe = ctx.pipeline(transaction=False)
+            for name, values in chunk:
+                pipe.delete(name)
+                pipe.rpush(name, *values)
+            pipe.execute()
+
     @staticmethod
     def add_single_list(ctx: RedisCtx, name: str, values: Iterable):
         """Add a single KB element with one or more values.
@@ -325,8 +578,8 @@ class OpenvasDB:
         pipe.rpush(name, *set(value))
         pipe.execute()
 
-    @staticmethod
-    def get_pattern(ctx: RedisCtx, pattern: str) -> List:
+    @classmethod
+    def get_pattern(cls, ctx: RedisCtx, pattern: str) -> List:
         """Get all items stored under a given pattern.
 
         Arguments:
@@ -340,17 +593,10 @@ class OpenvasDB:
         if not pattern:
             raise RequiredArgument('get_pattern', 'pattern')
 
-        items = ctx.keys(pattern)
+        items = list(dict.fromkeys(cls.iter_keys(ctx, pattern)))
+        values = cls.get_list_items_many(ctx, items)
 
-        elem_list = []
-        for item in items:
-            elem_list.append(
-                [
-                    item,
-                    ctx.lrange(item, start=LIST_FIRST_POS, end=LIST_LAST_POS),
-                ]
-            )
-        return elem_list
+        return [[item, value] for item, value in zip(items, values)]
 
     @classmethod
     def get_keys_by_pattern(cls, ctx: RedisCtx, pattern: str) -> List[str]:
@@ -368,7 +614,7 @@ class OpenvasDB:
         if not pattern:
             raise RequiredArgument('get_elem_pattern_by_index', 'pattern')
 
-        return sorted(ctx.keys(pattern))
+        return sorted(set(cls.iter_keys(ctx, pattern)))
 
     @classmethod
     def get_filenames_and_oids(
@@ -388,8 +634,11 @@ class OpenvasDB:
             raise RequiredArgument('get_filenames_and_oids', 'ctx')
 
         items = cls.get_keys_by_pattern(ctx, 'nvt:*')
+        filenames = cls.get_single_items_many(ctx, items)
 
-        return ((ctx.lindex(item, 0), item[4:]) for item in items)
+        return (
+            (filename, item[4:]) for filename, item in zip(filenames, items)
+        )
 
 
 class BaseDB:
@@ -453,6 +702,12 @@ class BaseKbDB(BaseDB):
     def _pop_list_items(self, name: str) -> List:
         return OpenvasDB.pop_list_items(self.ctx, name)
 
+    def _pop_list_items_chunk(self, name: str, count: int) -> List:
+        return OpenvasDB.pop_list_items_chunk(self.ctx, name, count)
+
+    def _wait_list_item(self, name: str, timeout: int) -> Optional[str]:
+        return OpenvasDB.wait_list_item(self.ctx, name, timeout)
+
     def _remove_list_item(self, key: str, value: str):
         """Remove item from the key list.
 
@@ -462,12 +717,36 @@ class BaseKbDB(BaseDB):
         """
         OpenvasDB.remove_list_item(self.ctx, key, value)
 
-    def get_result(self) -> Optional[str]:
-        """Get and remove the oldest result from the list.
+    def get_result(
+        self, timeout: Optional[int] = None, count: Optional[int] = None
+    ) -> List[str]:
+        """Get and remove the results from the list.
 
-        Return the oldest scan results
+        Arguments:
+            timeout: If given, block up to timeout seconds until a result
+                is available in the list.
+            count: If given, get at most count results, the oldest ones.
+                Otherwise, all results are taken from the list.
+
+        Return the scan results, the oldest one first.
         """
-        return self._pop_list_items("internal/results")
+        name = "internal/results"
+
+        results = []
+        if timeout:
+            first = self._wait_list_item(name, timeout)
+            if first is None:
+                return results
+
+            results.append(first)
+
+        if not count:
+            return results + self._pop_list_items(name)
+
+        if count > len(results):
+            results += self._pop_list_items_chunk(name, count - len(results))
+
+        return results
 
     def get_status(self, openvas_scan_id: str) -> Optional[str]:
         """ Return the status of the host scan """
@@ -477,16 +756,35 @@ class BaseKbDB(BaseDB):
         return '<{} index={}>'.format(self.__class__.__name__, self.index)
 
 
+class ScanTick(NamedTuple):
+    """ Snapshot of a running scan, taken from its kb in one round trip. """
+
+    status: Optional[str]
+    results: List[str]
+    host_status: List[str]
+
+    @property
+    def finished(self) -> bool:
+        return self.status == 'finished' or self.status is None
+
+    @property
+    def stopped(self) -> bool:
+        return self.status == 'stop_all'
+
+
 class ScanDB(BaseKbDB):
     """ Database for a scanning a single host """
 
     def select(self, kbindex: int) -> "ScanDB":
         """Select a redis kb.
 
+        The context is switched to the shared one of the new kb instead of
+        sending a SELECT, which would change the db of a pooled connection.
+
         Arguments:
             kbindex: The new kb to select
         """
-        OpenvasDB.select_database(self.ctx, kbindex)
+        self.ctx = OpenvasDB.create_context(kbindex)
         self.index = kbindex
         return self
 
@@ -561,8 +859,37 @@ class KbDB(BaseKbDB):
         """
         return self._pop_list_items("internal/status")
 
+    def get_scan_tick(self, scan_id: str, results_count: int = 0) -> ScanTick:
+        """Get the status of the scan and take its host scan status and
+        results from the kb, in a single transaction.
+
+        Arguments:
+            scan_id: Scan ID.
+            results_count: Max number of results to take, the oldest ones.
+                If 0, the results are left in the kb.
+
+        Return a ScanTick with the results and the host scan status, the
+        oldest ones first.
+        """
+        pipe = self.ctx.pipeline()
+        pipe.lindex('internal/{}'.format(scan_id), LIST_FIRST_POS)
+        pipe.lrange('internal/status', LIST_FIRST_POS, LIST_LAST_POS)
+        pipe.delete('internal/status')
+        if results_count:
+            pipe.lrange('internal/results', -results_count, LIST_LAST_POS)
+            pipe.ltrim('internal/results', LIST_FIRST_POS, -results_count - 1)
+
+        status, host_status, _, *replies = pipe.execute()
+
+        # The lists are left-pushed, the oldest items are at the end.
+        host_status.reverse()
+        results = replies[0] if replies else []
+        results.reverse()
+
+        return ScanTick(status, results, host_status)
 
-class MainDB(BaseDB):
+
+class MainDB(ScanRegistryMixin, BaseDB):
     """ Main Database """
 
     DEFAULT_INDEX = 0
@@ -622,15 +949,36 @@ class MainDB(BaseDB):
     def find_kb_database_by_scan_id(
         self, scan_id: str
     ) -> Tuple[Optional[str], Optional["KbDB"]]:
-        """Find a kb db by via a scan id"""
+        """Find a kb db by via a scan id. The kb index is taken from the
+        scan id registry. The kbs are only probed one by one if the scan
+        id isn't registered or the registered kb doesn't belong to the
+        scan anymore."""
+        scan_key = 'internal/{}'.format(scan_id)
+
+        index = self.get_kb_index_by_scan_id(scan_id)
+        if index is not None:
+            ctx = OpenvasDB.create_context(index)
+            if ctx.exists(scan_key):
+                return KbDB(index, ctx)
+
         for index in range(1, self.max_database_index):
             ctx = OpenvasDB.create_context(index)
-            if OpenvasDB.get_key_count(ctx, 'internal/{}'.format(scan_id)):
+            if ctx.exists(scan_key):
                 return KbDB(index, ctx)
 
         return None
 
-    def release_database(self, database: BaseDB):
+    def release_database(self, database: BaseDB, scan_id: Optional[str] = None):
+        """Release a db and flush it.
+
+        Arguments:
+            database: The db to be released.
+            scan_id: Scan id of the scan using the db. If given, it is also
+                removed from the scan id registry.
+        """
+        if scan_id:
+            self.remove_scan_id_index(scan_id)
+
         self.release_database_by_index(database.index)
         database.flush()
 
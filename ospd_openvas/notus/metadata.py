@@ -28,7 +28,9 @@ from glob import glob
 from hashlib import sha256
 from pathlib import Path
 from csv import DictReader
-from typing import List, Dict, Optional, IO
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import List, Dict, NamedTuple, Optional, IO, Tuple
 
 from ospd_openvas.db import MainDB
 from ospd_openvas.nvticache import NVTICache
@@ -73,14 +75,75 @@ REQUIRED_PORTS = ""
 DEPENDENCIES = ""
 
 
+def get_file_sha256(file_abs_path: Path) -> str:
+    """ Calculate the sha256 checksum of a file. """
+    with file_abs_path.open("rb") as file_file_bytes:
+        sha256_object = sha256()
+        # Read chunks of 4096 bytes sequentially to avoid
+        # filling up the RAM if the file is extremely large
+        for byte_block in iter(lambda: file_file_bytes.read(4096), b""):
+            sha256_object.update(byte_block)
+
+    return sha256_object.hexdigest()
+
+
+def get_file_manifest_entry(
+    file_abs_path: Path, loaded_entry: Optional[Dict] = None
+) -> Dict:
+    """Get the manifest entry of a file with its mtime, size and sha256
+    checksum. The checksum of the loaded entry is reused, if the mtime and
+    the size of the file didn't change.
+
+    Arguments:
+        file_abs_path: Absolute path of the file.
+        loaded_entry: Manifest entry stored when the file was loaded.
+    """
+    stat = file_abs_path.stat()
+    entry = {'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+
+    if (
+        loaded_entry
+        and loaded_entry.get('mtime') == entry['mtime']
+        and loaded_entry.get('size') == entry['size']
+    ):
+        entry['sha256'] = loaded_entry.get('sha256')
+    else:
+        entry['sha256'] = get_file_sha256(file_abs_path)
+
+    return entry
+
+
+class ParsedLscFile(NamedTuple):
+    """ Result of parsing a Notus CSV file in a worker process. """
+
+    path: Path
+    advisories: List[Tuple[str, List]]
+    total: int
+    # Log message with a %s placeholder for the path if the file is invalid
+    error: Optional[str] = None
+
+
 class NotusMetadataHandler:
     """Class to perform checksum checks and upload metadata for
     CSV files that were created by the Notus Generator."""
 
-    def __init__(self, nvti: NVTICache = None, metadata_path: str = None):
+    def __init__(
+        self,
+        nvti: NVTICache = None,
+        metadata_path: str = None,
+        workers: int = None,
+    ):
+        """
+        Arguments:
+            nvti: NVTICache to upload the metadata to.
+            metadata_path: Directory containing the CSV files.
+            workers: If greater than one, the CSV files are checksummed and
+                parsed in a pool of that many worker processes.
+        """
         self._nvti = nvti
         self._metadata_path = metadata_path
         self._openvas_settings_dict = None
+        self._workers = workers
 
     @property
     def nvti(self) -> NVTICache:
@@ -150,7 +213,8 @@ class NotusMetadataHandler:
             for csv_file in glob(f'{self.metadata_path}*.csv')
         ]
 
-    def _check_field_names_lsc(self, field_names_list: list) -> bool:
+    @staticmethod
+    def check_field_names_lsc(field_names_list: list) -> bool:
         """Check if the field names of the parsed CSV file are exactly
         as expected to confirm that this version of the CSV format for
         Notus is supported by this module.
@@ -165,7 +229,8 @@ class NotusMetadataHandler:
             return False
         return True
 
-    def _check_advisory_dict(self, advisory_dict: dict) -> bool:
+    @staticmethod
+    def _check_advisory_dict(advisory_dict: dict) -> bool:
         """Check a row of the parsed CSV file to confirm that
         no field is missing. Also check if any lists are empty
         that should never be empty. This should avoid unexpected
@@ -195,7 +260,8 @@ class NotusMetadataHandler:
                 return False
         return True
 
-    def _format_xrefs(self, advisory_xref_string: str, xrefs_list: list) -> str:
+    @staticmethod
+    def _format_xrefs(advisory_xref_string: str, xrefs_list: list) -> str:
         """Create a string that contains all links for this advisory, to be
         inserted into the Redis KB.
 
@@ -229,32 +295,44 @@ class NotusMetadataHandler:
             Also returns true if the checksum check is disabled.
         """
 
-        no_signature_check = self.openvas_setting.get("nasl_no_signature_check")
-        if not no_signature_check:
-            with file_abs_path.open("rb") as file_file_bytes:
-                sha256_object = sha256()
-                # Read chunks of 4096 bytes sequentially to avoid
-                # filling up the RAM if the file is extremely large
-                for byte_block in iter(lambda: file_file_bytes.read(4096), b""):
-                    sha256_object.update(byte_block)
-
-                # Calculate the checksum for this file
-                file_calculated_checksum_string = sha256_object.hexdigest()
-                # Extract the downloaded checksum for this file
-                # from the Redis KB
-                file_downloaded_checksum_string = self.nvti.get_file_checksum(
-                    file_abs_path
-                )
-
-                # Checksum check
-                if (
-                    not file_calculated_checksum_string
-                    == file_downloaded_checksum_string
-                ):
-                    return False
+        file_downloaded_checksum_string = self._get_expected_checksum(
+            file_abs_path
+        )
+        if file_downloaded_checksum_string is not None:
+            # Calculate the checksum for this file
+            file_calculated_checksum_string = get_file_sha256(file_abs_path)
+
+            # Checksum check
+            if (
+                not file_calculated_checksum_string
+                == file_downloaded_checksum_string
+            ):
+                return False
         # Checksum check was either successful or it was skipped
         return True
 
+    def _is_entry_checksum_correct(
+        self, file_abs_path: Path, entry: Dict
+    ) -> bool:
+        """Like is_checksum_correct, but the checksum of the file is taken
+        from its manifest entry instead of hashing the file again."""
+        checksum = self._get_expected_checksum(file_abs_path)
+
+        return checksum is None or checksum == entry['sha256']
+
+    def _get_expected_checksum(self, file_abs_path: Path) -> Optional[str]:
+        """Get the downloaded checksum of a file from the Redis KB.
+
+        Returns:
+            The checksum, an empty string if there is no checksum for the
+            file or None if the checksum check is disabled.
+        """
+        no_signature_check = self.openvas_setting.get("nasl_no_signature_check")
+        if no_signature_check:
+            return None
+
+        return self.nvti.get_file_checksum(file_abs_path) or ''
+
     def upload_lsc_from_csv_reader(
         self,
         file_name: str,
@@ -263,7 +341,7 @@ class NotusMetadataHandler:
         csv_reader: DictReader,
     ) -> bool:
         """For each advisory_dict, write its contents to the
-        Redis KB as metadata.
+        Redis KB as metadata. The advisories are written in batches.
 
         Arguments:
             file_name: CSV file name with metadata to be uploaded
@@ -273,19 +351,57 @@ class NotusMetadataHandler:
 
         Return True if success, False otherwise
         """
+        advisories, total = self.parse_lsc_from_csv_reader(
+            family, general_metadata_dict, csv_reader
+        )
+
+        return self._upload_advisories(file_name, advisories, total)
+
+    def _upload_advisories(
+        self, file_name: str, advisories: List[Tuple[str, List]], total: int
+    ) -> bool:
+        """Write the parsed advisories of a CSV file to the Redis KB.
+
+        Return True if all advisories of the file were loaded.
+        """
+        loaded = self.nvti.add_vts_to_cache(advisories)
+
+        logger.debug(
+            "Loaded %d/%d advisories from %s", loaded, total, file_name
+        )
+        return loaded == total
+
+    @staticmethod
+    def parse_lsc_from_csv_reader(
+        family: str,
+        general_metadata_dict: Dict,
+        csv_reader: DictReader,
+    ) -> Tuple[List[Tuple[str, List]], int]:
+        """Create the metadata list of each advisory_dict, as it is
+        stored in the Redis KB.
+
+        Arguments:
+            family: Family of the advisories.
+            general_metadata_dict: General metadata common for all advisories
+                                   in the CSV file.
+            csv_reader: DictReader iterator to access the advisories
 
-        loaded = 0
+        Return a list of tuples with the KB key and the metadata list of
+        each valid advisory, and the total number of advisories.
+        """
+        advisories = list()
         total = 0
         for advisory_dict in csv_reader:
             # Make sure that no element is missing in the advisory_dict,
             # else skip that advisory
             total += 1
-            is_correct = self._check_advisory_dict(advisory_dict)
+            is_correct = NotusMetadataHandler._check_advisory_dict(
+                advisory_dict
+            )
             if not is_correct:
                 continue
             # For each advisory_dict,
-            # write its contents to the Redis KB as metadata.
-            # Create a list with all the metadata. Refer to:
+            # create a list with all the metadata. Refer to:
             # https://github.com/greenbone/ospd-openvas/blob/232d04e72d2af0199d60324e8820d9e73498a831/ospd_openvas/db.py#L39 # pylint: disable=C0321
             advisory_metadata_list = list()
 
@@ -340,7 +456,7 @@ class NotusMetadataHandler:
             advisory_metadata_list.append(BIDS)
             # XREFS
             advisory_metadata_list.append(
-                self._format_xrefs(
+                NotusMetadataHandler._format_xrefs(
                     advisory_dict["ADVISORY_XREF"],
                     ast.literal_eval(advisory_dict["XREFS"]),
                 )
@@ -355,32 +471,19 @@ class NotusMetadataHandler:
             # Script Name / Title
             advisory_metadata_list.append(advisory_dict["TITLE"])
 
-            # Write the metadata list to the respective Redis KB key,
-            # overwriting any existing values
-            kb_key_string = f'nvt:{oid}'
-            try:
-                self.nvti.add_vt_to_cache(
-                    vt_id=kb_key_string, vt=advisory_metadata_list
-                )
-            except OspdOpenvasError:
-                logger.warning(
-                    "LSC will not be loaded. The advisory_metadata_"
-                    "list was either not a list or does not include "
-                    "15 entries"
-                )
-                continue
-            loaded += 1
+            advisories.append((f'nvt:{oid}', advisory_metadata_list))
 
-        logger.debug(
-            "Loaded %d/%d advisories from %s", loaded, total, file_name
-        )
-        return loaded == total
+        return advisories, total
 
     def update_metadata(self) -> None:
         """Parse all CSV files that are present in the
         Notus metadata directory, perform a checksum check,
         read their metadata, format some fields
         and write this information to the Redis KB.
+
+        Files which didn't change since they were loaded, according to the
+        manifest stored in the Redis KB, are skipped. The advisories of
+        deleted files are removed.
         """
 
         # Check if Notus is enabled
@@ -391,50 +494,158 @@ class NotusMetadataHandler:
         # Get a list of all CSV files in that directory with their absolute path
         csv_abs_filepaths_list = self._get_csv_filepaths()
 
-        # Read each CSV file
+        manifest = self.nvti.get_notus_manifest()
+        self._remove_deleted_files(csv_abs_filepaths_list, manifest)
+        changed_files = self._get_changed_files(
+            csv_abs_filepaths_list, manifest
+        )
+        logger.debug(
+            "%d of %d Notus metadata files changed",
+            len(changed_files),
+            len(csv_abs_filepaths_list),
+        )
+
+        if self._workers and self._workers > 1 and len(changed_files) > 1:
+            self._update_metadata_parallel(changed_files, manifest)
+        else:
+            self._update_metadata_sequential(changed_files, manifest)
+
+        if changed_files or len(manifest) > len(csv_abs_filepaths_list):
+            # The files may link other families and drivers now
+            self.nvti.set_notus_family_driver_linkers(None)
+
+        logger.debug("Notus metadata load up finished.")
+
+    def _remove_deleted_files(
+        self, csv_abs_filepaths_list: List[Path], manifest: Dict[str, Dict]
+    ) -> None:
+        """ Remove the advisories of the loaded files which were deleted. """
+        existing_paths = {str(path) for path in csv_abs_filepaths_list}
+        for path, entry in manifest.items():
+            if path in existing_paths:
+                continue
+
+            self.nvti.remove_vts_from_cache(entry.get('keys', []))
+            self.nvti.set_notus_manifest_entry(path, None)
+            logger.debug("Removed the advisories of %s", path)
+
+    def _get_changed_files(
+        self, csv_abs_filepaths_list: List[Path], manifest: Dict[str, Dict]
+    ) -> List[Tuple[Path, Dict]]:
+        """Get the files whose content changed since they were loaded.
+
+        Return a list of tuples with the path and the new manifest entry
+        of each changed file.
+        """
+        changed_files = list()
         for csv_abs_path in csv_abs_filepaths_list:
+            loaded_entry = manifest.get(str(csv_abs_path))
+            entry = get_file_manifest_entry(csv_abs_path, loaded_entry)
+
+            if (
+                not loaded_entry
+                or loaded_entry.get('sha256') != entry['sha256']
+            ):
+                changed_files.append((csv_abs_path, entry))
+                continue
+
+            # Only touched. Store the new mtime to skip hashing it next time.
+            if loaded_entry.get('mtime') != entry['mtime']:
+                entry['keys'] = loaded_entry.get('keys', [])
+                self.nvti.set_notus_manifest_entry(str(csv_abs_path), entry)
+
+        return changed_files
+
+    def _update_manifest(
+        self,
+        csv_abs_path: Path,
+        entry: Dict,
+        advisories: List[Tuple[str, List]],
+        loaded_entry: Optional[Dict],
+    ) -> None:
+        """Store the manifest entry of an uploaded file and remove the
+        advisories which are not in the file anymore."""
+        keys = set()
+        for vt_id, vt in advisories:
+            keys.add(vt_id)
+            keys.add(f'filename:{vt[0]}')
+
+        if loaded_entry:
+            self.nvti.remove_vts_from_cache(
+                set(loaded_entry.get('keys', [])) - keys
+            )
+
+        entry['keys'] = sorted(keys)
+        self.nvti.set_notus_manifest_entry(str(csv_abs_path), entry)
+
+    def _update_metadata_sequential(
+        self,
+        changed_files: List[Tuple[Path, Dict]],
+        manifest: Dict[str, Dict],
+    ) -> None:
+        """ Parse and upload the CSV files one after the other. """
+        # Read each CSV file
+        for csv_abs_path, entry in changed_files:
             # Check the checksums, unless they have been disabled
-            if not self.is_checksum_correct(csv_abs_path):
+            if not self._is_entry_checksum_correct(csv_abs_path, entry):
                 # Skip this file if the checksum does not match
                 logger.warning('Checksum for %s failed', csv_abs_path)
                 continue
             logger.debug("Checksum check for %s successful", csv_abs_path)
-            with csv_abs_path.open("r") as csv_file:
-                # Skip the license header, so the actual content
-                # can be parsed by the DictReader
-
-                # Get the family from the Notus metadata csv file.
-                family_and_driver_dict = self.parse_family_driver_link(csv_file)
-                family, _ = family_and_driver_dict.popitem()
-
-                general_metadata_dict = dict()
-                for line_string in csv_file:
-                    if line_string.startswith("{"):
-                        general_metadata_dict = ast.literal_eval(line_string)
-                        break
-
-                # Check if the file can be parsed by the CSV module
-                reader = DictReader(csv_file)
-                # Check if the CSV file has the expected field names,
-                # else skip the file
-                is_correct = self._check_field_names_lsc(reader.fieldnames)
-                if not is_correct:
-                    logger.warning(
-                        'Field names check for %s failed', csv_abs_path
-                    )
-                    continue
 
-                file_name = csv_abs_path.name
-                if not self.upload_lsc_from_csv_reader(
-                    file_name, family, general_metadata_dict, reader
-                ):
-                    logger.warning(
-                        "Some advaisory was not loaded from %s", file_name
-                    )
+            parsed = parse_lsc_file(csv_abs_path)
+            if parsed.error:
+                logger.warning(parsed.error, csv_abs_path)
+                continue
 
-        logger.debug("Notus metadata load up finished.")
+            self._upload_parsed_file(parsed, entry, manifest)
+
+    def _update_metadata_parallel(
+        self,
+        changed_files: List[Tuple[Path, Dict]],
+        manifest: Dict[str, Dict],
+    ) -> None:
+        """Parse the CSV files in a pool of worker processes.
+        The advisories of each parsed file are uploaded in batches by this
+        process, as soon as the file is ready."""
+        entries = dict()
+        for csv_abs_path, entry in changed_files:
+            if not self._is_entry_checksum_correct(csv_abs_path, entry):
+                logger.warning('Checksum for %s failed', csv_abs_path)
+                continue
+
+            entries[csv_abs_path] = entry
+
+        # The workers are spawned, since the daemon process runs threads
+        with ProcessPoolExecutor(
+            max_workers=self._workers, mp_context=get_context('spawn')
+        ) as executor:
+            for parsed in executor.map(parse_lsc_file, entries):
+                if parsed.error:
+                    logger.warning(parsed.error, parsed.path)
+                    continue
+
+                self._upload_parsed_file(parsed, entries[parsed.path], manifest)
+
+    def _upload_parsed_file(
+        self, parsed: ParsedLscFile, entry: Dict, manifest: Dict[str, Dict]
+    ) -> None:
+        """ Upload the advisories of a parsed file and update its manifest. """
+        file_name = parsed.path.name
+        if not self._upload_advisories(
+            file_name, parsed.advisories, parsed.total
+        ):
+            logger.warning("Some advaisory was not loaded from %s", file_name)
+
+        self._update_manifest(
+            parsed.path,
+            entry,
+            parsed.advisories,
+            manifest.get(str(parsed.path)),
+        )
 
-    def parse_family_driver_link(self, csv_file: IO) -> Optional[Dict]:
+    @staticmethod
+    def parse_family_driver_link(csv_file: IO) -> Optional[Dict]:
         """Return the dictionary from the Notus metadata csv file which
         holds the driver script OID for the corresponding LSC family.
         This dictionary has one entry:
@@ -460,8 +671,12 @@ class NotusMetadataHandler:
         the Notus scanner for the given family
 
         This method always returns a dict with the supported families,
-        even if Notus Scanner is disabled.
+        even if Notus Scanner is disabled. The linkers are cached in the
+        NVTICache until the feed version changes.
         """
+        family_driver_linkers = self.nvti.get_notus_family_driver_linkers()
+        if family_driver_linkers is not None:
+            return family_driver_linkers
 
         # Get a list of all CSV files in that directory with their absolute path
         csv_abs_filepaths_list = self._get_csv_filepaths()
@@ -483,4 +698,39 @@ class NotusMetadataHandler:
             if dict_entry:
                 family_driver_linkers.update(dict_entry)
 
+        self.nvti.set_notus_family_driver_linkers(family_driver_linkers)
+
         return family_driver_linkers
+
+
+def parse_lsc_file(csv_abs_path: Path) -> ParsedLscFile:
+    """Parse the advisories of a Notus CSV file. The checksum of the file
+    is checked beforehand against its manifest entry. It doesn't access
+    the Redis KB, so it can run in a worker process.
+
+    Arguments:
+        csv_abs_path: Absolute path of the CSV file.
+    """
+    with csv_abs_path.open("r") as csv_file:
+        family_and_driver_dict = NotusMetadataHandler.parse_family_driver_link(
+            csv_file
+        )
+        family, _ = family_and_driver_dict.popitem()
+
+        general_metadata_dict = dict()
+        for line_string in csv_file:
+            if line_string.startswith("{"):
+                general_metadata_dict = ast.literal_eval(line_string)
+                break
+
+        reader = DictReader(csv_file)
+        if not NotusMetadataHandler.check_field_names_lsc(reader.fieldnames):
+            return ParsedLscFile(
+                csv_abs_path, [], 0, 'Field names check for %s failed'
+            )
+
+        advisories, total = NotusMetadataHandler.parse_lsc_from_csv_reader(
+            family, general_metadata_dict, reader
+        )
+
+    return ParsedLscFile(csv_abs_path, advisories, total)
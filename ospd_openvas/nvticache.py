@@ -19,23 +19,177 @@
 
 """ Provide functions to handle NVT Info Cache. """
 
+import json
 import logging
 
-from typing import List, Dict, Optional, Iterator, Tuple
+from itertools import islice
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple
 from pathlib import Path
 from time import time
 
 from ospd.errors import RequiredArgument
 from ospd_openvas.errors import OspdOpenvasError
-from ospd_openvas.db import NVT_META_FIELDS, OpenvasDB, MainDB, BaseDB, RedisCtx
+from ospd_openvas.db import (
+    NVT_META_FIELDS,
+    PIPELINE_CHUNK_SIZE,
+    OpenvasDB,
+    MainDB,
+    BaseDB,
+    RedisCtx,
+)
+from ospd_openvas.vtstore import VtStore
 
 NVTI_CACHE_NAME = "nvticache"
+NOTUS_MANIFEST_NAME = "notus:manifest"
 
 logger = logging.getLogger(__name__)
 
 LIST_FIRST_POS = 0
 LIST_LAST_POS = -1
 
+# Key of each metadata field of a VT in the parsed metadata. The position
+# of the fields in the `nvt:<oid>` list is given by NVT_META_FIELDS.
+NVT_METADATA_KEYS = {
+    "NVT_FILENAME_POS": 'filename',
+    "NVT_REQUIRED_KEYS_POS": 'required_keys',
+    "NVT_MANDATORY_KEYS_POS": 'mandatory_keys',
+    "NVT_EXCLUDED_KEYS_POS": 'excluded_keys',
+    "NVT_REQUIRED_UDP_PORTS_POS": 'required_udp_ports',
+    "NVT_REQUIRED_PORTS_POS": 'required_ports',
+    "NVT_DEPENDENCIES_POS": 'dependencies',
+    "NVT_TAGS_POS": 'tag',
+    "NVT_CVES_POS": 'cve',
+    "NVT_BIDS_POS": 'bid',
+    "NVT_XREFS_POS": 'xref',
+    "NVT_CATEGORY_POS": 'category',
+    "NVT_TIMEOUT_POS": 'timeout',
+    "NVT_FAMILY_POS": 'family',
+    "NVT_NAME_POS": 'name',
+}
+
+# Metadata fields needed to report a result of a VT
+NVT_SUMMARY_FIELDS = ("NVT_TAGS_POS", "NVT_NAME_POS")
+
+
+def _parse_nvt_params(prefs: Optional[List[str]]) -> Dict[str, str]:
+    """Parse the NVT's preferences.
+
+    Arguments:
+        prefs: List of preferences as stored in the `oid:<oid>:prefs` key.
+
+    Returns:
+        A dictionary with the parsed preferences.
+    """
+    vt_params = {}
+
+    if prefs:
+        for nvt_pref in prefs:
+            elem = nvt_pref.split('|||')
+
+            param_id = elem[0]
+            param_name = elem[1]
+            param_type = elem[2]
+
+            vt_params[param_id] = dict()
+            vt_params[param_id]['id'] = param_id
+            vt_params[param_id]['type'] = param_type
+            vt_params[param_id]['name'] = param_name.strip()
+            vt_params[param_id]['description'] = 'Description'
+
+            if len(elem) > 3:
+                param_default = elem[3]
+                vt_params[param_id]['default'] = param_default
+            else:
+                vt_params[param_id]['default'] = ''
+
+    return vt_params
+
+
+def _parse_metadata_tags(tags_str: str, oid: str) -> Dict[str, str]:
+    """Parse a string with multiple tags.
+
+    Arguments:
+        tags_str: String with tags separated by `|`.
+        oid: VT OID. Only used for logging in error case.
+
+    Returns:
+        A dictionary with the tags.
+    """
+    tags_dict = dict()
+    tags = tags_str.split('|')
+    for tag in tags:
+        try:
+            _tag, _value = tag.split('=', 1)
+        except ValueError:
+            logger.error('Tag %s in %s has no value.', tag, oid)
+            continue
+        tags_dict[_tag] = _value
+
+    return tags_dict
+
+
+def parse_nvt_fields(oid: str, resp: List[str]) -> Dict[str, str]:
+    """Parse the NVT metadata list, except for the references and the
+    timeout. The tags are added parsed to the dictionary.
+
+    Arguments:
+        oid: OID of the VT. Only used for logging in error case.
+        resp: List with the VT metadata.
+    """
+    custom = dict()
+    for field, res in zip(NVT_META_FIELDS, resp):
+        child = NVT_METADATA_KEYS[field]
+        if child not in ['cve', 'bid', 'xref', 'tag', 'timeout'] and res:
+            custom[child] = res
+        elif child == 'tag':
+            custom.update(_parse_metadata_tags(res, oid))
+
+    return custom
+
+
+def parse_nvt_refs(resp: List[str]) -> Dict[str, List[str]]:
+    """Parse the references out of the NVT metadata list.
+
+    Arguments:
+        resp: List with the VT metadata.
+    """
+    refs = dict()
+    for field, res in zip(NVT_META_FIELDS, resp):
+        child = NVT_METADATA_KEYS[field]
+        if child in ['cve', 'bid', 'xref'] and res:
+            refs[child] = res.split(", ")
+
+    return refs
+
+
+def parse_nvt_vt_params(
+    resp: List[str], prefs: Optional[List[str]]
+) -> Dict[str, Dict[str, str]]:
+    """Parse the timeout out of the NVT metadata list and the NVT
+    preferences into the VT parameters.
+
+    Arguments:
+        resp: List with the VT metadata.
+        prefs: List with the VT preferences.
+    """
+    timeout_pos = NVT_META_FIELDS.index("NVT_TIMEOUT_POS")
+    if len(resp) <= timeout_pos or resp[timeout_pos] is None:
+        return dict()
+
+    res = resp[timeout_pos]
+    vt_params = {}
+    if int(res) > 0:
+        _param_id = '0'
+        vt_params[_param_id] = dict()
+        vt_params[_param_id]['id'] = _param_id
+        vt_params[_param_id]['type'] = 'entry'
+        vt_params[_param_id]['name'] = 'timeout'
+        vt_params[_param_id]['description'] = 'Script Timeout'
+        vt_params[_param_id]['default'] = res
+    vt_params.update(_parse_nvt_params(prefs))
+
+    return vt_params
+
 
 class NVTICache(BaseDB):
 
@@ -62,6 +216,9 @@ class NVTICache(BaseDB):
         self._ctx = None
         self.index = None
         self._main_db = main_db
+        self._family_index = None
+        self._vt_store = None
+        self._notus_linkers = None
 
     @property
     def ctx(self) -> Optional[RedisCtx]:
@@ -100,116 +257,172 @@ class NVTICache(BaseDB):
         Returns:
             A dictionary with preferences and timeout.
         """
-        prefs = self.get_nvt_prefs(oid)
+        return _parse_nvt_params(self.get_nvt_prefs(oid))
 
-        vt_params = {}
+    def get_nvt_metadata(self, oid: str) -> Optional[Dict[str, str]]:
+        """Get a full NVT. Returns an XML tree with the NVT metadata.
 
-        if prefs:
-            for nvt_pref in prefs:
-                elem = nvt_pref.split('|||')
+        Arguments:
+            oid: OID of VT from which to get the metadata.
 
-                param_id = elem[0]
-                param_name = elem[1]
-                param_type = elem[2]
+        Returns:
+            A dictionary with the VT metadata.
+        """
+        vt_store = self._vt_store
+        if vt_store:
+            raw_vt = vt_store.get(oid)
+            if raw_vt is not None:
+                resp, prefs = raw_vt
+                return self._parse_nvt_metadata(oid, resp, prefs)
 
-                vt_params[param_id] = dict()
-                vt_params[param_id]['id'] = param_id
-                vt_params[param_id]['type'] = param_type
-                vt_params[param_id]['name'] = param_name.strip()
-                vt_params[param_id]['description'] = 'Description'
+        resp = OpenvasDB.get_list_item(
+            self.ctx,
+            "nvt:%s" % oid,
+            start=NVT_META_FIELDS.index("NVT_FILENAME_POS"),
+            end=NVT_META_FIELDS.index("NVT_NAME_POS"),
+        )
 
-                if len(elem) > 3:
-                    param_default = elem[3]
-                    vt_params[param_id]['default'] = param_default
-                else:
-                    vt_params[param_id]['default'] = ''
+        if not isinstance(resp, list) or len(resp) == 0:
+            return None
 
-        return vt_params
+        return self._parse_nvt_metadata(oid, resp, self.get_nvt_prefs(oid))
 
-    @staticmethod
-    def _parse_metadata_tags(tags_str: str, oid: str) -> Dict[str, str]:
-        """Parse a string with multiple tags.
+    def get_nvt_summary(
+        self, oid: str, fields: Iterable[str] = NVT_SUMMARY_FIELDS
+    ) -> Optional[Dict[str, str]]:
+        """Get only some metadata fields of a NVT. The fields are fetched
+        with a single redis pipeline. Neither the preferences nor the
+        references of the NVT are fetched.
 
         Arguments:
-            tags_str: String with tags separated by `|`.
-            oid: VT OID. Only used for logging in error case.
+            oid: OID of VT from which to get the metadata.
+            fields: Names of the fields to get, as in NVT_META_FIELDS.
+                The tags are added parsed to the dictionary.
 
         Returns:
-            A dictionary with the tags.
+            A dictionary with the requested metadata or None if the VT
+            couldn't be found.
         """
-        tags_dict = dict()
-        tags = tags_str.split('|')
-        for tag in tags:
-            try:
-                _tag, _value = tag.split('=', 1)
-            except ValueError:
-                logger.error('Tag %s in %s has no value.', tag, oid)
-                continue
-            tags_dict[_tag] = _value
+        fields = list(fields)
+        indexes = [NVT_META_FIELDS.index(field) for field in fields]
+
+        resp = None
+        vt_store = self._vt_store
+        if vt_store:
+            raw_vt = vt_store.get(oid)
+            if raw_vt is not None:
+                resp = [raw_vt[0][index] for index in indexes]
+
+        if resp is None:
+            resp = OpenvasDB.get_list_items_by_index(
+                self.ctx, 'nvt:%s' % oid, indexes
+            )
 
-        return tags_dict
+        if all(res is None for res in resp):
+            return None
 
-    def get_nvt_metadata(self, oid: str) -> Optional[Dict[str, str]]:
-        """Get a full NVT. Returns an XML tree with the NVT metadata.
+        summary = dict()
+        for field, res in zip(fields, resp):
+            key = NVT_METADATA_KEYS[field]
+            if key == 'tag':
+                if res:
+                    summary.update(_parse_metadata_tags(res, oid))
+            elif res:
+                summary[key] = res
+
+        return summary
+
+    def get_nvt_raw_many(
+        self, oids: Iterable[str]
+    ) -> Iterator[Tuple[str, Optional[Tuple[List[str], List[str]]]]]:
+        """Get the raw metadata and preferences lists of several NVTs, as
+        stored in redis. They are fetched with a single redis pipeline per
+        chunk of OIDs.
 
         Arguments:
-            oid: OID of VT from which to get the metadata.
+            oids: OIDs of the VTs from which to get the metadata.
 
         Returns:
-            A dictionary with the VT metadata.
+            An iterator yielding a tuple with the OID and a tuple with the
+            metadata list and the preferences list or None if the VT
+            couldn't be found, in the same order as the given OIDs.
         """
-        resp = OpenvasDB.get_list_item(
-            self.ctx,
-            "nvt:%s" % oid,
-            start=NVT_META_FIELDS.index("NVT_FILENAME_POS"),
-            end=NVT_META_FIELDS.index("NVT_NAME_POS"),
+        oids = list(oids)
+        names = (
+            name
+            for oid in oids
+            for name in ('nvt:%s' % oid, 'oid:%s:prefs' % oid)
         )
+        items = OpenvasDB.get_list_items_many(self.ctx, names)
 
-        if not isinstance(resp, list) or len(resp) == 0:
-            return None
+        # The items are consumed in pairs: the metadata and the preferences
+        for oid, resp, prefs in zip(oids, items, items):
+            if not isinstance(resp, list) or len(resp) == 0:
+                yield (oid, None)
+                continue
 
-        subelem = [
-            'filename',
-            'required_keys',
-            'mandatory_keys',
-            'excluded_keys',
-            'required_udp_ports',
-            'required_ports',
-            'dependencies',
-            'tag',
-            'cve',
-            'bid',
-            'xref',
-            'category',
-            'timeout',
-            'family',
-            'name',
-        ]
+            yield (oid, (resp, prefs))
+
+    def get_nvt_metadata_raw_many(
+        self, oids: Iterable[str]
+    ) -> Iterator[Tuple[str, Optional[Tuple[List[str], List[str]]]]]:
+        """Get the raw metadata and preferences lists of several NVTs, from
+        the VT store if it is set or from redis otherwise. The VTs missing
+        in the store, e.g. Notus advisories added after building it, are
+        taken from redis.
+
+        Arguments:
+            oids: OIDs of the VTs from which to get the metadata.
+
+        Returns:
+            An iterator yielding a tuple with the OID and a tuple with the
+            metadata list and the preferences list or None if the VT
+            couldn't be found, in the same order as the given OIDs.
+        """
+        vt_store = self._vt_store
+        if not vt_store:
+            return self.get_nvt_raw_many(oids)
+
+        return self._get_nvt_raw_many_from_store(vt_store, oids)
+
+    def _get_nvt_raw_many_from_store(
+        self, vt_store: VtStore, oids: Iterable[str]
+    ) -> Iterator[Tuple[str, Optional[Tuple[List[str], List[str]]]]]:
+        oids = iter(oids)
+        while True:
+            raw_vts = [
+                (oid, vt_store.get(oid))
+                for oid in islice(oids, PIPELINE_CHUNK_SIZE)
+            ]
+            if not raw_vts:
+                return
+
+            missing = [oid for oid, raw_vt in raw_vts if raw_vt is None]
+            from_redis = dict(self.get_nvt_raw_many(missing)) if missing else {}
+
+            for oid, raw_vt in raw_vts:
+                if raw_vt is None:
+                    raw_vt = from_redis.get(oid)
+                yield (oid, raw_vt)
+
+    @staticmethod
+    def _parse_nvt_metadata(
+        oid: str, resp: List[str], prefs: Optional[List[str]]
+    ) -> Dict[str, str]:
+        """Parse the NVT metadata list as stored in the `nvt:<oid>` key.
 
+        Arguments:
+            oid: OID of the VT. Only used for logging in error case.
+            resp: List with the VT metadata.
+            prefs: List with the VT preferences.
+
+        Returns:
+            A dictionary with the VT metadata.
+        """
         custom = dict()
-        custom['refs'] = dict()
-        custom['vt_params'] = dict()
-        for child, res in zip(subelem, resp):
-            if child not in ['cve', 'bid', 'xref', 'tag', 'timeout'] and res:
-                custom[child] = res
-            elif child == 'tag':
-                custom.update(self._parse_metadata_tags(res, oid))
-            elif child in ['cve', 'bid', 'xref'] and res:
-                custom['refs'][child] = res.split(", ")
-            elif child == 'timeout':
-                if res is None:
-                    continue
-                vt_params = {}
-                if int(res) > 0:
-                    _param_id = '0'
-                    vt_params[_param_id] = dict()
-                    vt_params[_param_id]['id'] = _param_id
-                    vt_params[_param_id]['type'] = 'entry'
-                    vt_params[_param_id]['name'] = 'timeout'
-                    vt_params[_param_id]['description'] = 'Script Timeout'
-                    vt_params[_param_id]['default'] = res
-                custom['vt_params'] = vt_params
-                custom['vt_params'].update(self.get_nvt_params(oid))
+        custom['refs'] = parse_nvt_refs(resp)
+        custom['vt_params'] = parse_nvt_vt_params(resp, prefs)
+        custom.update(parse_nvt_fields(oid, resp))
 
         return custom
 
@@ -254,6 +467,104 @@ class NVTICache(BaseDB):
             index=NVT_META_FIELDS.index("NVT_FAMILY_POS"),
         )
 
+    def _get_nvt_family_many(
+        self, oids: Iterable[str]
+    ) -> Iterator[Tuple[str, str]]:
+        """Get the family of several NVTs. The families are fetched with
+        a single redis pipeline per chunk of OIDs.
+
+        Arguments:
+            oids: OIDs of the VTs from which to get the VT family.
+
+        Returns:
+            An iterator yielding a tuple with the OID and the VT family,
+            in the same order as the given OIDs.
+        """
+        oids = list(oids)
+        families = OpenvasDB.get_single_items_many(
+            self.ctx,
+            ('nvt:%s' % oid for oid in oids),
+            index=NVT_META_FIELDS.index("NVT_FAMILY_POS"),
+        )
+
+        return zip(oids, families)
+
+    def load_family_index(self) -> Dict[str, List[str]]:
+        """Build the index of the VT families and the OIDs of the VTs
+        which belong to each family. It must be (re)built every time the
+        feed is loaded into the cache.
+
+        Returns:
+            A dictionary with the family as key and a list of OIDs as value.
+        """
+        family_index = dict()
+
+        oids = (oid for _, oid in self.get_oids())
+        for oid, family in self._get_nvt_family_many(oids):
+            family_index.setdefault(family, list()).append(oid)
+
+        self._family_index = family_index
+
+        return self._family_index
+
+    def set_vt_store(self, vt_store: Optional[VtStore]):
+        """Set a memory-mapped store with the VT metadata of the feed
+        version in the cache. The VT metadata is read from the store
+        instead of redis. None disables the store. The previous store is
+        closed."""
+        previous_store = self._vt_store
+        self._vt_store = vt_store
+
+        if previous_store is not None and previous_store is not vt_store:
+            previous_store.close()
+
+    def set_family_index(self, family_index: Dict[str, List[str]]):
+        """Set an index of the VT families built previously for the feed
+        version in the cache, e.g. loaded from a snapshot."""
+        self._family_index = family_index
+
+    def get_notus_family_driver_linkers(self) -> Optional[Dict[str, str]]:
+        """Get the Notus family/driver linkers cached for the feed version in
+        the cache.
+
+        Returns:
+            A dictionary with the family as key and the OID of the driver
+            as value, or None if they are not cached for this feed version.
+        """
+        if not self._notus_linkers:
+            return None
+
+        feed_version, linkers = self._notus_linkers
+        if feed_version != self.get_feed_version():
+            self._notus_linkers = None
+            return None
+
+        return linkers
+
+    def set_notus_family_driver_linkers(
+        self, linkers: Optional[Dict[str, str]]
+    ):
+        """Cache the Notus family/driver linkers for the feed version in the
+        cache. None drops the cached linkers."""
+        feed_version = self.get_feed_version()
+        if linkers is None or not feed_version:
+            self._notus_linkers = None
+            return
+
+        self._notus_linkers = (feed_version, linkers)
+
+    def get_family_index(self) -> Dict[str, List[str]]:
+        """Get the index of the VT families and the OIDs of the VTs which
+        belong to each family. The index is built if it was not loaded yet.
+
+        Returns:
+            A dictionary with the family as key and a list of OIDs as value.
+        """
+        if self._family_index is None:
+            return self.load_family_index()
+
+        return self._family_index
+
     def get_nvt_prefs(self, oid: str) -> Optional[List[str]]:
         """Get NVT preferences.
 
@@ -302,6 +613,53 @@ class NVTICache(BaseDB):
 
         return dict([item.split('=', 1) for item in tags])
 
+    def get_nvt_tags_many(
+        self, oids: Iterable[str]
+    ) -> Iterator[Tuple[str, Optional[Dict[str, str]]]]:
+        """Get the tags of several NVTs. The tags are fetched with a single
+        redis pipeline per chunk of OIDs.
+
+        Arguments:
+            oids: OIDs of the VTs from which to get the VT tags.
+
+        Returns:
+            An iterator yielding a tuple with the OID and a dictionary with
+            the VT tags or None if the VT couldn't be found, in the same
+            order as the given OIDs.
+        """
+        oids = list(oids)
+        tags = OpenvasDB.get_single_items_many(
+            self.ctx,
+            ('nvt:%s' % oid for oid in oids),
+            index=NVT_META_FIELDS.index('NVT_TAGS_POS'),
+        )
+
+        for oid, tag in zip(oids, tags):
+            if tag is None:
+                yield (oid, None)
+                continue
+
+            yield (oid, _parse_metadata_tags(tag, oid))
+
+    def get_nvt_files_timestamps(
+        self, filenames: Iterable[str]
+    ) -> Iterator[Optional[str]]:
+        """Get the timestamps of the last time the given VT files were
+        loaded into the cache. The timestamps are fetched with a single
+        redis pipeline per chunk of files.
+
+        Arguments:
+            filenames: Names of the VT files.
+
+        Returns:
+            An iterator yielding the timestamp of each file or None if
+            the file is not in the cache, in the same order as the given
+            file names.
+        """
+        return OpenvasDB.get_single_items_many(
+            self.ctx, ('filename:%s' % filename for filename in filenames)
+        )
+
     def get_nvt_files_count(self) -> int:
         return OpenvasDB.get_key_count(self.ctx, "filename:*")
 
@@ -309,6 +667,9 @@ class NVTICache(BaseDB):
         return OpenvasDB.get_key_count(self.ctx, "nvt:*")
 
     def force_reload(self):
+        self._family_index = None
+        self.set_vt_store(None)
+        self._notus_linkers = None
         self._main_db.release_database(self)
 
     def add_vt_to_cache(self, vt_id: str, vt: List[str]):
@@ -323,7 +684,38 @@ class NVTICache(BaseDB):
 
         OpenvasDB.add_single_list(self.ctx, vt_id, vt)
 
-        OpenvasDB.add_single_item(self.ctx, f'filename:{vt[0]}', [int(time())])
+        OpenvasDB.set_single_item(self.ctx, f'filename:{vt[0]}', [int(time())])
+
+    def add_vts_to_cache(self, vts: Iterable[Tuple[str, List[str]]]) -> int:
+        """Add several VTs to the cache. The VTs are written in batches
+        with a redis pipeline. Invalid VTs are skipped.
+
+        Arguments:
+            vts: Iterable of tuples with the key of the VT and the list with
+                its metadata.
+
+        Return the number of VTs added to the cache.
+        """
+        timestamp = int(time())
+
+        items = list()
+        count = 0
+        for vt_id, vt in vts:
+            if not vt_id or not isinstance(vt, list) or len(vt) != 15:
+                logger.warning(
+                    'Error trying to load the VT %s in cache. The VT metadata '
+                    'was either not a list or does not include 15 entries',
+                    vt_id,
+                )
+                continue
+
+            items.append((vt_id, vt))
+            items.append((f'filename:{vt[0]}', [timestamp]))
+            count += 1
+
+        OpenvasDB.set_lists_many(self.ctx, items)
+
+        return count
 
     def get_file_checksum(self, file_abs_path: Path) -> str:
         """Get file sha256 checksum or md5 checksum
@@ -349,3 +741,40 @@ class NVTICache(BaseDB):
         )
         if md5sum:
             return md5sum
+
+    def remove_vts_from_cache(self, keys: Iterable[str]):
+        """Remove the given VT and filename keys from the cache.
+
+        Arguments:
+            keys: Keys of the VTs and their files to be removed.
+        """
+        keys = list(keys)
+        if keys:
+            self.ctx.delete(*keys)
+
+    def get_notus_manifest(self) -> Dict[str, Dict]:
+        """Get the manifest of the Notus metadata files loaded into the
+        cache.
+
+        Return a dictionary with the path of each file as key and a
+        dictionary with its mtime, size, sha256 and the cache keys added
+        from the file as value.
+        """
+        return {
+            path: json.loads(entry)
+            for path, entry in self.ctx.hgetall(NOTUS_MANIFEST_NAME).items()
+        }
+
+    def set_notus_manifest_entry(self, path: str, entry: Optional[Dict]):
+        """Add or replace the manifest entry of a Notus metadata file.
+
+        Arguments:
+            path: Absolute path of the file.
+            entry: Dictionary with the mtime, size, sha256 and cache keys of
+                the file. None removes the entry of the file.
+        """
+        if entry is None:
+            self.ctx.hdel(NOTUS_MANIFEST_NAME, path)
+            return
+
+        self.ctx.hset(NOTUS_MANIFEST_NAME, path, json.dumps(entry))
@@ -20,16 +20,24 @@
 import logging
 import subprocess
 
+from time import monotonic
 from typing import Optional, Dict, Any
 
 logger = logging.getLogger(__name__)
 
 _BOOL_DICT = {'no': 0, 'yes': 1}
 
+# Seconds the settings of the openvas executable are cached
+SETTINGS_TTL = 600
+
 
 class Openvas:
     """Class for calling the openvas executable"""
 
+    # Cached settings and the time they were loaded
+    _settings: Optional[Dict[str, Any]] = None
+    _settings_time = 0.0
+
     @staticmethod
     def _get_version_output() -> Optional[str]:
         try:
@@ -90,8 +98,40 @@ class Openvas:
 
         return version[0]
 
+    @classmethod
+    def get_settings(cls) -> Dict[str, Any]:
+        """Returns the current settings of the openvas executable. They are
+        cached for SETTINGS_TTL seconds or until they are reloaded."""
+        if (
+            cls._settings is None
+            or monotonic() - cls._settings_time > SETTINGS_TTL
+        ):
+            return cls.reload_settings()
+
+        return dict(cls._settings)
+
+    @classmethod
+    def reload_settings(cls) -> Dict[str, Any]:
+        """Parses the settings of the openvas executable again and caches
+        them. The settings are not cached if openvas could not be called."""
+        param_list = cls._parse_settings()
+
+        if param_list:
+            cls._settings = param_list
+            cls._settings_time = monotonic()
+        else:
+            cls._settings = None
+
+        return dict(param_list)
+
+    @classmethod
+    def clear_settings(cls):
+        """Drops the cached settings. They are parsed again on the next
+        call of get_settings."""
+        cls._settings = None
+
     @staticmethod
-    def get_settings() -> Dict[str, Any]:
+    def _parse_settings() -> Dict[str, Any]:
         """Parses the current settings of the openvas executable"""
         param_list = dict()
 
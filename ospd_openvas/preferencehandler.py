@@ -140,19 +140,11 @@ class PreferenceHandler:
         notus_enabled = settings.get("table_driven_lsc")
 
         vts_list = list()
-        families = dict()
 
-        notus = NotusMetadataHandler()
+        notus = NotusMetadataHandler(nvti=self.nvti)
         lsc_families_and_drivers = notus.get_family_driver_linkers()
 
-        oids = self.nvti.get_oids()
-
-        for _, oid in oids:
-            family = self.nvti.get_nvt_family(oid)
-            if family not in families:
-                families[family] = list()
-
-            families[family].append(oid)
+        families = self.nvti.get_family_index()
 
         for elem in filters:
             key, value = elem.split('=')
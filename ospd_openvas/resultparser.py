@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-2021 Greenbone Networks GmbH
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+""" Parser for the result messages stored by openvas in the kb. """
+
+import logging
+
+from typing import Iterable, Iterator, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Separator of the fields of a result message
+RESULT_FIELD_SEPARATOR = '|||'
+
+# Result types which are not related to a VT
+RESULT_TYPES_WITHOUT_VT = frozenset(
+    ('HOST_START', 'HOST_END', 'HOSTS_COUNT', 'DEADHOST')
+)
+
+
+class OpenvasResult(NamedTuple):
+    """ A result message parsed from the kb. """
+
+    type: str
+    host: str
+    hostname: str
+    port: str
+    oid: str
+    value: str
+    uri: str
+
+    def is_vt_result(self) -> bool:
+        """Check if the result has been produced by a VT, so the VT data
+        is required to report it."""
+        return (
+            self.type not in RESULT_TYPES_WITHOUT_VT
+            and "Host dead" not in self.value
+            and "Host access denied" not in self.value
+        )
+
+
+def parse_result(result: str) -> OpenvasResult:
+    """Parse a single result message.
+
+    Result messages come in the next form, with optional uri field
+    type ||| host ip ||| hostname ||| port ||| OID ||| value [|||uri]
+
+    Raises ValueError if the message is malformed.
+    """
+    msg = result.split(RESULT_FIELD_SEPARATOR, 6)
+    if len(msg) < 6:
+        raise ValueError('Malformed result message: %s' % result)
+
+    return OpenvasResult(
+        type=msg[0],
+        host=msg[1].strip(),
+        hostname=msg[2].strip(),
+        port=msg[3],
+        oid=msg[4].strip(),
+        value=msg[5],
+        uri=msg[6] if len(msg) > 6 else '',
+    )
+
+
+def parse_results(results: Iterable[str]) -> Iterator[OpenvasResult]:
+    """Parse the given result messages. Empty and malformed messages are
+    skipped.
+
+    Returns:
+        An iterator yielding an OpenvasResult per result message.
+    """
+    for result in results:
+        if not result:
+            continue
+
+        try:
+            yield parse_result(result)
+        except ValueError as e:
+            logger.warning('%s', e)
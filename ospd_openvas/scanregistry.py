@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-2021 Greenbone Networks GmbH
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+""" Registry of the scans running in the redis kbs, kept in the main kb. """
+
+from typing import Dict, Optional
+
+# Name of the hash mapping each scan id to the index of its kb.
+SCANID_INDEX_NAME = "GVM.__ScanIdIndex"
+
+# Name of the counter of the cycles run by the result collector.
+COLLECTOR_CYCLE_NAME = "GVM.__ResultCollectorCycle"
+
+
+class ScanRegistryMixin:
+    """Scan id registry and result collector cycle counter. Used by the
+    MainDB, which provides the redis context of the main kb."""
+
+    def add_scan_id_index(self, scan_id: str, kbindex: int):
+        """Register the index of the kb used by a scan.
+
+        Arguments:
+            scan_id: Scan id of the scan using the kb.
+            kbindex: Index of the kb.
+        """
+        self.ctx.hset(SCANID_INDEX_NAME, scan_id, kbindex)
+
+    def get_scan_id_index(self) -> Dict[str, int]:
+        """Get the index of the kb used by each registered scan.
+
+        Return a dictionary with the scan id as key and the kb index as
+        value.
+        """
+        return {
+            scan_id: int(kbindex)
+            for scan_id, kbindex in self.ctx.hgetall(SCANID_INDEX_NAME).items()
+        }
+
+    def get_kb_index_by_scan_id(self, scan_id: str) -> Optional[int]:
+        """Get the index of the kb registered for a scan.
+
+        Arguments:
+            scan_id: Scan id of the scan using the kb.
+
+        Return the kb index or None if the scan id isn't registered.
+        """
+        kbindex = self.ctx.hget(SCANID_INDEX_NAME, scan_id)
+        return int(kbindex) if kbindex is not None else None
+
+    def remove_scan_id_index(self, scan_id: str):
+        """Remove the kb index of a scan from the registry.
+
+        Arguments:
+            scan_id: Scan id of the scan using the kb.
+        """
+        self.ctx.hdel(SCANID_INDEX_NAME, scan_id)
+
+    def increase_collector_cycle(self):
+        """ Count a finished cycle of the result collector. """
+        self.ctx.incr(COLLECTOR_CYCLE_NAME)
+
+    def get_collector_cycle(self) -> int:
+        """ Get the number of finished cycles of the result collector. """
+        cycle = self.ctx.get(COLLECTOR_CYCLE_NAME)
+        return int(cycle) if cycle else 0
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-2021 Greenbone Networks GmbH
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+""" On-disk snapshot of the data built from the VTs of a feed version. """
+
+import json
+import logging
+import os
+
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Version of the snapshot format. It must be increased every time the
+# stored data changes, so snapshots of an older format are discarded.
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+class VtSnapshot:
+    """Snapshot of the data built from the VTs of a feed version, like the
+    VT indexes and the collection hash. It allows to skip building the data
+    again after a restart, as long as the feed version hasn't changed.
+    """
+
+    def __init__(self, path: Path):
+        self._path = path
+
+    def load(self, feed_version: str) -> Optional[Dict[str, Any]]:
+        """Load the snapshot of the given feed version.
+
+        Return the stored data or None if there is no valid snapshot of the
+        feed version.
+        """
+        if not feed_version:
+            return None
+
+        try:
+            with self._path.open('r', encoding='utf-8') as fd:
+                snapshot = json.load(fd)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning('Not possible to load the VTs snapshot. %s', e)
+            return None
+
+        if (
+            not isinstance(snapshot, dict)
+            or snapshot.get('format_version') != SNAPSHOT_FORMAT_VERSION
+            or snapshot.get('feed_version') != feed_version
+        ):
+            logger.debug('Discarding outdated VTs snapshot %s', self._path)
+            return None
+
+        return snapshot.get('data')
+
+    def save(self, feed_version: str, data: Dict[str, Any]):
+        """Store the data of the given feed version, replacing a previous
+        snapshot. The file is replaced atomically, so a snapshot can't be
+        read partially written."""
+        if not feed_version:
+            return
+
+        snapshot = {
+            'format_version': SNAPSHOT_FORMAT_VERSION,
+            'feed_version': feed_version,
+            'data': data,
+        }
+
+        tmp_path = self._path.with_name(self._path.name + '.tmp')
+        try:
+            with tmp_path.open('w', encoding='utf-8') as fd:
+                json.dump(snapshot, fd)
+            os.replace(str(tmp_path), str(self._path))
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning('Not possible to save the VTs snapshot. %s', e)
+            return
+
+        logger.debug('Saved VTs snapshot of feed version %s', feed_version)
@@ -19,20 +19,235 @@
 
 """ Provide functions to handle VT Info. """
 
+from collections import OrderedDict
+from collections.abc import Mapping
+from functools import lru_cache
 from hashlib import sha256
-from typing import Optional, Dict, List, Tuple, Iterator
+from threading import Lock
+from typing import Any, Optional, Dict, FrozenSet, List, Tuple, Iterator
 
-from ospd_openvas.nvticache import NVTICache
+from ospd.cvss import CVSS
+
+from ospd_openvas.nvticache import (
+    NVTICache,
+    parse_nvt_fields,
+    parse_nvt_refs,
+    parse_nvt_vt_params,
+)
 from ospd_openvas.notus.metadata import NotusMetadataHandler
 
+# Max number of VTs kept in a VtCache
+DEFAULT_VT_CACHE_SIZE = 10000
+
+# Max number of severity vectors whose score is kept in memory
+SEVERITY_SCORE_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=SEVERITY_SCORE_CACHE_SIZE)
+def get_severity_score(
+    severity_type: Optional[str], severity_vector: Optional[str]
+) -> Optional[float]:
+    """Calculate the cvss base score of a severity vector. The scores of
+    the most recently used vectors are memoized.
+
+    Returns:
+        The cvss base score. None if there is no severity vector or the
+        severity type is neither cvss base version 2 nor 3.
+    """
+    if not severity_vector:
+        return None
+
+    if severity_type == "cvss_base_v2":
+        return CVSS.cvss_base_v2_value(severity_vector)
+    if severity_type == "cvss_base_v3":
+        return CVSS.cvss_base_v3_value(severity_vector)
+
+    return None
+
+
+class VtCache:
+    """Bounded LRU cache of VT data, valid for a single feed version.
+
+    Once the cache is full, the least recently used VT is dropped. All
+    entries are dropped if a VT is requested for another feed version
+    than the one the cached entries belong to. The cache can be shared
+    between threads.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_VT_CACHE_SIZE):
+        self._maxsize = maxsize
+        self._feed_version = None
+        self._vts = OrderedDict()
+        self._lock = Lock()
+
+    def _set_feed_version(self, feed_version: Optional[str]) -> bool:
+        """Drop all entries if the feed version changed. Must be called
+        with the lock held.
+
+        Return True if the feed version changed.
+        """
+        if feed_version == self._feed_version:
+            return False
+
+        self._vts.clear()
+        self._feed_version = feed_version
+        return True
+
+    def get(
+        self, vt_id: str, feed_version: Optional[str]
+    ) -> Optional[Dict[str, any]]:
+        """Get a cached VT.
+
+        Arguments:
+            vt_id: OID of the VT.
+            feed_version: Feed version the VT must belong to.
+
+        Returns:
+            The cached VT or None if it is not in the cache.
+        """
+        with self._lock:
+            if self._set_feed_version(feed_version):
+                return None
+
+            vt = self._vts.get(vt_id)
+            if vt is not None:
+                self._vts.move_to_end(vt_id)
+
+            return vt
+
+    def add(self, vt_id: str, feed_version: Optional[str], vt: Dict[str, any]):
+        """Add a VT to the cache, dropping the least recently used one
+        if the cache is full.
+
+        Arguments:
+            vt_id: OID of the VT.
+            feed_version: Feed version the VT belongs to.
+            vt: The VT data to cache.
+        """
+        with self._lock:
+            self._set_feed_version(feed_version)
+
+            self._vts[vt_id] = vt
+            self._vts.move_to_end(vt_id)
+
+            if len(self._vts) > self._maxsize:
+                self._vts.popitem(last=False)
+
+    def clear(self):
+        """ Remove all VTs from the cache """
+        with self._lock:
+            self._vts.clear()
+
+    def __len__(self) -> int:
+        return len(self._vts)
+
+
+class VtRecord(Mapping):
+    """Read-only VT dictionary built out of the VT metadata list, as
+    stored in redis. Nothing is parsed until the VT is accessed. The VT
+    parameters and the references are parsed apart from the rest of the
+    VT, only if they are accessed.
+
+    It can be used wherever the VT dictionary built by VtHelper is read.
+    """
+
+    __slots__ = (
+        '_oid',
+        '_resp',
+        '_prefs',
+        '_oids',
+        '_vt',
+        '_vt_params',
+        '_vt_refs',
+    )
+
+    def __init__(
+        self,
+        oid: str,
+        resp: List[str],
+        prefs: Optional[List[str]] = None,
+        oids: Optional[Dict[str, str]] = None,
+    ):
+        """
+        Arguments:
+            oid: OID of the VT.
+            resp: List with the VT metadata.
+            prefs: List with the VT preferences.
+            oids: Dictionary with filenames and OIDs of all VTs. If given,
+                the VT dependencies are resolved to OIDs.
+        """
+        self._oid = oid
+        self._resp = resp
+        self._prefs = prefs
+        self._oids = oids
+        self._vt = None
+        self._vt_params = None
+        self._vt_refs = None
+
+    def _get_vt(self) -> Dict[str, Any]:
+        if self._vt is None:
+            custom = parse_nvt_fields(self._oid, self._resp)
+            # Added on demand by __getitem__
+            custom['vt_params'] = None
+            custom['refs'] = None
+
+            self._vt = VtHelper.get_vt_from_metadata(custom, self._oids)
+
+        return self._vt
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'vt_params':
+            if self._vt_params is None:
+                self._vt_params = parse_nvt_vt_params(self._resp, self._prefs)
+            return self._vt_params
+
+        if key == 'vt_refs':
+            if self._vt_refs is None:
+                self._vt_refs = parse_nvt_refs(self._resp)
+            return self._vt_refs
+
+        return self._get_vt()[key]
+
+    def __contains__(self, key: object) -> bool:
+        if key in ('vt_params', 'vt_refs'):
+            return True
+
+        return key in self._get_vt()
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._get_vt()
+        yield 'vt_params'
+        yield 'vt_refs'
+
+    def __len__(self) -> int:
+        return len(self._get_vt()) + 2
+
 
 class VtHelper:
-    def __init__(self, nvticache: NVTICache):
+    def __init__(self, nvticache: NVTICache, vt_cache: VtCache = None):
         self.nvti = nvticache
+        self.vt_cache = vt_cache
 
     def get_single_vt(self, vt_id: str, oids=None) -> Optional[Dict[str, any]]:
         custom = self.nvti.get_nvt_metadata(vt_id)
 
+        return self.get_vt_from_metadata(custom, oids)
+
+    @staticmethod
+    def get_vt_from_metadata(
+        custom: Optional[Dict[str, str]], oids=None
+    ) -> Optional[Dict[str, any]]:
+        """Build the VT dictionary out of the VT metadata as returned by
+        the NVTICache.
+
+        Arguments:
+            custom: VT metadata. The dictionary is modified.
+            oids: Dictionary with filenames and OIDs of all VTs. If given,
+                the VT dependencies are resolved to OIDs.
+
+        Returns:
+            The VT dictionary or None if there is no metadata.
+        """
         if not custom:
             return None
 
@@ -89,26 +304,7 @@ class VtHelper:
         elif 'qod' in custom:
             qod_v = custom.pop('qod')
 
-        severity = dict()
-        if 'severity_vector' in custom:
-            severity_vector = custom.pop('severity_vector')
-        else:
-            severity_vector = custom.pop('cvss_base_vector')
-        severity['severity_base_vector'] = severity_vector
-
-        if "CVSS:3" in severity_vector:
-            severity_type = 'cvss_base_v3'
-        else:
-            severity_type = 'cvss_base_v2'
-        severity['severity_type'] = severity_type
-
-        if 'severity_date' in custom:
-            severity['severity_date'] = custom.pop('severity_date')
-        else:
-            severity['severity_date'] = vt_creation_time
-
-        if 'severity_origin' in custom:
-            severity['severity_origin'] = custom.pop('severity_origin')
+        severity = VtHelper._get_vt_severities(custom, vt_creation_time)
 
         if name is None:
             name = ''
@@ -155,19 +351,131 @@ class VtHelper:
 
         return vt
 
-    def get_notus_driver_oids(self) -> List[str]:
-        """Return a list of oid corresponding to notus driver which
+    @staticmethod
+    def _get_vt_severities(
+        custom: Dict[str, str], creation_time: Optional[str]
+    ) -> Dict[str, str]:
+        """Build the severities of a VT out of its severity tags. The tags
+        are removed from the VT metadata.
+
+        Arguments:
+            custom: VT metadata. The dictionary is modified.
+            creation_time: Creation time of the VT, used as severity date
+                if the VT has none.
+        """
+        severity = dict()
+        if 'severity_vector' in custom:
+            severity_vector = custom.pop('severity_vector')
+        else:
+            severity_vector = custom.pop('cvss_base_vector')
+        severity['severity_base_vector'] = severity_vector
+
+        if "CVSS:3" in severity_vector:
+            severity_type = 'cvss_base_v3'
+        else:
+            severity_type = 'cvss_base_v2'
+        severity['severity_type'] = severity_type
+
+        if 'severity_date' in custom:
+            severity['severity_date'] = custom.pop('severity_date')
+        else:
+            severity['severity_date'] = creation_time
+
+        if 'severity_origin' in custom:
+            severity['severity_origin'] = custom.pop('severity_origin')
+
+        return severity
+
+    def get_vt_summary(self, vt_id: str) -> Optional[Dict[str, any]]:
+        """Get the VT data needed to report a result: the name, the qod
+        or qod type, the severities and the severity score. Only the name
+        and the tags of the VT are fetched.
+
+        Arguments:
+            vt_id: OID of the VT.
+
+        Returns:
+            A dictionary with the VT data or None if the VT doesn't exist.
+        """
+        custom = self.nvti.get_nvt_summary(vt_id)
+        if not custom:
+            return None
+
+        severities = self._get_vt_severities(
+            custom, custom.get('creation_date')
+        )
+        vt = {
+            'name': custom.get('name') or '',
+            'severities': severities,
+            'severity_score': get_severity_score(
+                severities.get('severity_type'),
+                severities.get('severity_base_vector'),
+            ),
+        }
+        if custom.get('qod_type'):
+            vt['qod_type'] = custom.get('qod_type')
+        elif custom.get('qod'):
+            vt['qod'] = custom.get('qod')
+
+        return vt
+
+    def get_result_vt(
+        self, vt_id: str, feed_version: Optional[str] = None
+    ) -> Optional[Dict[str, any]]:
+        """Get the VT data needed to report a result: the name, the qod
+        or qod type, the severities and the severity score.
+
+        If the helper has a VT cache, the VT is looked up in the cache
+        first and it is added to the cache after it has been fetched.
+
+        Arguments:
+            vt_id: OID of the VT.
+            feed_version: Current feed version. Used as part of the cache key.
+
+        Returns:
+            A dictionary with the VT data or None if the VT doesn't exist.
+        """
+        if self.vt_cache is not None:
+            vt = self.vt_cache.get(vt_id, feed_version)
+            if vt is not None:
+                return vt
+
+        vt = self.get_vt_summary(vt_id)
+        if not vt:
+            return None
+
+        if self.vt_cache is not None:
+            self.vt_cache.add(vt_id, feed_version, vt)
+
+        return vt
+
+    def get_notus_driver_oids(self) -> FrozenSet[str]:
+        """Return a set of oid corresponding to notus driver which
         are considered backend entities and must not be exposed to
         the OSP client."""
-        notus = NotusMetadataHandler()
+        notus = NotusMetadataHandler(nvti=self.nvti)
         lsc_families_and_drivers = notus.get_family_driver_linkers()
 
-        return lsc_families_and_drivers.values()
+        return frozenset(lsc_families_and_drivers.values())
 
     def get_vt_iterator(
-        self, vt_selection: List[str] = None, details: bool = True
+        self,
+        vt_selection: List[str] = None,
+        details: bool = True,
+        exclude_drivers: bool = True,
     ) -> Iterator[Tuple[str, Dict]]:
-        """ Yield the vts from the Redis NVTicache. """
+        """Yield the vts from the Redis NVTicache.
+
+        Arguments:
+            vt_selection: OIDs of the VTs to yield. All VTs if not given.
+            details: Whether to add the dependencies of the VTs.
+            exclude_drivers: Whether to skip the Notus drivers. They are
+                skipped before their metadata is fetched. Callers which
+                already removed them from the selection can pass False.
+        """
+
+        # Notus driver oid set which are not sent.
+        drivers = self.get_notus_driver_oids() if exclude_drivers else None
 
         oids = None
         if not vt_selection or details:
@@ -179,39 +487,93 @@ class VtHelper:
             if details:
                 oids = vt_collection
 
-        # Notus driver oid list which are not sent.
-        drivers = self.get_notus_driver_oids()
-        for vt_id in vt_selection:
-            if vt_id in drivers:
+        if drivers:
+            vt_selection = (
+                vt_id for vt_id in vt_selection if vt_id not in drivers
+            )
+
+        for vt_id, raw_vt in self.nvti.get_nvt_metadata_raw_many(vt_selection):
+            if not raw_vt:
+                yield (vt_id, None)
                 continue
-            vt = self.get_single_vt(vt_id, oids)
-            yield (vt_id, vt)
 
-    def calculate_vts_collection_hash(self) -> str:
-        """ Calculate the vts collection sha256 hash. """
+            resp, prefs = raw_vt
+            yield (vt_id, VtRecord(vt_id, resp, prefs, oids))
+
+    @staticmethod
+    def _get_vt_hash_data(vt_id: str, vt: Dict[str, any]) -> bytes:
+        """Return the data of a single VT which is part of the vts
+        collection hash."""
+        param_chain = ""
+        vt_params = vt.get('vt_params')
+        if vt_params:
+            for _, param in sorted(vt_params.items()):
+                param_chain += (
+                    param.get('id') + param.get('name') + param.get('default')
+                )
+
+        return (vt_id + vt.get('modification_time')).encode(
+            'utf-8'
+        ) + param_chain.encode('utf-8')
+
+    def calculate_vts_collection_hash(
+        self, vts_hash_data: Dict[str, Tuple[Optional[str], bytes]] = None
+    ) -> str:
+        """Calculate the vts collection sha256 hash.
+
+        Arguments:
+            vts_hash_data: Hash data of each VT from a previous calculation,
+                together with the timestamp of the VT file at that time.
+                Only the VTs whose file timestamp changed are read again.
+                The dictionary is updated with the current data.
+
+        Returns:
+            The hash as hexadecimal string.
+        """
         m = sha256()  # pylint: disable=invalid-name
 
+        if vts_hash_data is None:
+            vts_hash_data = dict()
+
         # Notus driver oid list which are not sent.
         drivers = self.get_notus_driver_oids()
 
-        # for a reproducible hash calculation
-        # the vts must already be sorted in the dictionary.
-        for vt_id, vt in self.get_vt_iterator(details=False):
+        vt_collection = dict(self.nvti.get_oids())
+        timestamps = self.nvti.get_nvt_files_timestamps(vt_collection.keys())
+
+        vts_timestamps = dict()
+        changed_vts = list()
+        for filename, timestamp in zip(vt_collection.keys(), timestamps):
+            vt_id = vt_collection[filename]
             if vt_id in drivers:
                 continue
-            param_chain = ""
-            vt_params = vt.get('vt_params')
-            if vt_params:
-                for _, param in sorted(vt_params.items()):
-                    param_chain += (
-                        param.get('id')
-                        + param.get('name')
-                        + param.get('default')
-                    )
-
-            m.update(
-                (vt_id + vt.get('modification_time')).encode('utf-8')
-                + param_chain.encode('utf-8')
-            )
+
+            vts_timestamps[vt_id] = timestamp
+
+            cached = vts_hash_data.get(vt_id)
+            if timestamp is None or cached is None or cached[0] != timestamp:
+                changed_vts.append(vt_id)
+
+        if changed_vts:
+            for vt_id, vt in self.get_vt_iterator(
+                changed_vts, details=False, exclude_drivers=False
+            ):
+                if not vt:
+                    continue
+
+                vts_hash_data[vt_id] = (
+                    vts_timestamps[vt_id],
+                    self._get_vt_hash_data(vt_id, vt),
+                )
+
+        for vt_id in list(vts_hash_data):
+            if vt_id not in vts_timestamps:
+                del vts_hash_data[vt_id]
+
+        # for a reproducible hash calculation
+        # the vts must already be sorted in the dictionary.
+        for vt_id in vt_collection.values():
+            if vt_id in vts_hash_data:
+                m.update(vts_hash_data[vt_id][1])
 
         return m.hexdigest()
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-2021 Greenbone Networks GmbH
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+""" Memory-mapped, read-only store of the VT metadata of a feed version. """
+
+import json
+import logging
+import mmap
+import os
+import struct
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Identifier and version of the store file format
+VT_STORE_MAGIC = b'OSPDVTS1'
+
+# Format of the length of the index, stored right after the magic
+VT_STORE_INDEX_LENGTH = struct.Struct('<Q')
+
+# Raw VT metadata as stored in redis: the metadata list and the preferences
+RawVt = Tuple[List[str], Optional[List[str]]]
+
+
+class VtStore:
+    """Read-only store of the raw VT metadata of a feed version.
+
+    The store is a single file containing the index and the JSON encoded
+    metadata of each VT. The index maps each OID to the offset and length of
+    its record. The file is memory-mapped, so the pages are shared by all
+    processes forked after opening the store and no redis request is needed
+    to read a VT.
+    """
+
+    def __init__(
+        self,
+        feed_version: str,
+        index: Dict[str, List[int]],
+        data: mmap.mmap,
+        data_offset: int,
+    ):
+        self.feed_version = feed_version
+        self._index = index
+        self._data = data
+        self._data_offset = data_offset
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, oid: str) -> bool:
+        return oid in self._index
+
+    def get_record(self, oid: str) -> Optional[bytes]:
+        """Get the record of a VT as stored.
+
+        Return the record or None if the VT is not in the store or the
+        store has been closed.
+        """
+        entry = self._index.get(oid)
+        if entry is None:
+            return None
+
+        offset, length = entry
+        start = self._data_offset + offset
+
+        try:
+            return self._data[start : start + length]
+        except ValueError:
+            # Closed by another thread after a feed update
+            return None
+
+    def get(self, oid: str) -> Optional[RawVt]:
+        """Get the raw metadata of a VT.
+
+        Return a tuple with the metadata list and the preferences list of the
+        VT or None if the VT is not in the store.
+        """
+        record = self.get_record(oid)
+        if record is None:
+            return None
+
+        resp, prefs = json.loads(record)
+
+        return (resp, prefs)
+
+    def close(self):
+        self._data.close()
+
+    @classmethod
+    def open(cls, path: Path) -> Optional["VtStore"]:
+        """Open a store file.
+
+        Return the store or None if the file doesn't exist or is invalid.
+        """
+        try:
+            with path.open('rb') as fd:
+                data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning('Not possible to open the VT store %s. %s', path, e)
+            return None
+
+        header_length = len(VT_STORE_MAGIC) + VT_STORE_INDEX_LENGTH.size
+        try:
+            if data[: len(VT_STORE_MAGIC)] != VT_STORE_MAGIC:
+                raise ValueError('Unknown file format')
+
+            (index_length,) = VT_STORE_INDEX_LENGTH.unpack_from(
+                data, len(VT_STORE_MAGIC)
+            )
+            data_offset = header_length + index_length
+            header = json.loads(data[header_length:data_offset])
+
+            return cls(
+                header['feed_version'], header['oids'], data, data_offset
+            )
+        except (struct.error, ValueError, KeyError, TypeError) as e:
+            data.close()
+            logger.warning('Invalid VT store %s. %s', path, e)
+            return None
+
+    @classmethod
+    def build(
+        cls, path: Path, feed_version: str, vts: Iterable[Tuple[str, RawVt]]
+    ) -> bool:
+        """Write a store file with the given VTs, replacing a previous one.
+        The file is replaced atomically, so processes which still use the
+        previous store can continue reading it.
+
+        Arguments:
+            path: Path of the store file.
+            feed_version: Feed version of the VTs.
+            vts: Iterable of tuples with the OID and the raw metadata of
+                each VT.
+
+        Return True if the store was written.
+        """
+        records = (
+            (oid, json.dumps(raw_vt).encode('utf-8'))
+            for oid, raw_vt in vts
+            if raw_vt is not None
+        )
+        return cls.build_records(path, feed_version, records)
+
+    @staticmethod
+    def build_records(
+        path: Path, feed_version: str, records: Iterable[Tuple[str, bytes]]
+    ) -> bool:
+        """Write a store file with the given records, replacing a previous
+        one. See build.
+
+        Arguments:
+            path: Path of the store file.
+            feed_version: Feed version of the VTs.
+            records: Iterable of tuples with the OID and the record of each
+                VT.
+
+        Return True if the store was written.
+        """
+        tmp_path = path.with_name(path.name + '.tmp')
+        records_path = path.with_name(path.name + '.records.tmp')
+
+        index = dict()
+        offset = 0
+        try:
+            # The records are written first, because the size of the index
+            # is not known until all VTs have been read.
+            with records_path.open('wb') as records_fd:
+                for oid, record in records:
+                    records_fd.write(record)
+                    index[oid] = [offset, len(record)]
+                    offset += len(record)
+
+            header = json.dumps(
+                {'feed_version': feed_version, 'oids': index}
+            ).encode('utf-8')
+
+            with tmp_path.open('wb') as fd, records_path.open(
+                'rb'
+            ) as records_fd:
+                fd.write(VT_STORE_MAGIC)
+                fd.write(VT_STORE_INDEX_LENGTH.pack(len(header)))
+                fd.write(header)
+                while True:
+                    chunk = records_fd.read(mmap.PAGESIZE * 256)
+                    if not chunk:
+                        break
+                    fd.write(chunk)
+
+            os.replace(str(tmp_path), str(path))
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning('Not possible to build the VT store %s. %s', path, e)
+            return False
+        finally:
+            for file_path in (records_path, tmp_path):
+                try:
+                    file_path.unlink()
+                except OSError:
+                    pass
+
+        logger.debug(
+            'Built VT store with %d VTs of feed version %s',
+            len(index),
+            feed_version,
+        )
+
+        return True
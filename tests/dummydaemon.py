@@ -153,6 +153,66 @@ class DummyDaemon(OSPDopenvas):
                 'xref': ['URL:http://www.mantisbt.org/'],
             },
         }
+        nvti.get_nvt_metadata_raw_many.side_effect = lambda oids: (
+            (
+                oid,
+                (
+                    [
+                        'mantis_detect.nasl',
+                        '',
+                        '',
+                        'Settings/disable_cgi_scanning',
+                        '',
+                        'Services/www, 80',
+                        '',
+                        'cvss_base_vector=AV:N/AC:L/Au:N/C:N/I:N/A:N|'
+                        'last_modification=1533906565|'
+                        'creation_date=1237458156|summary=some summary|'
+                        'impact=some impact|insight=some insight|'
+                        'affected=some affection|solution=some solution|'
+                        'solution_type=WillNotFix|'
+                        'solution_method=DebianAPTUpgrade|'
+                        'qod_type=remote_banner',
+                        '',
+                        '',
+                        'URL:http://www.mantisbt.org/',
+                        '3',
+                        '0',
+                        'Product detection',
+                        'Mantis Detection',
+                    ],
+                    [
+                        '1|||Data length :|||entry|||',
+                        '2|||Do not randomize the  order  in  which ports '
+                        'are scanned|||checkbox|||no',
+                    ],
+                ),
+            )
+            for oid in oids
+        )
+        nvti.get_nvt_summary.side_effect = lambda oid: {
+            'creation_date': '1237458156',
+            'cvss_base_vector': 'AV:N/AC:L/Au:N/C:N/I:N/A:N',
+            'last_modification': '1533906565',
+            'name': 'Mantis Detection',
+            'qod_type': 'remote_banner',
+        }
+        nvti.get_nvt_tags_many.side_effect = lambda oids: (
+            (
+                oid,
+                {
+                    'creation_date': '1237458156',
+                    'last_modification': '1533906565',
+                },
+            )
+            for oid in oids
+        )
+        nvti.get_nvt_files_timestamps.side_effect = lambda filenames: (
+            '1533906565' for _ in filenames
+        )
+        nvti.get_family_index.return_value = {
+            'Product detection': ['1.3.6.1.4.1.25623.1.0.100061']
+        }
         nvti.get_feed_version.return_value = '123'
 
         super().__init__(niceness=10, lock_file_dir='/tmp')
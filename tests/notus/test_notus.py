@@ -17,17 +17,23 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+import shutil
+import tempfile
 import unittest
 
 from csv import DictReader
 from pathlib import Path, PurePath
 from collections import OrderedDict
+from typing import List
 from unittest.mock import patch, MagicMock
 
 from ospd_openvas.notus.metadata import (
     NotusMetadataHandler,
     EXPECTED_FIELD_NAMES_LIST,
     METADATA_DIRECTORY_NAME,
+    get_file_manifest_entry,
+    get_file_sha256,
+    parse_lsc_file,
 )
 from ospd_openvas.errors import OspdOpenvasError
 
@@ -219,7 +225,7 @@ class NotusTestCase(unittest.TestCase):
             ret, "URL:https://example.com, URL:www.foo.net, URL:www.bar.net"
         )
 
-    def test_check_field_names_lsc(self):
+    def testcheck_field_names_lsc(self):
         notus = NotusMetadataHandler()
         field_names_list = [
             "OID",
@@ -240,9 +246,9 @@ class NotusTestCase(unittest.TestCase):
             "XREFS",
             "FILENAME",
         ]
-        self.assertTrue(notus._check_field_names_lsc(field_names_list))
+        self.assertTrue(notus.check_field_names_lsc(field_names_list))
 
-    def test_check_field_names_lsc_unordered(self):
+    def testcheck_field_names_lsc_unordered(self):
         notus = NotusMetadataHandler()
         field_names_list = [
             "TITLE",
@@ -263,9 +269,9 @@ class NotusTestCase(unittest.TestCase):
             "XREFS",
         ]
 
-        self.assertFalse(notus._check_field_names_lsc(field_names_list))
+        self.assertFalse(notus.check_field_names_lsc(field_names_list))
 
-    def test_check_field_names_lsc_missing(self):
+    def testcheck_field_names_lsc_missing(self):
         notus = NotusMetadataHandler()
         field_names_list = [
             "OID",
@@ -284,7 +290,7 @@ class NotusTestCase(unittest.TestCase):
             "XREFS",
         ]
 
-        self.assertFalse(notus._check_field_names_lsc(field_names_list))
+        self.assertFalse(notus.check_field_names_lsc(field_names_list))
 
     def test_get_csv_filepath(self):
         path = Path("./tests/notus/example.csv").resolve()
@@ -296,14 +302,14 @@ class NotusTestCase(unittest.TestCase):
 
     @patch('ospd_openvas.notus.metadata.Openvas')
     def test_update_metadata_warning(self, MockOpenvas):
-        notus = NotusMetadataHandler()
+        notus = NotusMetadataHandler(nvti=self.nvti)
         logging.Logger.warning = MagicMock()
         path = Path("./tests/notus/example.csv").resolve()
         openvas = MockOpenvas()
         openvas.get_settings.return_value = {'table_driven_lsc': 1}
 
         notus._get_csv_filepaths = MagicMock(return_value=[path])
-        notus.is_checksum_correct = MagicMock(return_value=False)
+        notus._get_expected_checksum = MagicMock(return_value='abc123')
 
         notus.update_metadata()
         logging.Logger.warning.assert_called_with(
@@ -312,17 +318,22 @@ class NotusTestCase(unittest.TestCase):
 
     @patch('ospd_openvas.notus.metadata.Openvas')
     def test_update_metadata_field_name_failed(self, MockOpenvas):
-        notus = NotusMetadataHandler(metadata_path="./tests/notus")
+        notus = NotusMetadataHandler(
+            nvti=self.nvti, metadata_path="./tests/notus"
+        )
         logging.Logger.warning = MagicMock()
         path = Path("./tests/notus/example.csv").resolve()
         openvas = MockOpenvas()
         openvas.get_settings.return_value = {'table_driven_lsc': 1}
 
         notus._get_csv_filepaths = MagicMock(return_value=[path])
-        notus.is_checksum_correct = MagicMock(return_value=True)
-        notus._check_field_names_lsc = MagicMock(return_value=False)
+        notus._get_expected_checksum = MagicMock(return_value=None)
 
-        notus.update_metadata()
+        # The files are parsed by parse_lsc_file, which uses the class
+        with patch.object(
+            NotusMetadataHandler, 'check_field_names_lsc', return_value=False
+        ):
+            notus.update_metadata()
 
         logging.Logger.warning.assert_called_with(
             f'Field names check for %s failed', path
@@ -330,16 +341,18 @@ class NotusTestCase(unittest.TestCase):
 
     @patch('ospd_openvas.notus.metadata.Openvas')
     def test_update_metadata_failed(self, MockOpenvas):
-        notus = NotusMetadataHandler(metadata_path="./tests/notus")
+        notus = NotusMetadataHandler(
+            nvti=self.nvti, metadata_path="./tests/notus"
+        )
         logging.Logger.warning = MagicMock()
         path = Path("./tests/notus/example.csv").resolve()
         openvas = MockOpenvas()
         openvas.get_settings.return_value = {'table_driven_lsc': 1}
 
         notus._get_csv_filepaths = MagicMock(return_value=[path])
-        notus.is_checksum_correct = MagicMock(return_value=True)
-        notus._check_field_names_lsc = MagicMock(return_value=True)
-        notus.upload_lsc_from_csv_reader = MagicMock(return_value=False)
+        notus._get_expected_checksum = MagicMock(return_value=None)
+        notus.check_field_names_lsc = MagicMock(return_value=True)
+        notus._upload_advisories = MagicMock(return_value=False)
 
         notus.update_metadata()
 
@@ -354,7 +367,9 @@ class NotusTestCase(unittest.TestCase):
 
     @patch('ospd_openvas.notus.metadata.Openvas')
     def test_update_metadata_success(self, MockOpenvas):
-        notus = NotusMetadataHandler(metadata_path="./tests/notus")
+        notus = NotusMetadataHandler(
+            nvti=self.nvti, metadata_path="./tests/notus"
+        )
         logging.Logger.warning = MagicMock()
         path = Path("./tests/notus/example.csv").resolve()
         purepath = PurePath(path).name
@@ -362,9 +377,9 @@ class NotusTestCase(unittest.TestCase):
         openvas.get_settings.return_value = {'table_driven_lsc': 1}
 
         notus._get_csv_filepaths = MagicMock(return_value=[path])
-        notus.is_checksum_correct = MagicMock(return_value=True)
-        notus._check_field_names_lsc = MagicMock(return_value=True)
-        notus.upload_lsc_from_csv_reader = MagicMock(return_value=True)
+        notus._get_expected_checksum = MagicMock(return_value=None)
+        notus.check_field_names_lsc = MagicMock(return_value=True)
+        notus._upload_advisories = MagicMock(return_value=True)
 
         notus.update_metadata()
 
@@ -381,7 +396,7 @@ class NotusTestCase(unittest.TestCase):
         notus = NotusMetadataHandler(
             nvti=self.nvti, metadata_path="./tests/notus"
         )
-        notus.nvti.add_vt_to_cache.side_effect = OspdOpenvasError
+        notus.nvti.add_vts_to_cache.return_value = 0
         logging.Logger.debug = MagicMock()
         path = Path("./tests/notus/example.csv").resolve()
         purepath = PurePath(path).name
@@ -412,7 +427,7 @@ class NotusTestCase(unittest.TestCase):
         notus = NotusMetadataHandler(
             nvti=self.nvti, metadata_path="./tests/notus"
         )
-        notus.nvti.add_vt_to_cache.return_value = None
+        notus.nvti.add_vts_to_cache.return_value = 1
         logging.Logger.debug = MagicMock()
         path = Path("./tests/notus/example.csv").resolve()
         purepath = PurePath(path).name
@@ -431,10 +446,216 @@ class NotusTestCase(unittest.TestCase):
         logging.Logger.debug.assert_called_with(
             "Loaded %d/%d advisories from %s", 1, 1, purepath
         )
+        advisories = notus.nvti.add_vts_to_cache.call_args[0][0]
+        self.assertEqual(len(advisories), 1)
+        vt_id, vt = advisories[0]
+        self.assertTrue(vt_id.startswith('nvt:'))
+        self.assertEqual(len(vt), 15)
+        self.assertEqual(vt[13], family)
+
+    def test_parse_lsc_file(self):
+        path = Path("./tests/notus/example.csv").resolve()
+
+        parsed = parse_lsc_file(path)
+
+        self.assertIsNone(parsed.error)
+        self.assertEqual(parsed.path, path)
+        self.assertEqual(parsed.total, 1)
+        self.assertEqual(len(parsed.advisories), 1)
+        self.assertEqual(len(parsed.advisories[0][1]), 15)
+
+    def _copy_example_csv(self, *names: str) -> List[Path]:
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+
+        paths = list()
+        for name in names:
+            path = Path(tmp_dir, name).resolve()
+            shutil.copy("./tests/notus/example.csv", str(path))
+            paths.append(path)
+
+        return paths
+
+    @patch('ospd_openvas.notus.metadata.Openvas')
+    def test_update_metadata_parallel(self, MockOpenvas):
+        openvas = MockOpenvas()
+        openvas.get_settings.return_value = {
+            'table_driven_lsc': 1,
+            'nasl_no_signature_check': 1,
+        }
+        paths = self._copy_example_csv("a.csv", "b.csv")
+        notus = NotusMetadataHandler(
+            nvti=self.nvti, metadata_path=f'{paths[0].parent}/', workers=2
+        )
+        notus.nvti.get_notus_manifest.return_value = {}
+        notus.nvti.add_vts_to_cache.return_value = 1
+        logging.Logger.warning = MagicMock()
+
+        notus.update_metadata()
+
+        logging.Logger.warning.assert_not_called()
+        self.assertEqual(notus.nvti.add_vts_to_cache.call_count, 2)
+        advisories = notus.nvti.add_vts_to_cache.call_args[0][0]
+        self.assertEqual(len(advisories), 1)
+        self.assertEqual(notus.nvti.set_notus_manifest_entry.call_count, 2)
+
+    @patch('ospd_openvas.notus.metadata.Openvas')
+    def test_update_metadata_parallel_checksum_failed(self, MockOpenvas):
+        openvas = MockOpenvas()
+        openvas.get_settings.return_value = {'table_driven_lsc': 1}
+        paths = self._copy_example_csv("a.csv", "b.csv")
+        notus = NotusMetadataHandler(
+            nvti=self.nvti, metadata_path=f'{paths[0].parent}/', workers=2
+        )
+        notus.nvti.get_notus_manifest.return_value = {}
+        notus.nvti.get_file_checksum.return_value = "abc123"
+        logging.Logger.warning = MagicMock()
+
+        notus.update_metadata()
+
+        logging.Logger.warning.assert_any_call(
+            'Checksum for %s failed', paths[0]
+        )
+        logging.Logger.warning.assert_any_call(
+            'Checksum for %s failed', paths[1]
+        )
+        notus.nvti.add_vts_to_cache.assert_not_called()
+        notus.nvti.set_notus_manifest_entry.assert_not_called()
+
+    @patch('ospd_openvas.notus.metadata.get_file_sha256')
+    @patch('ospd_openvas.notus.metadata.Openvas')
+    def test_update_metadata_hashes_once(self, MockOpenvas, mock_sha256):
+        path = Path("./tests/notus/example.csv").resolve()
+        mock_sha256.return_value = get_file_sha256(path)
+        openvas = MockOpenvas()
+        openvas.get_settings.return_value = {'table_driven_lsc': 1}
+        notus = NotusMetadataHandler(
+            nvti=self.nvti, metadata_path="./tests/notus"
+        )
+        notus._get_csv_filepaths = MagicMock(return_value=[path])
+        notus.nvti.get_notus_manifest.return_value = {}
+        notus.nvti.get_file_checksum.return_value = mock_sha256.return_value
+        notus._upload_advisories = MagicMock(return_value=True)
+
+        notus.update_metadata()
+
+        mock_sha256.assert_called_once_with(path)
+        notus._upload_advisories.assert_called_once()
+
+    def test_get_file_manifest_entry(self):
+        path = Path("./tests/notus/example.csv").resolve()
+
+        entry = get_file_manifest_entry(path)
+
+        self.assertEqual(entry['size'], path.stat().st_size)
+        self.assertEqual(entry['mtime'], path.stat().st_mtime_ns)
+        self.assertEqual(entry['sha256'], get_file_sha256(path))
+
+        # The checksum is reused if the file wasn't touched
+        loaded_entry = dict(entry, sha256='abc123')
+        entry = get_file_manifest_entry(path, loaded_entry)
+        self.assertEqual(entry['sha256'], 'abc123')
+
+        loaded_entry['size'] += 1
+        entry = get_file_manifest_entry(path, loaded_entry)
+        self.assertEqual(entry['sha256'], get_file_sha256(path))
+
+    @patch('ospd_openvas.notus.metadata.Openvas')
+    def test_update_metadata_manifest(self, MockOpenvas):
+        openvas = MockOpenvas()
+        openvas.get_settings.return_value = {
+            'table_driven_lsc': 1,
+            'nasl_no_signature_check': 1,
+        }
+        notus = NotusMetadataHandler(
+            nvti=self.nvti, metadata_path="./tests/notus/"
+        )
+        path = Path("./tests/notus/example.csv").resolve()
+        notus.nvti.get_notus_manifest.return_value = {
+            str(path): {
+                'mtime': 0,
+                'size': 0,
+                'sha256': 'abc123',
+                'keys': ['nvt:1.2.3', 'filename:foo.nasl'],
+            }
+        }
+        notus.nvti.add_vts_to_cache.return_value = 1
+
+        notus.update_metadata()
+
+        notus.nvti.add_vts_to_cache.assert_called_once()
+        vt_id, vt = notus.nvti.add_vts_to_cache.call_args[0][0][0]
+        notus.nvti.remove_vts_from_cache.assert_called_with(
+            {'nvt:1.2.3', 'filename:foo.nasl'}
+        )
+
+        entry = get_file_manifest_entry(path)
+        entry['keys'] = sorted([vt_id, f'filename:{vt[0]}'])
+        notus.nvti.set_notus_manifest_entry.assert_called_with(str(path), entry)
+
+    @patch('ospd_openvas.notus.metadata.Openvas')
+    def test_update_metadata_unchanged(self, MockOpenvas):
+        openvas = MockOpenvas()
+        openvas.get_settings.return_value = {'table_driven_lsc': 1}
+        notus = NotusMetadataHandler(
+            nvti=self.nvti, metadata_path="./tests/notus/"
+        )
+        path = Path("./tests/notus/example.csv").resolve()
+        entry = get_file_manifest_entry(path)
+        entry['keys'] = ['nvt:1.2.3']
+        notus.nvti.get_notus_manifest.return_value = {str(path): entry}
+
+        notus.update_metadata()
+
+        notus.nvti.get_file_checksum.assert_not_called()
+        notus.nvti.add_vts_to_cache.assert_not_called()
+        notus.nvti.set_notus_manifest_entry.assert_not_called()
+        notus.nvti.remove_vts_from_cache.assert_not_called()
+
+    @patch('ospd_openvas.notus.metadata.Openvas')
+    def test_update_metadata_touched(self, MockOpenvas):
+        openvas = MockOpenvas()
+        openvas.get_settings.return_value = {'table_driven_lsc': 1}
+        notus = NotusMetadataHandler(
+            nvti=self.nvti, metadata_path="./tests/notus/"
+        )
+        path = Path("./tests/notus/example.csv").resolve()
+        entry = get_file_manifest_entry(path)
+        entry['keys'] = ['nvt:1.2.3']
+        notus.nvti.get_notus_manifest.return_value = {
+            str(path): dict(entry, mtime=0)
+        }
+
+        notus.update_metadata()
+
+        notus.nvti.add_vts_to_cache.assert_not_called()
+        notus.nvti.set_notus_manifest_entry.assert_called_with(str(path), entry)
+
+    @patch('ospd_openvas.notus.metadata.Openvas')
+    def test_update_metadata_deleted_file(self, MockOpenvas):
+        openvas = MockOpenvas()
+        openvas.get_settings.return_value = {'table_driven_lsc': 1}
+        notus = NotusMetadataHandler(
+            nvti=self.nvti, metadata_path="./tests/notus/"
+        )
+        notus._get_csv_filepaths = MagicMock(return_value=[])
+        notus.nvti.get_notus_manifest.return_value = {
+            '/foo/deleted.csv': {'sha256': 'abc123', 'keys': ['nvt:1.2.3']}
+        }
+
+        notus.update_metadata()
+
+        notus.nvti.remove_vts_from_cache.assert_called_with(['nvt:1.2.3'])
+        notus.nvti.set_notus_manifest_entry.assert_called_with(
+            '/foo/deleted.csv', None
+        )
 
     @patch('ospd_openvas.notus.metadata.Openvas')
     def test_get_family_driver_linkers(self, MockOpenvas):
-        notus = NotusMetadataHandler(metadata_path="./tests/notus")
+        notus = NotusMetadataHandler(
+            nvti=self.nvti, metadata_path="./tests/notus"
+        )
+        notus.nvti.get_notus_family_driver_linkers.return_value = None
 
         path = Path("./tests/notus/example.csv").resolve()
         notus._get_csv_filepaths = MagicMock(return_value=[path])
@@ -448,3 +669,21 @@ class NotusTestCase(unittest.TestCase):
         }
         ret = notus.get_family_driver_linkers()
         self.assertEqual(ret, family_and_driver)
+        notus.nvti.set_notus_family_driver_linkers.assert_called_with(
+            family_and_driver
+        )
+
+    def test_get_family_driver_linkers_cached(self):
+        notus = NotusMetadataHandler(
+            nvti=self.nvti, metadata_path="./tests/notus"
+        )
+        notus._get_csv_filepaths = MagicMock()
+        family_and_driver = {'Some family': '1.2.3'}
+        notus.nvti.get_notus_family_driver_linkers.return_value = (
+            family_and_driver
+        )
+
+        ret = notus.get_family_driver_linkers()
+
+        self.assertEqual(ret, family_and_driver)
+        notus._get_csv_filepaths.assert_not_called()
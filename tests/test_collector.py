@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-2021 Greenbone Networks GmbH
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=protected-access
+
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+
+from ospd_openvas.collector import ResultCollector
+
+
+@patch('ospd_openvas.collector.OpenvasDB')
+class ResultCollectorTestCase(TestCase):
+    def setUp(self):
+        self.main_db = MagicMock()
+        self.dispatcher = MagicMock()
+        self.collector = ResultCollector(self.main_db, self.dispatcher, count=2)
+
+    def test_ctx(self, MockOpenvasDB):
+        ctx = self.collector.ctx
+
+        self.assertIs(ctx, MockOpenvasDB.create_context.return_value)
+        MockOpenvasDB.create_context.assert_called_once_with(0, shared=False)
+
+    def test_collect(self, MockOpenvasDB):
+        self.main_db.get_scan_id_index.return_value = {'foo': 1, 'bar': 2}
+        pipe = MockOpenvasDB.create_context.return_value.pipeline.return_value
+        pipe.execute.return_value = [
+            True,
+            'foo',
+            ['b', 'a'],
+            True,
+            True,
+            'bar',
+            [],
+            True,
+        ]
+
+        ret = self.collector.collect()
+
+        self.assertEqual(ret, 2)
+        self.dispatcher.assert_called_once_with('foo', ['a', 'b'])
+        pipe.execute_command.assert_called_with('SELECT', 2)
+        pipe.lrange.assert_called_with('internal/results', -2, -1)
+        pipe.ltrim.assert_called_with('internal/results', 0, -3)
+        self.assertEqual(pipe.execute.call_count, 1)
+
+    def test_collect_no_scans(self, MockOpenvasDB):
+        self.main_db.get_scan_id_index.return_value = {}
+
+        ret = self.collector.collect()
+
+        self.assertEqual(ret, 0)
+        MockOpenvasDB.create_context.assert_not_called()
+        self.dispatcher.assert_not_called()
+
+    def test_collect_scan_id_from_kb(self, MockOpenvasDB):
+        # The kb was released and reused by another scan
+        self.main_db.get_scan_id_index.return_value = {'foo': 1}
+        pipe = MockOpenvasDB.create_context.return_value.pipeline.return_value
+        pipe.execute.return_value = [True, 'bar', ['a'], True]
+
+        self.collector.collect()
+
+        self.dispatcher.assert_called_once_with('bar', ['a'])
+        self.main_db.remove_scan_id_index.assert_called_once_with('foo')
+
+    def test_collect_without_scan_id(self, MockOpenvasDB):
+        self.main_db.get_scan_id_index.return_value = {'foo': 1}
+        pipe = MockOpenvasDB.create_context.return_value.pipeline.return_value
+        pipe.execute.return_value = [True, None, ['a'], True]
+
+        ret = self.collector.collect()
+
+        self.assertEqual(ret, 0)
+        self.dispatcher.assert_not_called()
+        self.main_db.remove_scan_id_index.assert_called_once_with('foo')
+
+    def test_collect_dispatcher_error(self, MockOpenvasDB):
+        self.main_db.get_scan_id_index.return_value = {'foo': 1, 'bar': 2}
+        pipe = MockOpenvasDB.create_context.return_value.pipeline.return_value
+        pipe.execute.return_value = [
+            True,
+            'foo',
+            ['a'],
+            True,
+            True,
+            'bar',
+            ['b'],
+            True,
+        ]
+        self.dispatcher.side_effect = [Exception('foo'), None]
+
+        ret = self.collector.collect()
+
+        self.assertEqual(ret, 2)
+        self.dispatcher.assert_called_with('bar', ['b'])
+
+    def test_run_stop(self, _MockOpenvasDB):
+        def collect():
+            self.collector.stop()
+            return 0
+
+        self.collector.collect = MagicMock(side_effect=collect)
+
+        self.collector.run()
+
+        self.collector.collect.assert_called_once_with()
+        self.main_db.increase_collector_cycle.assert_called_once_with()
+
+    @patch('ospd_openvas.collector.logger')
+    def test_run_collect_error(self, mock_logger, _MockOpenvasDB):
+        def collect():
+            self.collector.stop()
+            raise Exception('foo')
+
+        self.collector.collect = MagicMock(side_effect=collect)
+
+        self.collector.run()
+
+        self.main_db.increase_collector_cycle.assert_called_once_with()
+        mock_logger.exception.assert_called_once()
+
+    def test_wait_for_cycle(self, _MockOpenvasDB):
+        self.main_db.get_collector_cycle.side_effect = [3, 3, 4]
+
+        with patch('ospd_openvas.collector.time.sleep') as mock_sleep:
+            self.assertTrue(ResultCollector.wait_for_cycle(self.main_db))
+
+        mock_sleep.assert_called_once_with(0.1)
+
+    @patch('ospd_openvas.collector.logger')
+    def test_wait_for_cycle_timeout(self, mock_logger, _MockOpenvasDB):
+        self.main_db.get_collector_cycle.return_value = 3
+
+        ret = ResultCollector.wait_for_cycle(self.main_db, timeout=0)
+
+        self.assertFalse(ret)
+        mock_logger.warning.assert_called_once()
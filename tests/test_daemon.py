@@ -17,25 +17,41 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 
-# pylint: disable=invalid-name,line-too-long,no-value-for-parameter
+# pylint: disable=invalid-name,line-too-long,no-value-for-parameter,protected-access
 
 """ Unit Test for ospd-openvas """
 
 import io
 import logging
+import shutil
+import tempfile
+
 import psutil
 
+from pathlib import Path
+from typing import List
 from unittest import TestCase
-from unittest.mock import patch, Mock, MagicMock
+from unittest.mock import patch, call, Mock, MagicMock
+from xml.etree.ElementTree import Element
 
 from ospd.vts import Vts
 from ospd.protocol import OspRequest
+from ospd.xml import XmlStringHelper
 
 from tests.dummydaemon import DummyDaemon
 from tests.helper import assert_called_once
 
-from ospd_openvas.daemon import OSPD_PARAMS, OpenVasVtsFilter
+from ospd_openvas.daemon import (
+    OSPD_PARAMS,
+    RESULTS_CHUNK_SIZE,
+    RESULTS_MAX_CHUNKS,
+    RESULTS_WAIT_TIMEOUT,
+    OpenVasVtsFilter,
+)
+from ospd_openvas.db import ScanTick
 from ospd_openvas.openvas import Openvas
+from ospd_openvas.snapshot import VtSnapshot
+from ospd_openvas.vthelper import VtCache
 
 OSPD_PARAMS_OUT = {
     'auto_enable_dependencies': {
@@ -363,6 +379,124 @@ class TestOspdOpenvas(TestCase):
 
         self.assertTrue(w.sudo_available)
 
+    @patch('ospd_openvas.daemon.Openvas')
+    def test_init_parses_settings_once(self, mock_openvas):
+        mock_openvas.get_settings.return_value = {'plugins_folder': '/foo'}
+        w = DummyDaemon()
+        w.feed_lock = MagicMock()
+        w._load_vts_snapshot = MagicMock(return_value=False)
+        w.load_vts = MagicMock()
+
+        w.init(MagicMock())
+
+        assert_called_once(mock_openvas.get_settings)
+        mock_openvas.reload_settings.assert_not_called()
+        w.load_vts.assert_called_once_with(reload_settings=False)
+        self.assertTrue(w.initialized)
+
+    def test_load_vt_xml_store(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, str(temp_dir))
+
+        w = DummyDaemon()
+        w.vt_xml_store_path = temp_dir / 'vts-xml.store'
+        w._load_vt_xml_store('202101010000')
+        self.addCleanup(w.vt_xml_store.close)
+
+        vt_id = '1.3.6.1.4.1.25623.1.0.100061'
+        vt_xml = w.vt_xml_store.get_record(vt_id)
+        self.assertEqual(w.vt_xml_store.feed_version, '202101010000')
+        self.assertTrue(vt_xml.startswith(b'<vt id="%s">' % vt_id.encode()))
+        self.assertIn(b'<name>Mantis Detection</name>', vt_xml)
+
+        # The store of the feed version is reused
+        w.get_vt_iterator = MagicMock()
+        w._load_vt_xml_store('202101010000')
+        w.get_vt_iterator.assert_not_called()
+        self.assertEqual(w.vt_xml_store.get_record(vt_id), vt_xml)
+
+    def test_get_vt_iterator_xml_store(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, str(temp_dir))
+
+        w = DummyDaemon()
+        w.vt_xml_store_path = temp_dir / 'vts-xml.store'
+        w.set_vts_version('202101010000')
+        w._load_vt_xml_store('202101010000')
+        self.addCleanup(w.vt_xml_store.close)
+
+        vt_id = '1.3.6.1.4.1.25623.1.0.100061'
+        vt_xml = w.vt_xml_store.get_record(vt_id)
+
+        vts = list(w.get_vt_iterator([vt_id]))
+        self.assertEqual(vts, [(vt_id, vt_xml)])
+        self.assertEqual(
+            XmlStringHelper().add_element(w.get_vt_xml(vts[0])), vt_xml
+        )
+
+        # All VTs for an empty selection
+        self.assertEqual(list(w.get_vt_iterator()), [(vt_id, vt_xml)])
+
+        # VTs without details are not stored
+        vts = list(w.get_vt_iterator([vt_id], details=False))
+        self.assertEqual(vts[0][1]['name'], 'Mantis Detection')
+
+    @patch('ospd_openvas.daemon.VtHelper')
+    def test_get_vt_iterator_xml_store_missing(self, mock_vthelper):
+        w = DummyDaemon()
+        w.set_vts_version('202101010000')
+        w.vt_xml_store = MagicMock(feed_version='202101010000')
+        w.vt_xml_store.__contains__.side_effect = lambda oid: oid == '1.2'
+        w.vt_xml_store.get_record.side_effect = lambda oid: (
+            b'<vt id="1.2" />' if oid == '1.2' else None
+        )
+        vthelper = mock_vthelper.return_value
+        vthelper.get_vt_iterator.return_value = iter(
+            [('1.1', {'name': 'a'}), ('1.3', {'name': 'c'})]
+        )
+
+        vts = list(w.get_vt_iterator(['1.1', '1.2', '1.3', '1.4']))
+
+        # The selection order is kept and VTs skipped by the helper, e.g.
+        # the Notus drivers, are left out
+        self.assertEqual(
+            vts,
+            [
+                ('1.1', {'name': 'a'}),
+                ('1.2', b'<vt id="1.2" />'),
+                ('1.3', {'name': 'c'}),
+            ],
+        )
+        vthelper.get_vt_iterator.assert_called_once_with(
+            ['1.1', '1.3', '1.4'], True
+        )
+
+    def test_get_vts_command_all_vts(self):
+        w = DummyDaemon()
+
+        command = w.commands['get_vts']
+        response = b''.join(command.handle_xml(Element('get_vts')))
+
+        self.assertIn(b'<vts vts_version=', response)
+        self.assertIn(b'<vt id="1.3.6.1.4.1.25623.1.0.100061">', response)
+        self.assertIn(b'<name>Mantis Detection</name>', response)
+
+    def test_get_vts_command_all_vts_xml_store(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, str(temp_dir))
+
+        w = DummyDaemon()
+        w.vt_xml_store_path = temp_dir / 'vts-xml.store'
+        w.set_vts_version('202101010000')
+        w._load_vt_xml_store('202101010000')
+        self.addCleanup(w.vt_xml_store.close)
+        vt_xml = w.vt_xml_store.get_record('1.3.6.1.4.1.25623.1.0.100061')
+
+        command = w.commands['get_vts']
+        response = b''.join(command.handle_xml(Element('get_vts')))
+
+        self.assertIn(vt_xml + b'</vts>', response)
+
     def test_get_custom_xml(self):
         out = (
             '<custom>'
@@ -764,6 +898,92 @@ class TestOspdOpenvas(TestCase):
         self.assertEqual(mock_path_exists.call_count, 1)
         self.assertEqual(mock_path_open.call_count, 1)
 
+    @patch('ospd_openvas.daemon.NotusMetadataHandler')
+    @patch('ospd_openvas.daemon.Openvas')
+    def test_load_vts_snapshot(self, mock_openvas, _mock_notus):
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, str(temp_dir))
+
+        w = DummyDaemon()
+        w.vt_snapshot = VtSnapshot(temp_dir / 'vts-snapshot.json')
+        w.vt_xml_store_path = temp_dir / 'vts-xml.store'
+        w.nvti.get_feed_version.return_value = '202101010000'
+        w.feed_is_outdated = Mock(return_value=False)
+
+        # Nothing stored yet
+        self.assertFalse(w._load_vts_snapshot())
+
+        w.load_vts()
+        assert_called_once(mock_openvas.load_vts_into_redis)
+        vts_hash = w.vts.sha256_hash
+        vts_hash_data = w.vts_hash_data
+        filter_index = w.vts_filter.get_index()
+
+        w2 = DummyDaemon()
+        w2.vt_snapshot = w.vt_snapshot
+        w2.vt_xml_store_path = w.vt_xml_store_path
+        w2.nvti.get_feed_version.return_value = '202101010000'
+        w2.feed_is_outdated = Mock(return_value=False)
+
+        self.assertTrue(w2._load_vts_snapshot())
+        self.assertEqual(w2.vts.sha256_hash, vts_hash)
+        self.assertEqual(w2.vts_hash_data, vts_hash_data)
+        self.assertEqual(w2.get_vts_version(), '202101010000')
+        w2.nvti.set_family_index.assert_called_once_with(
+            w.nvti.get_family_index.return_value
+        )
+        self.assertEqual(
+            w2.vts_filter.get_filtered_vts_list(None, 'creation_time>1'),
+            w.vts_filter.get_filtered_vts_list(None, 'creation_time>1'),
+        )
+        self.assertEqual(
+            w2.vts_filter.get_index()['indexes'], filter_index['indexes']
+        )
+
+        # The feed on disk is newer
+        w2.feed_is_outdated.return_value = True
+        self.assertFalse(w2._load_vts_snapshot())
+
+    def test_load_vt_store(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, str(temp_dir))
+
+        w = DummyDaemon()
+        w.vt_store_path = temp_dir / 'vts.store'
+        w.nvti.get_nvt_raw_many.side_effect = lambda oids: (
+            (oid, (['mantis_detect.nasl'], None)) for oid in oids
+        )
+
+        w._load_vt_store('202101010000')
+
+        vt_store = w.nvti.set_vt_store.call_args[0][0]
+        self.addCleanup(vt_store.close)
+        self.assertEqual(vt_store.feed_version, '202101010000')
+        self.assertEqual(
+            vt_store.get('1.3.6.1.4.1.25623.1.0.100061'),
+            (['mantis_detect.nasl'], None),
+        )
+
+        # The store of the feed version is reused
+        w.nvti.get_nvt_raw_many.reset_mock()
+        w._load_vt_store('202101010000')
+        w.nvti.get_nvt_raw_many.assert_not_called()
+        self.addCleanup(w.nvti.set_vt_store.call_args[0][0].close)
+
+        # The store of another feed version is rebuilt
+        w._load_vt_store('202101020000')
+        w.nvti.get_nvt_raw_many.assert_called_once()
+        vt_store = w.nvti.set_vt_store.call_args[0][0]
+        self.addCleanup(vt_store.close)
+        self.assertEqual(vt_store.feed_version, '202101020000')
+
+    def test_load_vt_store_disabled(self):
+        w = DummyDaemon()
+
+        w._load_vt_store('202101010000')
+
+        w.nvti.set_vt_store.assert_not_called()
+
     def test_check_feed_cache_unavailable(self):
         w = DummyDaemon()
         w.vts.is_cache_available = False
@@ -800,6 +1020,69 @@ class TestOspdOpenvas(TestCase):
             value='Host dead',
         )
 
+    @patch('ospd_openvas.daemon.RESULTS_CHUNK_SIZE', 2)
+    @patch('ospd_openvas.daemon.BaseDB')
+    def test_get_openvas_result_chunks(self, MockDBClass):
+        w = DummyDaemon()
+
+        target_element = w.create_xml_target()
+        targets = OspRequest.process_target_element(target_element)
+        w.create_scan('123-456', targets, None, [])
+
+        result = "HOST_START|||192.168.0.1|||localhost||||||||| "
+        MockDBClass.get_result.side_effect = [
+            [result, result],
+            [result, result],
+            [result],
+        ]
+
+        with patch.object(
+            w.scan_collection, 'add_result_list'
+        ) as mock_add_result_list:
+            ret = w.report_openvas_results(MockDBClass, '123-456', timeout=1)
+
+        self.assertTrue(ret)
+        self.assertEqual(mock_add_result_list.call_count, 3)
+        self.assertEqual(MockDBClass.get_result.call_count, 3)
+        MockDBClass.get_result.assert_any_call(1, count=2)
+        MockDBClass.get_result.assert_called_with(None, count=2)
+
+    @patch('ospd_openvas.daemon.RESULTS_CHUNK_SIZE', 2)
+    @patch('ospd_openvas.daemon.BaseDB')
+    def test_get_openvas_result_max_chunks(self, MockDBClass):
+        w = DummyDaemon()
+
+        target_element = w.create_xml_target()
+        targets = OspRequest.process_target_element(target_element)
+        w.create_scan('123-456', targets, None, [])
+
+        result = "HOST_START|||192.168.0.1|||localhost||||||||| "
+        MockDBClass.get_result.return_value = [result, result]
+
+        with patch.object(w.scan_collection, 'add_result_list'):
+            ret = w.report_openvas_results(MockDBClass, '123-456', max_chunks=2)
+
+        self.assertTrue(ret)
+        self.assertEqual(MockDBClass.get_result.call_count, 2)
+
+    @patch('ospd_openvas.daemon.ResultList.add_scan_log_to_list')
+    def test_report_collected_results(self, mock_add_scan_log_to_list):
+        w = DummyDaemon()
+        w.collector_vt_cache = VtCache()
+
+        target_element = w.create_xml_target()
+        targets = OspRequest.process_target_element(target_element)
+        w.create_scan('123-456', targets, None, [])
+
+        w._report_collected_results(
+            '123-456',
+            ["HOST_START|||192.168.0.1|||localhost||||||||| "],
+        )
+
+        mock_add_scan_log_to_list.assert_called_with(
+            host='192.168.0.1', name='HOST_START', value=' '
+        )
+
     @patch('ospd_openvas.daemon.BaseDB')
     @patch('ospd_openvas.daemon.ResultList.add_scan_error_to_list')
     def test_get_openvas_result_host_deny(
@@ -911,6 +1194,43 @@ class TestOspdOpenvas(TestCase):
 
         assert_called_once(logging.Logger.warning)
 
+    @patch('ospd_openvas.daemon.BaseDB')
+    @patch('ospd_openvas.daemon.ResultList.add_scan_alarm_to_list')
+    def test_get_openvas_result_vt_cached(
+        self, mock_add_scan_alarm_to_list, MockDBClass
+    ):
+        w = DummyDaemon()
+
+        target_element = w.create_xml_target()
+        targets = OspRequest.process_target_element(target_element)
+        w.create_scan('123-456', targets, None, [])
+
+        results = [
+            "ALARM|||192.168.0.1|||localhost|||80/tcp|||"
+            "1.3.6.1.4.1.25623.1.0.100061|||some alarm",
+            "ALARM|||192.168.0.2|||localhost|||80/tcp|||"
+            "1.3.6.1.4.1.25623.1.0.100061|||some alarm",
+        ]
+        MockDBClass.get_result.return_value = results
+        mock_add_scan_alarm_to_list.return_value = None
+        w.nvti.QOD_TYPES = {'remote_banner': '80'}
+
+        w.report_openvas_results(MockDBClass, '123-456')
+
+        assert_called_once(w.nvti.get_nvt_summary)
+        self.assertEqual(mock_add_scan_alarm_to_list.call_count, 2)
+        mock_add_scan_alarm_to_list.assert_called_with(
+            host='192.168.0.2',
+            hostname='localhost',
+            name='Mantis Detection',
+            value='some alarm',
+            port='80/tcp',
+            test_id='1.3.6.1.4.1.25623.1.0.100061',
+            severity=0.0,
+            qod='80',
+            uri='',
+        )
+
     @patch('ospd_openvas.db.KbDB')
     def test_openvas_is_alive_already_stopped(self, mock_db):
         w = DummyDaemon()
@@ -966,6 +1286,182 @@ class TestOspdOpenvas(TestCase):
             '123-456', ['192.168.0.3', '192.168.0.4']
         )
 
+    @patch('ospd_openvas.daemon.ResultCollector')
+    def test_take_kb_from_collector(self, mock_collector):
+        w = DummyDaemon()
+        calls = MagicMock()
+        w.main_db.remove_scan_id_index = calls.remove_scan_id_index
+        mock_collector.wait_for_cycle = calls.wait_for_cycle
+        w.report_openvas_results = calls.report_openvas_results
+        kbdb = MagicMock()
+
+        w._take_kb_from_collector(kbdb, '123-456')
+
+        self.assertEqual(
+            [name for name, _, _ in calls.mock_calls],
+            [
+                'remove_scan_id_index',
+                'wait_for_cycle',
+                'report_openvas_results',
+            ],
+        )
+        calls.report_openvas_results.assert_called_once_with(kbdb, '123-456')
+
+    def test_stop_killed_scan(self):
+        w = DummyDaemon()
+        w.add_scan_error = MagicMock()
+        kbdb = MagicMock()
+        scan_db = MagicMock()
+        kbdb.get_scan_databases.return_value = [scan_db]
+
+        w._stop_killed_scan(kbdb, '123-456')
+
+        kbdb.stop_scan.assert_called_once_with('123-456')
+        assert_called_once(w.add_scan_error)
+        w.main_db.release_database.assert_any_call(scan_db)
+        w.main_db.release_database.assert_called_with(kbdb, scan_id='123-456')
+
+    @staticmethod
+    def _prepare_exec_scan(w: DummyDaemon, ticks: List[ScanTick]) -> Mock:
+        """Mock the helpers used by exec_scan and return the kb of the
+        scan, which returns the given ticks."""
+        w._is_running_as_root = True
+        w.is_openvas_process_alive = MagicMock(return_value=True)
+        w._report_openvas_results_chunk = MagicMock()
+        w._report_openvas_scan_status = MagicMock()
+        w.report_openvas_results = MagicMock()
+
+        kbdb = w.main_db.get_new_kb_database.return_value
+        kbdb.scan_is_stopped.return_value = False
+        kbdb.get_status.return_value = 'ready'
+        kbdb.get_scan_tick.side_effect = ticks
+
+        return kbdb
+
+    @patch('ospd_openvas.daemon.time')
+    @patch('ospd_openvas.daemon.Openvas')
+    @patch('ospd_openvas.daemon.PreferenceHandler')
+    def test_exec_scan(self, _mock_prefs, _mock_openvas, mock_time):
+        w = DummyDaemon()
+        kbdb = self._prepare_exec_scan(
+            w,
+            [
+                ScanTick('ready', [], []),
+                ScanTick('ready', ['LOG|||a'], ['1.1.1.1/1/10']),
+                ScanTick('finished', [], []),
+            ],
+        )
+
+        w.exec_scan('123-456')
+
+        kbdb.get_scan_tick.assert_called_with('123-456', RESULTS_CHUNK_SIZE)
+        self.assertEqual(kbdb.get_scan_tick.call_count, 3)
+        # Only the iteration without results waits for them
+        w.report_openvas_results.assert_called_once_with(
+            kbdb,
+            '123-456',
+            timeout=RESULTS_WAIT_TIMEOUT,
+            max_chunks=RESULTS_MAX_CHUNKS,
+        )
+        assert_called_once(w._report_openvas_results_chunk)
+        self.assertEqual(
+            w._report_openvas_results_chunk.call_args[0][:2],
+            (['LOG|||a'], '123-456'),
+        )
+        w._report_openvas_scan_status.assert_any_call(
+            '123-456', ['1.1.1.1/1/10']
+        )
+        mock_time.sleep.assert_not_called()
+        w.main_db.release_database.assert_called_once_with(
+            kbdb, scan_id='123-456'
+        )
+
+    @patch('ospd_openvas.daemon.time')
+    @patch('ospd_openvas.daemon.Openvas')
+    @patch('ospd_openvas.daemon.PreferenceHandler')
+    def test_exec_scan_full_chunk(self, _mock_prefs, _mock_openvas, _time):
+        w = DummyDaemon()
+        results = ['LOG|||a'] * RESULTS_CHUNK_SIZE
+        kbdb = self._prepare_exec_scan(
+            w,
+            [ScanTick('ready', results, []), ScanTick('finished', results, [])],
+        )
+
+        w.exec_scan('123-456')
+
+        # The remaining results are taken without waiting, all of them
+        # once the scan finished
+        self.assertEqual(
+            w.report_openvas_results.call_args_list,
+            [
+                call(kbdb, '123-456', max_chunks=RESULTS_MAX_CHUNKS),
+                call(kbdb, '123-456', max_chunks=None),
+            ],
+        )
+        w.main_db.release_database.assert_called_once_with(
+            kbdb, scan_id='123-456'
+        )
+
+    @patch('ospd_openvas.daemon.time')
+    @patch('ospd_openvas.daemon.Openvas')
+    @patch('ospd_openvas.daemon.PreferenceHandler')
+    def test_exec_scan_stopped(self, _mock_prefs, _mock_openvas, mock_time):
+        w = DummyDaemon()
+        kbdb = self._prepare_exec_scan(w, [ScanTick('stop_all', [], [])])
+        kbdb.target_is_finished.side_effect = [False, True]
+
+        w.exec_scan('123-456')
+
+        # The kb is released once openvas finished
+        mock_time.sleep.assert_called_once_with(1)
+        self.assertEqual(kbdb.target_is_finished.call_count, 2)
+        w._report_openvas_results_chunk.assert_not_called()
+        w.main_db.release_database.assert_called_once_with(
+            kbdb, scan_id='123-456'
+        )
+
+    @patch('ospd_openvas.daemon.time')
+    @patch('ospd_openvas.daemon.Openvas')
+    @patch('ospd_openvas.daemon.PreferenceHandler')
+    def test_exec_scan_killed(self, _mock_prefs, mock_openvas, _mock_time):
+        w = DummyDaemon()
+        kbdb = self._prepare_exec_scan(w, [ScanTick('ready', [], [])])
+        w.is_openvas_process_alive.return_value = False
+        w._stop_killed_scan = MagicMock()
+
+        w.exec_scan('123-456')
+
+        w.is_openvas_process_alive.assert_called_once_with(
+            kbdb, mock_openvas.start_scan.return_value.pid, '123-456'
+        )
+        w._stop_killed_scan.assert_called_once_with(kbdb, '123-456')
+        w._report_openvas_results_chunk.assert_not_called()
+        w.main_db.release_database.assert_not_called()
+
+    @patch('ospd_openvas.daemon.time')
+    @patch('ospd_openvas.daemon.Openvas')
+    @patch('ospd_openvas.daemon.PreferenceHandler')
+    def test_exec_scan_result_collector(
+        self, _mock_prefs, _mock_openvas, mock_time
+    ):
+        w = DummyDaemon()
+        w.result_collector = MagicMock()
+        w._take_kb_from_collector = MagicMock()
+        kbdb = self._prepare_exec_scan(
+            w, [ScanTick('ready', [], []), ScanTick('finished', [], [])]
+        )
+
+        w.exec_scan('123-456')
+
+        # The results are left to the collector
+        kbdb.get_scan_tick.assert_called_with('123-456', 0)
+        mock_time.sleep.assert_called_once_with(RESULTS_WAIT_TIMEOUT)
+        w.report_openvas_results.assert_not_called()
+        w._take_kb_from_collector.assert_called_once_with(kbdb, '123-456')
+        w.main_db.release_database.assert_called_once_with(
+            kbdb, scan_id='123-456'
+        )
+
 
 class TestFilters(TestCase):
     def test_format_vt_modification_time(self):
@@ -994,6 +1490,98 @@ class TestFilters(TestCase):
         )
         self.assertIn('1.3.6.1.4.1.25623.1.0.100061', res)
 
+    def test_get_filtered_vts_index(self):
+        w = DummyDaemon()
+        w.nvti.get_oids.return_value = [
+            ('a.nasl', '1.2.3.1'),
+            ('b.nasl', '1.2.3.2'),
+            ('c.nasl', '1.2.3.3'),
+            ('d.nasl', '1.2.3.4'),
+        ]
+        tags = {
+            '1.2.3.1': {'creation_date': '30', 'last_modification': '1'},
+            '1.2.3.2': {'creation_date': '10', 'last_modification': '1'},
+            '1.2.3.3': {'creation_date': '20'},
+            '1.2.3.4': None,
+        }
+        w.nvti.get_nvt_tags_many.side_effect = lambda oids: (
+            (oid, tags[oid]) for oid in oids
+        )
+
+        ovfilter = OpenVasVtsFilter(w.nvti)
+        ovfilter.load_index()
+
+        self.assertEqual(
+            ovfilter.get_filtered_vts_list(None, "creation_time>10"),
+            ['1.2.3.1', '1.2.3.3'],
+        )
+        self.assertEqual(
+            ovfilter.get_filtered_vts_list(None, "creation_time<30"),
+            ['1.2.3.2', '1.2.3.3'],
+        )
+        self.assertEqual(
+            ovfilter.get_filtered_vts_list(None, "creation_time=20"),
+            ['1.2.3.3'],
+        )
+        self.assertEqual(
+            ovfilter.get_filtered_vts_list(
+                None, "creation_time>10;modification_time>0"
+            ),
+            ['1.2.3.1'],
+        )
+        w.nvti.get_nvt_tags_many.assert_called_once()
+
+    def test_get_filtered_vts_index_invalid_value(self):
+        w = DummyDaemon()
+        w.nvti.get_oids.return_value = [
+            ('a.nasl', '1.2.3.1'),
+            ('b.nasl', '1.2.3.2'),
+        ]
+        tags = {
+            '1.2.3.1': {'creation_date': '20', 'last_modification': 'foo'},
+            '1.2.3.2': {'creation_date': '30', 'last_modification': '5'},
+        }
+        w.nvti.get_nvt_tags_many.side_effect = lambda oids: (
+            (oid, tags[oid]) for oid in oids
+        )
+
+        ovfilter = OpenVasVtsFilter(w.nvti)
+        ovfilter.load_index()
+
+        # Only the invalid value is left out of the index
+        self.assertEqual(
+            ovfilter.get_filtered_vts_list(None, "modification_time>1"),
+            ['1.2.3.2'],
+        )
+        self.assertEqual(
+            ovfilter.get_filtered_vts_list(None, "creation_time>10"),
+            ['1.2.3.1', '1.2.3.2'],
+        )
+
+    def test_get_filtered_vts_index_without_drivers(self):
+        w = DummyDaemon()
+        w.nvti.get_oids.return_value = [
+            ('a.nasl', '1.2.3.1'),
+            ('notus_driver.nasl', '1.2.3.2'),
+        ]
+        w.nvti.get_notus_family_driver_linkers.return_value = {
+            'Some family': '1.2.3.2'
+        }
+        w.nvti.get_nvt_tags_many.side_effect = lambda oids: (
+            (oid, {'creation_date': '30'}) for oid in oids
+        )
+
+        ovfilter = OpenVasVtsFilter(w.nvti)
+        ovfilter.load_index()
+
+        self.assertEqual(
+            ovfilter.get_filtered_vts_list(None, "creation_time>10"),
+            ['1.2.3.1'],
+        )
+        self.assertEqual(
+            list(w.nvti.get_nvt_tags_many.call_args[0][0]), ['1.2.3.1']
+        )
+
     def test_get_severity_score_v2(self):
         w = DummyDaemon()
         vtaux = {
@@ -1006,6 +1594,18 @@ class TestFilters(TestCase):
         a = w.get_severity_score(vtaux)
         self.assertEqual(w.get_severity_score(vtaux), 5.0)
 
+    def test_get_severity_score_precalculated(self):
+        w = DummyDaemon()
+        vtaux = {
+            'severities': {
+                'severity_type': 'cvss_base_v2',
+                'severity_base_vector': 'AV:N/AC:L/Au:N/C:P/I:N/A:N',
+            },
+            'severity_score': 4.2,
+        }
+
+        self.assertEqual(w.get_severity_score(vtaux), 4.2)
+
     def test_get_severity_score_v3(self):
         w = DummyDaemon()
         vtaux = {
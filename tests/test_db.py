@@ -29,14 +29,27 @@ from unittest.mock import patch, MagicMock
 from redis.exceptions import ConnectionError as RCE
 
 from ospd.errors import RequiredArgument
-from ospd_openvas.db import OpenvasDB, MainDB, ScanDB, KbDB, DBINDEX_NAME, time
+from ospd_openvas.db import (
+    OpenvasDB,
+    MainDB,
+    ScanDB,
+    KbDB,
+    ScanTick,
+    DBINDEX_NAME,
+    SCAN_COUNT,
+    time,
+)
 from ospd_openvas.errors import OspdOpenvasError
+from ospd_openvas.scanregistry import SCANID_INDEX_NAME
 
 from tests.helper import assert_called
 
 
 @patch('ospd_openvas.db.redis.Redis')
 class TestOpenvasDB(TestCase):
+    def setUp(self):
+        OpenvasDB._connection_pools = {}  # pylint: disable=protected-access
+
     @patch('ospd_openvas.db.Openvas')
     def test_get_db_connection(
         self, mock_openvas: MagicMock, mock_redis: MagicMock
@@ -76,6 +89,42 @@ class TestOpenvasDB(TestCase):
         ret = OpenvasDB.create_context()
         self.assertIs(ret, ctx)
 
+    @patch('ospd_openvas.db.redis.ConnectionPool')
+    def test_create_context_reuse_pool(self, mock_pool, mock_redis):
+        ctx = mock_redis.return_value
+
+        OpenvasDB.create_context(3)
+        OpenvasDB.create_context(3)
+        OpenvasDB.create_context(4)
+
+        self.assertEqual(mock_pool.call_count, 2)
+        self.assertEqual(ctx.ping.call_count, 2)
+        mock_redis.assert_called_with(connection_pool=mock_pool.return_value)
+        ctx.keys.assert_not_called()
+
+    @patch('ospd_openvas.db.redis.ConnectionPool')
+    def test_create_context_not_shared(self, mock_pool, mock_redis):
+        OpenvasDB.create_context(3, shared=False)
+        OpenvasDB.create_context(3, shared=False)
+
+        self.assertEqual(mock_pool.call_count, 2)
+        self.assertEqual(
+            OpenvasDB._connection_pools, {}  # pylint: disable=protected-access
+        )
+
+    @patch('ospd_openvas.db.redis.ConnectionPool')
+    def test_create_context_fail_no_pool(self, mock_pool, mock_redis):
+        ctx = mock_redis.return_value
+        ctx.ping.side_effect = RCE
+
+        with patch.object(time, 'sleep', return_value=None):
+            with self.assertRaises(SystemExit):
+                OpenvasDB.create_context(3)
+
+        self.assertEqual(
+            OpenvasDB._connection_pools, {}  # pylint: disable=protected-access
+        )
+
     def test_select_database_error(self, mock_redis):
         with self.assertRaises(RequiredArgument):
             OpenvasDB.select_database(None, 1)
@@ -239,6 +288,66 @@ class TestOpenvasDB(TestCase):
         pipeline.delete.assert_called_once_with('results')
         assert_called(pipeline.execute)
 
+    def test_pop_list_items_chunk(self, mock_redis):
+        ctx = mock_redis.return_value
+        pipeline = ctx.pipeline.return_value
+        pipeline.execute.return_value = [['c', 'b'], True]
+
+        ret = OpenvasDB.pop_list_items_chunk(ctx, 'results', 2)
+
+        # reversed list
+        self.assertEqual(ret, ['b', 'c'])
+
+        pipeline.lrange.assert_called_once_with('results', -2, -1)
+        pipeline.ltrim.assert_called_once_with('results', 0, -3)
+
+    def test_pop_list_items_chunk_no_results(self, mock_redis):
+        ctx = mock_redis.return_value
+        pipeline = ctx.pipeline.return_value
+        pipeline.execute.return_value = [[], True]
+
+        ret = OpenvasDB.pop_list_items_chunk(ctx, 'results', 2)
+
+        self.assertEqual(ret, [])
+
+    def test_pop_list_items_chunk_error(self, mock_redis):
+        ctx = mock_redis.return_value
+
+        with self.assertRaises(RequiredArgument):
+            OpenvasDB.pop_list_items_chunk(None, 'results', 2)
+
+        with self.assertRaises(RequiredArgument):
+            OpenvasDB.pop_list_items_chunk(ctx, None, 2)
+
+        with self.assertRaises(RequiredArgument):
+            OpenvasDB.pop_list_items_chunk(ctx, 'results', 0)
+
+    def test_wait_list_item(self, mock_redis):
+        ctx = mock_redis.return_value
+        ctx.brpop.return_value = ('results', 'a')
+
+        ret = OpenvasDB.wait_list_item(ctx, 'results', 1)
+
+        self.assertEqual(ret, 'a')
+        ctx.brpop.assert_called_once_with('results', timeout=1)
+
+    def test_wait_list_item_timeout(self, mock_redis):
+        ctx = mock_redis.return_value
+        ctx.brpop.return_value = None
+
+        ret = OpenvasDB.wait_list_item(ctx, 'results', 1)
+
+        self.assertIsNone(ret)
+
+    def test_wait_list_item_error(self, mock_redis):
+        ctx = mock_redis.return_value
+
+        with self.assertRaises(RequiredArgument):
+            OpenvasDB.wait_list_item(None, 'results', 1)
+
+        with self.assertRaises(RequiredArgument):
+            OpenvasDB.wait_list_item(ctx, None, 1)
+
     def test_set_single_item(self, mock_redis):
         ctx = mock_redis.return_value
         pipeline = ctx.pipeline.return_value
@@ -254,12 +363,14 @@ class TestOpenvasDB(TestCase):
 
     def test_get_pattern(self, mock_redis):
         ctx = mock_redis.return_value
-        ctx.keys.return_value = ['a', 'b']
-        ctx.lrange.return_value = [1, 2, 3]
+        ctx.scan_iter.return_value = iter(['a', 'b', 'a'])
+        pipeline = ctx.pipeline.return_value
+        pipeline.execute.return_value = [[1, 2, 3], [4, 5]]
 
         ret = OpenvasDB.get_pattern(ctx, 'a')
 
-        self.assertEqual(ret, [['a', [1, 2, 3]], ['b', [1, 2, 3]]])
+        self.assertEqual(ret, [['a', [1, 2, 3]], ['b', [4, 5]]])
+        ctx.keys.assert_not_called()
 
     def test_get_pattern_error(self, mock_redis):
         ctx = mock_redis.return_value
@@ -278,12 +389,87 @@ class TestOpenvasDB(TestCase):
 
     def test_get_filenames_and_oids(self, mock_redis):
         ctx = mock_redis.return_value
-        ctx.keys.return_value = ['nvt:1', 'nvt:2']
-        ctx.lindex.side_effect = ['aa', 'ab']
+        ctx.scan_iter.return_value = iter(['nvt:1', 'nvt:2'])
+        pipeline = ctx.pipeline.return_value
+        pipeline.execute.return_value = ['aa', 'ab']
 
         ret = OpenvasDB.get_filenames_and_oids(ctx)
 
         self.assertEqual(list(ret), [('aa', '1'), ('ab', '2')])
+        pipeline.lindex.assert_called_with('nvt:2', 0)
+
+    def test_set_lists_many(self, mock_redis):
+        ctx = mock_redis.return_value
+        pipeline = ctx.pipeline.return_value
+
+        OpenvasDB.set_lists_many(
+            ctx, [('foo', ['a', 'b']), ('bar', ['c']), ('baz', [1])], 2
+        )
+
+        self.assertEqual(pipeline.execute.call_count, 2)
+        pipeline.delete.assert_any_call('foo')
+        pipeline.rpush.assert_any_call('foo', 'a', 'b')
+        pipeline.rpush.assert_called_with('baz', 1)
+        ctx.pipeline.assert_called_with(transaction=False)
+
+    def test_set_lists_many_error(self, mock_redis):
+        with self.assertRaises(RequiredArgument):
+            OpenvasDB.set_lists_many(None, [('foo', ['a'])])
+
+    def test_get_list_items_many(self, mock_redis):
+        ctx = mock_redis.return_value
+        pipeline = ctx.pipeline.return_value
+        pipeline.execute.side_effect = [[['a'], ['b']], [['c']]]
+
+        ret = OpenvasDB.get_list_items_many(
+            ctx, ['foo', 'bar', 'baz'], chunk_size=2
+        )
+
+        self.assertEqual(list(ret), [['a'], ['b'], ['c']])
+        self.assertEqual(pipeline.execute.call_count, 2)
+        pipeline.lrange.assert_called_with('baz', 0, -1)
+
+    def test_get_list_items_many_error(self, mock_redis):
+        with self.assertRaises(RequiredArgument):
+            list(OpenvasDB.get_list_items_many(None, ['foo']))
+
+    def test_get_single_items_many(self, mock_redis):
+        ctx = mock_redis.return_value
+        pipeline = ctx.pipeline.return_value
+        pipeline.execute.side_effect = [['a', None], ['c']]
+
+        ret = OpenvasDB.get_single_items_many(
+            ctx, ['foo', 'bar', 'baz'], index=3, chunk_size=2
+        )
+
+        self.assertEqual(list(ret), ['a', None, 'c'])
+        self.assertEqual(pipeline.execute.call_count, 2)
+        pipeline.lindex.assert_called_with('baz', 3)
+
+    def test_get_single_items_many_error(self, mock_redis):
+        with self.assertRaises(RequiredArgument):
+            list(OpenvasDB.get_single_items_many(None, ['foo']))
+
+    def test_get_list_items_by_index(self, mock_redis):
+        ctx = mock_redis.return_value
+        pipeline = ctx.pipeline.return_value
+        pipeline.execute.return_value = ['a', 'b']
+
+        ret = OpenvasDB.get_list_items_by_index(ctx, 'foo', [7, 14])
+
+        self.assertEqual(ret, ['a', 'b'])
+        ctx.pipeline.assert_called_with(transaction=False)
+        pipeline.lindex.assert_any_call('foo', 7)
+        pipeline.lindex.assert_called_with('foo', 14)
+
+    def test_get_list_items_by_index_error(self, mock_redis):
+        ctx = mock_redis.return_value
+
+        with self.assertRaises(RequiredArgument):
+            OpenvasDB.get_list_items_by_index(None, 'foo', [1])
+
+        with self.assertRaises(RequiredArgument):
+            OpenvasDB.get_list_items_by_index(ctx, None, [1])
 
     def test_get_keys_by_pattern_error(self, mock_redis):
         ctx = mock_redis.return_value
@@ -296,40 +482,45 @@ class TestOpenvasDB(TestCase):
 
     def test_get_keys_by_pattern(self, mock_redis):
         ctx = mock_redis.return_value
-        ctx.keys.return_value = ['nvt:2', 'nvt:1']
+        ctx.scan_iter.return_value = iter(['nvt:2', 'nvt:1', 'nvt:2'])
 
         ret = OpenvasDB.get_keys_by_pattern(ctx, 'nvt:*')
 
-        # Return sorted list
+        # Return sorted list without duplicates
         self.assertEqual(ret, ['nvt:1', 'nvt:2'])
+        ctx.keys.assert_not_called()
 
     def test_get_key_count(self, mock_redis):
         ctx = mock_redis.return_value
 
-        ctx.keys.return_value = ['aa', 'ab']
+        ctx.scan_iter.return_value = iter(['aa', 'ab'])
 
         ret = OpenvasDB.get_key_count(ctx, "foo")
 
         self.assertEqual(ret, 2)
-        ctx.keys.assert_called_with('foo')
+        ctx.scan_iter.assert_called_with(match='foo', count=SCAN_COUNT)
 
     def test_get_key_count_with_default_pattern(self, mock_redis):
         ctx = mock_redis.return_value
 
-        ctx.keys.return_value = ['aa', 'ab']
+        ctx.scan_iter.return_value = iter(['aa', 'ab'])
 
         ret = OpenvasDB.get_key_count(ctx)
 
         self.assertEqual(ret, 2)
-        ctx.keys.assert_called_with('*')
+        ctx.scan_iter.assert_called_with(match='*', count=SCAN_COUNT)
 
     def test_get_key_count_error(self, mock_redis):
         with self.assertRaises(RequiredArgument):
             OpenvasDB.get_key_count(None)
 
+    def test_iter_keys_error(self, mock_redis):
+        with self.assertRaises(RequiredArgument):
+            OpenvasDB.iter_keys(None)
+
     def test_find_database_by_pattern_none(self, mock_redis):
         ctx = mock_redis.return_value
-        ctx.keys.return_value = None
+        ctx.scan_iter.side_effect = lambda match, count: iter([])
 
         new_ctx, index = OpenvasDB.find_database_by_pattern('foo*', 123)
 
@@ -339,8 +530,7 @@ class TestOpenvasDB(TestCase):
     def test_find_database_by_pattern(self, mock_redis):
         ctx = mock_redis.return_value
 
-        # keys is called twice per iteration
-        ctx.keys.side_effect = [None, None, None, None, True, True]
+        ctx.scan_iter.side_effect = [iter([]), iter([]), iter(['foo'])]
 
         new_ctx, index = OpenvasDB.find_database_by_pattern('foo*', 123)
 
@@ -372,6 +562,47 @@ class ScanDBTestCase(TestCase):
             self.ctx, 'internal/results'
         )
 
+    def test_get_result_wait(self, mock_openvas_db):
+        mock_openvas_db.wait_list_item.return_value = 'a'
+        mock_openvas_db.pop_list_items.return_value = ['b', 'c']
+
+        ret = self.db.get_result(timeout=1)
+
+        self.assertEqual(ret, ['a', 'b', 'c'])
+        mock_openvas_db.wait_list_item.assert_called_with(
+            self.ctx, 'internal/results', 1
+        )
+
+    def test_get_result_chunk(self, mock_openvas_db):
+        mock_openvas_db.pop_list_items_chunk.return_value = ['a', 'b']
+
+        ret = self.db.get_result(count=2)
+
+        self.assertEqual(ret, ['a', 'b'])
+        mock_openvas_db.pop_list_items_chunk.assert_called_with(
+            self.ctx, 'internal/results', 2
+        )
+        mock_openvas_db.pop_list_items.assert_not_called()
+
+    def test_get_result_wait_chunk(self, mock_openvas_db):
+        mock_openvas_db.wait_list_item.return_value = 'a'
+        mock_openvas_db.pop_list_items_chunk.return_value = ['b']
+
+        ret = self.db.get_result(timeout=1, count=2)
+
+        self.assertEqual(ret, ['a', 'b'])
+        mock_openvas_db.pop_list_items_chunk.assert_called_with(
+            self.ctx, 'internal/results', 1
+        )
+
+    def test_get_result_wait_timeout(self, mock_openvas_db):
+        mock_openvas_db.wait_list_item.return_value = None
+
+        ret = self.db.get_result(timeout=1)
+
+        self.assertEqual(ret, [])
+        mock_openvas_db.pop_list_items.assert_not_called()
+
     def test_get_status(self, mock_openvas_db):
         mock_openvas_db.get_single_item.return_value = 'some status'
 
@@ -388,7 +619,9 @@ class ScanDBTestCase(TestCase):
         self.assertIs(ret, self.db)
         self.assertEqual(self.db.index, 11)
 
-        mock_openvas_db.select_database.assert_called_with(self.ctx, 11)
+        mock_openvas_db.create_context.assert_called_with(11)
+        self.assertIs(self.db.ctx, mock_openvas_db.create_context.return_value)
+        mock_openvas_db.select_database.assert_not_called()
 
     def test_flush(self, mock_openvas_db):
         self.db.flush()
@@ -577,6 +810,50 @@ class KbDBTestCase(TestCase):
             self.ctx, 'internal/foo'
         )
 
+    def test_get_scan_tick(self, mock_openvas_db):
+        pipeline = self.ctx.pipeline.return_value
+        pipeline.execute.return_value = [
+            'ready',
+            ['192.168.0.1/20/120', '192.168.0.1/10/120'],
+            2,
+            ['b', 'a'],
+            True,
+        ]
+
+        ret = self.db.get_scan_tick('foo', 2)
+
+        self.assertEqual(
+            ret,
+            ScanTick(
+                'ready',
+                ['a', 'b'],
+                ['192.168.0.1/10/120', '192.168.0.1/20/120'],
+            ),
+        )
+        self.assertFalse(ret.finished)
+        self.assertFalse(ret.stopped)
+        pipeline.lindex.assert_called_once_with('internal/foo', 0)
+        pipeline.lrange.assert_any_call('internal/results', -2, -1)
+        pipeline.ltrim.assert_called_once_with('internal/results', 0, -3)
+        pipeline.delete.assert_called_once_with('internal/status')
+
+    def test_get_scan_tick_without_results(self, mock_openvas_db):
+        pipeline = self.ctx.pipeline.return_value
+        pipeline.execute.return_value = [None, [], 0]
+
+        ret = self.db.get_scan_tick('foo')
+
+        self.assertEqual(ret, ScanTick(None, [], []))
+        self.assertTrue(ret.finished)
+        pipeline.lrange.assert_called_once_with('internal/status', 0, -1)
+        pipeline.ltrim.assert_not_called()
+
+    def test_scan_tick_stopped(self, mock_openvas_db):
+        tick = ScanTick('stop_all', [], [])
+
+        self.assertTrue(tick.stopped)
+        self.assertFalse(tick.finished)
+
     def test_get_scan_databases(self, mock_openvas_db):
         mock_openvas_db.get_list_item.return_value = [
             '4',
@@ -679,6 +956,18 @@ class MainDBTestCase(TestCase):
         ctx.hdel.assert_called_once_with(DBINDEX_NAME, 3)
         db.flush.assert_called_with()
 
+    def test_release_database_with_scan_id(self, mock_redis):
+        ctx = mock_redis.return_value
+
+        db = MagicMock()
+        db.index = 3
+        maindb = MainDB(ctx)
+        maindb.release_database(db, scan_id='foo')
+
+        ctx.hdel.assert_any_call(SCANID_INDEX_NAME, 'foo')
+        ctx.hdel.assert_called_with(DBINDEX_NAME, 3)
+        db.flush.assert_called_with()
+
     def test_release(self, mock_redis):
         ctx = mock_redis.return_value
 
@@ -719,37 +1008,71 @@ class MainDBTestCase(TestCase):
         self, mock_openvas_db, mock_redis
     ):
         ctx = mock_redis.return_value
+        ctx.hget.return_value = None
 
-        new_ctx = 'bar'  # just some object to compare
-        mock_openvas_db.create_context.return_value = new_ctx
-        mock_openvas_db.get_key_count.return_value = None
+        new_ctx = mock_openvas_db.create_context.return_value
+        new_ctx.exists.return_value = 0
 
         maindb = MainDB(ctx)
         maindb._max_dbindex = 2  # pylint: disable=protected-access
 
         kbdb = maindb.find_kb_database_by_scan_id('foo')
 
-        mock_openvas_db.get_key_count.assert_called_once_with(
-            new_ctx, 'internal/foo'
-        )
+        ctx.hget.assert_called_once_with(SCANID_INDEX_NAME, 'foo')
+        new_ctx.exists.assert_called_once_with('internal/foo')
 
         self.assertIsNone(kbdb)
 
     @patch('ospd_openvas.db.OpenvasDB')
     def test_find_kb_database_by_scan_id(self, mock_openvas_db, mock_redis):
         ctx = mock_redis.return_value
+        ctx.hget.return_value = None
 
-        new_ctx = 'foo'  # just some object to compare
-        mock_openvas_db.create_context.return_value = new_ctx
-        mock_openvas_db.get_key_count.side_effect = [0, 1]
+        new_ctx = mock_openvas_db.create_context.return_value
+        new_ctx.exists.side_effect = [0, 1]
 
         maindb = MainDB(ctx)
         maindb._max_dbindex = 3  # pylint: disable=protected-access
 
         kbdb = maindb.find_kb_database_by_scan_id('foo')
 
-        mock_openvas_db.get_key_count.assert_called_with(
-            new_ctx, 'internal/foo'
-        )
+        new_ctx.exists.assert_called_with('internal/foo')
         self.assertEqual(kbdb.index, 2)
         self.assertIs(kbdb.ctx, new_ctx)
+
+    @patch('ospd_openvas.db.OpenvasDB')
+    def test_find_kb_database_by_scan_id_registered(
+        self, mock_openvas_db, mock_redis
+    ):
+        ctx = mock_redis.return_value
+        ctx.hget.return_value = '5'
+
+        new_ctx = mock_openvas_db.create_context.return_value
+        new_ctx.exists.return_value = 1
+
+        maindb = MainDB(ctx)
+        maindb._max_dbindex = 64  # pylint: disable=protected-access
+
+        kbdb = maindb.find_kb_database_by_scan_id('foo')
+
+        mock_openvas_db.create_context.assert_called_once_with(5)
+        self.assertEqual(kbdb.index, 5)
+        self.assertIs(kbdb.ctx, new_ctx)
+
+    @patch('ospd_openvas.db.OpenvasDB')
+    def test_find_kb_database_by_scan_id_stale(
+        self, mock_openvas_db, mock_redis
+    ):
+        ctx = mock_redis.return_value
+        ctx.hget.return_value = '2'
+
+        new_ctx = mock_openvas_db.create_context.return_value
+        # registered kb was reused by another scan, the scan is in kb 1
+        new_ctx.exists.side_effect = [0, 1]
+
+        maindb = MainDB(ctx)
+        maindb._max_dbindex = 3  # pylint: disable=protected-access
+
+        kbdb = maindb.find_kb_database_by_scan_id('foo')
+
+        self.assertEqual(kbdb.index, 1)
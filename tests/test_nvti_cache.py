@@ -21,6 +21,7 @@
 
 """ Unit Test for ospd-openvas """
 
+import json
 import logging
 
 from unittest import TestCase
@@ -28,7 +29,11 @@ from unittest.mock import patch, Mock, PropertyMock
 from pathlib import Path
 
 from ospd_openvas.errors import OspdOpenvasError
-from ospd_openvas.nvticache import NVTICache, NVTI_CACHE_NAME
+from ospd_openvas.nvticache import (
+    NVTICache,
+    NVTI_CACHE_NAME,
+    _parse_metadata_tags,
+)
 
 from tests.helper import assert_called
 
@@ -85,32 +90,20 @@ class TestNVTICache(TestCase):
         logging.Logger.error = Mock()
 
         tags = 'tag1'
-        ret = (
-            NVTICache._parse_metadata_tags(  # pylint: disable=protected-access
-                tags, '1.2.3'
-            )
-        )
+        ret = _parse_metadata_tags(tags, '1.2.3')
 
         self.assertEqual(ret, {})
         assert_called(logging.Logger.error)
 
     def test_parse_metadata_tag(self, MockOpenvasDB):
         tags = 'tag1=value1'
-        ret = (
-            NVTICache._parse_metadata_tags(  # pylint: disable=protected-access
-                tags, '1.2.3'
-            )
-        )
+        ret = _parse_metadata_tags(tags, '1.2.3')
 
         self.assertEqual(ret, {'tag1': 'value1'})
 
     def test_parse_metadata_tags(self, MockOpenvasDB):
         tags = 'tag1=value1|foo=bar'
-        ret = (
-            NVTICache._parse_metadata_tags(  # pylint: disable=protected-access
-                tags, '1.2.3'
-            )
-        )
+        ret = _parse_metadata_tags(tags, '1.2.3')
 
         self.assertEqual(ret, {'tag1': 'value1', 'foo': 'bar'})
 
@@ -253,6 +246,234 @@ class TestNVTICache(TestCase):
 
         self.assertIsNone(resp)
 
+    def test_get_nvt_family_many(self, MockOpenvasDB):
+        MockOpenvasDB.get_single_items_many.return_value = iter(
+            ['Product detection', 'Debian Local Security Checks']
+        )
+
+        resp = self.nvti._get_nvt_family_many(['1.2.3.4', '1.2.3.5'])
+
+        self.assertEqual(
+            list(resp),
+            [
+                ('1.2.3.4', 'Product detection'),
+                ('1.2.3.5', 'Debian Local Security Checks'),
+            ],
+        )
+        _, names = MockOpenvasDB.get_single_items_many.call_args[0]
+        self.assertEqual(list(names), ['nvt:1.2.3.4', 'nvt:1.2.3.5'])
+
+    def test_get_nvt_raw_many(self, MockOpenvasDB):
+        MockOpenvasDB.get_list_items_many.return_value = iter(
+            [['a.nasl', 'foo'], ['1|||pref|||entry|||'], [], []]
+        )
+
+        resp = self.nvti.get_nvt_raw_many(['1.2.3.4', '1.2.3.5'])
+
+        self.assertEqual(
+            list(resp),
+            [
+                ('1.2.3.4', (['a.nasl', 'foo'], ['1|||pref|||entry|||'])),
+                ('1.2.3.5', None),
+            ],
+        )
+        _, names = MockOpenvasDB.get_list_items_many.call_args[0]
+        self.assertEqual(
+            list(names),
+            [
+                'nvt:1.2.3.4',
+                'oid:1.2.3.4:prefs',
+                'nvt:1.2.3.5',
+                'oid:1.2.3.5:prefs',
+            ],
+        )
+
+    def test_get_nvt_raw_many_short_reply(self, MockOpenvasDB):
+        MockOpenvasDB.get_list_items_many.return_value = iter(
+            [['a.nasl', 'foo'], ['1|||pref|||entry|||'], []]
+        )
+
+        resp = self.nvti.get_nvt_raw_many(['1.2.3.4', '1.2.3.5'])
+
+        self.assertEqual(
+            list(resp),
+            [('1.2.3.4', (['a.nasl', 'foo'], ['1|||pref|||entry|||']))],
+        )
+
+    def test_get_nvt_metadata_vt_store(self, MockOpenvasDB):
+        vt_store = Mock()
+        vt_store.get.return_value = (['a.nasl'], None)
+        self.nvti.set_vt_store(vt_store)
+        self.nvti._parse_nvt_metadata = Mock(return_value={'foo': 'bar'})
+
+        resp = self.nvti.get_nvt_metadata('1.2.3.4')
+
+        self.assertEqual(resp, {'foo': 'bar'})
+        self.nvti._parse_nvt_metadata.assert_called_once_with(
+            '1.2.3.4', ['a.nasl'], None
+        )
+        MockOpenvasDB.get_list_item.assert_not_called()
+
+    def test_get_nvt_metadata_raw_many_vt_store_missing(self, MockOpenvasDB):
+        # e.g. a Notus advisory added after building the store
+        vt_store = Mock()
+        vt_store.get.side_effect = [(['a.nasl'], None), None, None]
+        self.nvti.set_vt_store(vt_store)
+        MockOpenvasDB.get_list_items_many.return_value = iter(
+            [['b.nasl'], ['pref'], [], []]
+        )
+
+        resp = self.nvti.get_nvt_metadata_raw_many(
+            ['1.2.3.4', '1.2.3.5', '1.2.3.6']
+        )
+
+        self.assertEqual(
+            list(resp),
+            [
+                ('1.2.3.4', (['a.nasl'], None)),
+                ('1.2.3.5', (['b.nasl'], ['pref'])),
+                ('1.2.3.6', None),
+            ],
+        )
+        _, names = MockOpenvasDB.get_list_items_many.call_args[0]
+        self.assertEqual(
+            list(names),
+            [
+                'nvt:1.2.3.5',
+                'oid:1.2.3.5:prefs',
+                'nvt:1.2.3.6',
+                'oid:1.2.3.6:prefs',
+            ],
+        )
+
+    def test_set_vt_store_closes_previous(self, _MockOpenvasDB):
+        vt_store = Mock()
+        vt_store2 = Mock()
+        self.nvti.set_vt_store(vt_store)
+
+        self.nvti.set_vt_store(vt_store)
+        vt_store.close.assert_not_called()
+
+        self.nvti.set_vt_store(vt_store2)
+        vt_store.close.assert_called_once_with()
+
+        self.nvti.set_vt_store(None)
+        vt_store2.close.assert_called_once_with()
+
+    def test_get_nvt_summary(self, MockOpenvasDB):
+        MockOpenvasDB.get_list_items_by_index.return_value = [
+            'creation_date=1237458156|qod_type=remote_banner',
+            'Mantis Detection',
+        ]
+
+        resp = self.nvti.get_nvt_summary('1.2.3.4')
+
+        self.assertEqual(
+            resp,
+            {
+                'creation_date': '1237458156',
+                'qod_type': 'remote_banner',
+                'name': 'Mantis Detection',
+            },
+        )
+        MockOpenvasDB.get_list_items_by_index.assert_called_with(
+            'foo', 'nvt:1.2.3.4', [7, 14]
+        )
+        MockOpenvasDB.get_list_item.assert_not_called()
+
+    def test_get_nvt_summary_fields(self, MockOpenvasDB):
+        MockOpenvasDB.get_list_items_by_index.return_value = ['Some family']
+
+        resp = self.nvti.get_nvt_summary('1.2.3.4', fields=["NVT_FAMILY_POS"])
+
+        self.assertEqual(resp, {'family': 'Some family'})
+        MockOpenvasDB.get_list_items_by_index.assert_called_with(
+            'foo', 'nvt:1.2.3.4', [13]
+        )
+
+    def test_get_nvt_summary_not_found(self, MockOpenvasDB):
+        MockOpenvasDB.get_list_items_by_index.return_value = [None, None]
+
+        self.assertIsNone(self.nvti.get_nvt_summary('1.2.3.4'))
+
+    def test_get_nvt_summary_vt_store(self, MockOpenvasDB):
+        vt_store = Mock()
+        vt = ['a.nasl'] + [''] * 6 + ['qod=80'] + [''] * 6 + ['foo']
+        vt_store.get.return_value = (vt, None)
+        self.nvti.set_vt_store(vt_store)
+
+        resp = self.nvti.get_nvt_summary('1.2.3.4')
+
+        self.assertEqual(resp, {'qod': '80', 'name': 'foo'})
+        MockOpenvasDB.get_list_items_by_index.assert_not_called()
+
+    def test_get_nvt_metadata_raw_many(self, MockOpenvasDB):
+        self.nvti.get_nvt_raw_many = Mock(return_value=iter([]))
+
+        self.nvti.get_nvt_metadata_raw_many(['1.2.3.4'])
+        self.nvti.get_nvt_raw_many.assert_called_once_with(['1.2.3.4'])
+
+        vt_store = Mock()
+        vt_store.get.return_value = (['a.nasl'], None)
+        self.nvti.set_vt_store(vt_store)
+
+        resp = self.nvti.get_nvt_metadata_raw_many(['1.2.3.4'])
+
+        self.assertEqual(list(resp), [('1.2.3.4', (['a.nasl'], None))])
+        self.nvti.get_nvt_raw_many.assert_called_once()
+
+    def test_get_nvt_tags_many(self, MockOpenvasDB):
+        MockOpenvasDB.get_single_items_many.return_value = iter(
+            ['last_modification=1533906565|creation_date=1237458156', None]
+        )
+
+        resp = self.nvti.get_nvt_tags_many(['1.2.3.4', '1.2.3.5'])
+
+        self.assertEqual(
+            list(resp),
+            [
+                (
+                    '1.2.3.4',
+                    {
+                        'last_modification': '1533906565',
+                        'creation_date': '1237458156',
+                    },
+                ),
+                ('1.2.3.5', None),
+            ],
+        )
+
+    def test_load_family_index(self, MockOpenvasDB):
+        MockOpenvasDB.get_filenames_and_oids.return_value = [
+            ('foo.nasl', '1.2.3.4'),
+            ('bar.nasl', '1.2.3.5'),
+            ('baz.nasl', '1.2.3.6'),
+        ]
+        MockOpenvasDB.get_single_items_many.return_value = iter(
+            ['Product detection', 'Web Servers', 'Product detection']
+        )
+
+        resp = self.nvti.load_family_index()
+
+        self.assertEqual(
+            resp,
+            {
+                'Product detection': ['1.2.3.4', '1.2.3.6'],
+                'Web Servers': ['1.2.3.5'],
+            },
+        )
+
+    def test_get_family_index(self, MockOpenvasDB):
+        self.nvti.load_family_index = Mock(return_value={'foo': ['1.2.3']})
+
+        self.assertEqual(self.nvti.get_family_index(), {'foo': ['1.2.3']})
+        self.nvti.load_family_index.assert_called_once_with()
+
+        self.nvti._family_index = {'bar': ['1.2.4']}
+
+        self.assertEqual(self.nvti.get_family_index(), {'bar': ['1.2.4']})
+        self.nvti.load_family_index.assert_called_once_with()
+
     def test_get_nvt_prefs(self, MockOpenvasDB):
         prefs = ['dns-fuzz.timelimit|||entry|||default']
 
@@ -294,6 +515,17 @@ class TestNVTICache(TestCase):
 
         self.assertEqual(out_dict, resp)
 
+    def test_get_nvt_files_timestamps(self, MockOpenvasDB):
+        MockOpenvasDB.get_single_items_many.return_value = iter(['1234', None])
+
+        resp = self.nvti.get_nvt_files_timestamps(['foo.nasl', 'bar.nasl'])
+
+        self.assertEqual(list(resp), ['1234', None])
+        _, names = MockOpenvasDB.get_single_items_many.call_args[0]
+        self.assertEqual(
+            list(names), ['filename:foo.nasl', 'filename:bar.nasl']
+        )
+
     def test_get_nvt_files_count(self, MockOpenvasDB):
         MockOpenvasDB.get_key_count.return_value = 20
 
@@ -307,9 +539,16 @@ class TestNVTICache(TestCase):
         MockOpenvasDB.get_key_count.assert_called_with('foo', 'nvt:*')
 
     def test_force_reload(self, _MockOpenvasDB):
+        self.nvti._family_index = {'foo': ['1.2.3']}
+        vt_store = Mock()
+        self.nvti.set_vt_store(vt_store)
+
         self.nvti.force_reload()
 
         self.db.release_database.assert_called_with(self.nvti)
+        self.assertIsNone(self.nvti._family_index)
+        self.assertIsNone(self.nvti._vt_store)
+        vt_store.close.assert_called_once_with()
 
     def test_flush(self, _MockOpenvasDB):
         self.nvti._ctx = Mock()
@@ -318,8 +557,35 @@ class TestNVTICache(TestCase):
 
         self.nvti._ctx.flushdb.assert_called_with()
 
-    def test_add_vt(self, MockOpenvasDB):
+    @patch('ospd_openvas.nvticache.time')
+    def test_add_vts_to_cache(self, mock_time, MockOpenvasDB):
+        mock_time.return_value = 1234
+        vt_a = ['a.csv.1'] + ['x'] * 14
+        vt_b = ['a.csv.2'] + ['x'] * 14
+        vts = [
+            ('nvt:1.2.3.4', vt_a),
+            ('nvt:1.2.3.5', ['b.nasl']),
+            ('nvt:1.2.3.6', 'foo'),
+            ('nvt:1.2.3.7', vt_b),
+        ]
+
+        ret = self.nvti.add_vts_to_cache(vts)
+
+        self.assertEqual(ret, 2)
+        MockOpenvasDB.set_lists_many.assert_called_once_with(
+            'foo',
+            [
+                ('nvt:1.2.3.4', vt_a),
+                ('filename:a.csv.1', [1234]),
+                ('nvt:1.2.3.7', vt_b),
+                ('filename:a.csv.2', [1234]),
+            ],
+        )
+
+    @patch('ospd_openvas.nvticache.time')
+    def test_add_vt(self, mock_time, MockOpenvasDB):
         MockOpenvasDB.add_single_list = Mock()
+        mock_time.return_value = 1234
 
         self.nvti.add_vt_to_cache(
             '1234',
@@ -362,6 +628,9 @@ class TestNVTICache(TestCase):
                 'o',
             ],
         )
+        MockOpenvasDB.set_single_item.assert_called_with(
+            'foo', 'filename:a', [1234]
+        )
 
     def test_get_file_checksum(self, MockOpenvasDB):
         MockOpenvasDB.get_single_item.return_value = '123456'
@@ -373,3 +642,48 @@ class TestNVTICache(TestCase):
         MockOpenvasDB.get_single_item.assert_called_with(
             'foo', "sha256sums:/tmp/foo.csv"
         )
+
+    def test_notus_manifest(self, MockOpenvasDB):
+        self.nvti._ctx = Mock()
+        entry = {'mtime': 1, 'size': 2, 'sha256': 'abc', 'keys': ['nvt:1']}
+
+        self.nvti.set_notus_manifest_entry('/tmp/foo.csv', entry)
+        self.nvti._ctx.hset.assert_called_with(
+            'notus:manifest', '/tmp/foo.csv', json.dumps(entry)
+        )
+
+        self.nvti._ctx.hgetall.return_value = {
+            '/tmp/foo.csv': json.dumps(entry)
+        }
+        self.assertEqual(
+            self.nvti.get_notus_manifest(), {'/tmp/foo.csv': entry}
+        )
+
+        self.nvti.set_notus_manifest_entry('/tmp/foo.csv', None)
+        self.nvti._ctx.hdel.assert_called_with('notus:manifest', '/tmp/foo.csv')
+
+    def test_remove_vts_from_cache(self, MockOpenvasDB):
+        self.nvti._ctx = Mock()
+
+        self.nvti.remove_vts_from_cache([])
+        self.nvti._ctx.delete.assert_not_called()
+
+        self.nvti.remove_vts_from_cache(['nvt:1', 'filename:a.nasl'])
+        self.nvti._ctx.delete.assert_called_with('nvt:1', 'filename:a.nasl')
+
+    def test_notus_family_driver_linkers(self, MockOpenvasDB):
+        MockOpenvasDB.get_single_item.return_value = '1234'
+        linkers = {'Some family': '1.2.3'}
+
+        self.assertIsNone(self.nvti.get_notus_family_driver_linkers())
+
+        self.nvti.set_notus_family_driver_linkers(linkers)
+        self.assertEqual(self.nvti.get_notus_family_driver_linkers(), linkers)
+
+        # The linkers are dropped when the feed version changes
+        MockOpenvasDB.get_single_item.return_value = '1235'
+        self.assertIsNone(self.nvti.get_notus_family_driver_linkers())
+
+        self.nvti.set_notus_family_driver_linkers(linkers)
+        self.nvti.set_notus_family_driver_linkers(None)
+        self.assertIsNone(self.nvti.get_notus_family_driver_linkers())
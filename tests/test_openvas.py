@@ -22,10 +22,13 @@ import subprocess
 from unittest import TestCase
 from unittest.mock import patch, MagicMock
 
-from ospd_openvas.openvas import Openvas
+from ospd_openvas.openvas import Openvas, SETTINGS_TTL
 
 
 class OpenvasCommandTestCase(TestCase):
+    def setUp(self):
+        Openvas.clear_settings()
+
     @patch('ospd_openvas.openvas.subprocess.check_output')
     def test_get_version(self, mock_check_output: MagicMock):
         mock_check_output.return_value = b"OpenVAS 20.08"
@@ -183,6 +186,46 @@ class OpenvasCommandTestCase(TestCase):
 
         self.assertFalse(settings)  # settings dict is empty
 
+    @patch('ospd_openvas.openvas.monotonic')
+    @patch('ospd_openvas.openvas.subprocess.check_output')
+    def test_get_settings_cached(
+        self, mock_check_output: MagicMock, mock_monotonic: MagicMock
+    ):
+        mock_check_output.return_value = b'plugins_folder = /foo/bar\n'
+        mock_monotonic.return_value = 100
+
+        settings = Openvas.get_settings()
+        settings['plugins_folder'] = '/changed'
+
+        self.assertEqual(Openvas.get_settings(), {'plugins_folder': '/foo/bar'})
+        self.assertEqual(mock_check_output.call_count, 1)
+
+        Openvas.reload_settings()
+        self.assertEqual(mock_check_output.call_count, 2)
+
+        # The settings expire after the TTL
+        mock_monotonic.return_value = 100 + SETTINGS_TTL + 1
+        Openvas.get_settings()
+        self.assertEqual(mock_check_output.call_count, 3)
+
+        Openvas.clear_settings()
+        Openvas.get_settings()
+        self.assertEqual(mock_check_output.call_count, 4)
+
+    @patch('ospd_openvas.openvas.logger')
+    @patch('ospd_openvas.openvas.subprocess.check_output')
+    def test_get_settings_error_not_cached(
+        self, mock_check_output: MagicMock, _mock_logger: MagicMock
+    ):
+        mock_check_output.side_effect = OSError('foo')
+
+        self.assertFalse(Openvas.get_settings())
+
+        mock_check_output.side_effect = None
+        mock_check_output.return_value = b'plugins_folder = /foo/bar\n'
+
+        self.assertEqual(Openvas.get_settings(), {'plugins_folder': '/foo/bar'})
+
     @patch('ospd_openvas.openvas.subprocess.Popen')
     def test_start_scan(self, mock_popen: MagicMock):
         proc = Openvas.start_scan('scan_1')
@@ -111,6 +111,24 @@ class PreferenceHandlerTestCase(TestCase):
 
         self.assertEqual(ret, vt_out)
 
+    @patch('ospd_openvas.preferencehandler.Openvas')
+    @patch('ospd_openvas.preferencehandler.NotusMetadataHandler')
+    def test_get_vts_in_groups_family(self, MockNotus, MockOpenvas):
+        w = DummyDaemon()
+        openvas = MockOpenvas()
+        openvas.get_settings.return_value = {'table_driven_lsc': 0}
+        notus = MockNotus()
+        notus.get_family_driver_linkers.return_value = {}
+
+        filters = ['family=Product detection', 'family=foo']
+        vt_out = ['1.3.6.1.4.1.25623.1.0.100061']
+
+        p = PreferenceHandler('1234-1234', None, w.scan_collection, w.nvti)
+        ret = p._get_vts_in_groups(filters)
+
+        self.assertEqual(ret, vt_out)
+        w.nvti.get_nvt_family.assert_not_called()
+
     @patch('ospd_openvas.db.KbDB')
     def test_set_plugins_false(self, mock_kb):
         w = DummyDaemon()
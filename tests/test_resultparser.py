@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-2021 Greenbone Networks GmbH
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+
+from ospd_openvas.resultparser import (
+    OpenvasResult,
+    parse_result,
+    parse_results,
+)
+
+
+class ResultParserTestCase(TestCase):
+    def test_parse_result(self):
+        result = parse_result(
+            "ALARM||| 192.168.0.1 ||| localhost |||443/tcp||| 1.2.3 |||foo"
+        )
+
+        self.assertEqual(
+            result,
+            OpenvasResult(
+                type='ALARM',
+                host='192.168.0.1',
+                hostname='localhost',
+                port='443/tcp',
+                oid='1.2.3',
+                value='foo',
+                uri='',
+            ),
+        )
+
+    def test_parse_result_uri(self):
+        result = parse_result(
+            "LOG|||192.168.0.1|||localhost|||80/tcp|||1.2.3|||foo|||/index"
+        )
+
+        self.assertEqual(result.uri, '/index')
+
+    def test_parse_result_malformed(self):
+        with self.assertRaises(ValueError):
+            parse_result("LOG|||192.168.0.1|||localhost")
+
+    def test_parse_results(self):
+        results = parse_results(
+            [
+                "HOST_START|||192.168.0.1|||||||||||| ",
+                "",
+                "LOG|||192.168.0.1",
+                "HOST_END|||192.168.0.1|||||||||||| ",
+            ]
+        )
+
+        self.assertEqual(
+            [result.type for result in results], ['HOST_START', 'HOST_END']
+        )
+
+    def test_is_vt_result(self):
+        def result(msg_type, oid, value):
+            return parse_result(
+                '|||'.join([msg_type, '192.168.0.1', '', '', oid, value])
+            )
+
+        self.assertTrue(result('ALARM', '1.2.3', 'foo').is_vt_result())
+        self.assertFalse(result('LOG', '', 'Host dead').is_vt_result())
+        self.assertFalse(
+            result('ERRMSG', '', 'Host access denied.').is_vt_result()
+        )
+        self.assertFalse(result('HOSTS_COUNT', '', '4').is_vt_result())
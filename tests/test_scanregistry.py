@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-2021 Greenbone Networks GmbH
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from ospd_openvas.db import MainDB
+from ospd_openvas.scanregistry import SCANID_INDEX_NAME, COLLECTOR_CYCLE_NAME
+
+
+class ScanRegistryTestCase(TestCase):
+    def setUp(self):
+        self.ctx = MagicMock()
+        self.maindb = MainDB(self.ctx)
+
+    def test_add_scan_id_index(self):
+        self.maindb.add_scan_id_index('foo', 3)
+
+        self.ctx.hset.assert_called_once_with(SCANID_INDEX_NAME, 'foo', 3)
+
+    def test_get_scan_id_index(self):
+        self.ctx.hgetall.return_value = {'foo': '1', 'bar': '2'}
+
+        self.assertEqual(self.maindb.get_scan_id_index(), {'foo': 1, 'bar': 2})
+        self.ctx.hgetall.assert_called_once_with(SCANID_INDEX_NAME)
+
+    def test_get_kb_index_by_scan_id(self):
+        self.ctx.hget.return_value = '5'
+
+        self.assertEqual(self.maindb.get_kb_index_by_scan_id('foo'), 5)
+        self.ctx.hget.assert_called_once_with(SCANID_INDEX_NAME, 'foo')
+
+    def test_get_kb_index_by_scan_id_not_registered(self):
+        self.ctx.hget.return_value = None
+
+        self.assertIsNone(self.maindb.get_kb_index_by_scan_id('foo'))
+
+    def test_remove_scan_id_index(self):
+        self.maindb.remove_scan_id_index('foo')
+
+        self.ctx.hdel.assert_called_once_with(SCANID_INDEX_NAME, 'foo')
+
+    def test_collector_cycle(self):
+        self.ctx.get.return_value = None
+        self.assertEqual(self.maindb.get_collector_cycle(), 0)
+
+        self.maindb.increase_collector_cycle()
+        self.ctx.incr.assert_called_once_with(COLLECTOR_CYCLE_NAME)
+
+        self.ctx.get.return_value = '1'
+        self.assertEqual(self.maindb.get_collector_cycle(), 1)
+        self.ctx.get.assert_called_with(COLLECTOR_CYCLE_NAME)
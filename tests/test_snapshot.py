@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-2021 Greenbone Networks GmbH
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import shutil
+import tempfile
+
+from pathlib import Path
+from unittest import TestCase
+
+from ospd_openvas.snapshot import VtSnapshot
+
+
+class VtSnapshotTestCase(TestCase):
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.path = self.temp_dir / 'vts-snapshot.json'
+
+    def tearDown(self):
+        shutil.rmtree(str(self.temp_dir))
+
+    def test_save_load(self):
+        snapshot = VtSnapshot(self.path)
+        snapshot.save('202101010000', {'foo': ['bar']})
+
+        self.assertEqual(snapshot.load('202101010000'), {'foo': ['bar']})
+        self.assertFalse(self.path.with_name('vts-snapshot.json.tmp').exists())
+
+    def test_load_other_feed_version(self):
+        snapshot = VtSnapshot(self.path)
+        snapshot.save('202101010000', {'foo': ['bar']})
+
+        self.assertIsNone(snapshot.load('202101020000'))
+
+    def test_load_no_snapshot(self):
+        snapshot = VtSnapshot(self.path)
+
+        self.assertIsNone(snapshot.load('202101010000'))
+
+    def test_load_no_feed_version(self):
+        snapshot = VtSnapshot(self.path)
+        snapshot.save(None, {'foo': ['bar']})
+
+        self.assertFalse(self.path.exists())
+        self.assertIsNone(snapshot.load(None))
+
+    def test_load_corrupt(self):
+        self.path.write_text('{"format_version": 1, "feed_')
+        snapshot = VtSnapshot(self.path)
+
+        self.assertIsNone(snapshot.load('202101010000'))
+
+    def test_load_other_format_version(self):
+        self.path.write_text(
+            '{"format_version": 0, "feed_version": "202101010000", '
+            '"data": {}}'
+        )
+        snapshot = VtSnapshot(self.path)
+
+        self.assertIsNone(snapshot.load('202101010000'))
+
+    def test_save_error(self):
+        snapshot = VtSnapshot(self.temp_dir / 'foo' / 'vts-snapshot.json')
+        snapshot.save('202101010000', {'foo': ['bar']})
+
+        self.assertIsNone(snapshot.load('202101010000'))
@@ -20,12 +20,20 @@
 import logging
 
 from hashlib import sha256
+from threading import Thread
 from unittest import TestCase
+from unittest.mock import patch
 
 from tests.dummydaemon import DummyDaemon
 from tests.helper import assert_called_once
 
-from ospd_openvas.vthelper import VtHelper
+from ospd_openvas.nvticache import NVTICache
+from ospd_openvas.vthelper import (
+    VtHelper,
+    VtCache,
+    VtRecord,
+    get_severity_score,
+)
 
 
 class VtHelperTestCase(TestCase):
@@ -54,6 +62,42 @@ class VtHelperTestCase(TestCase):
 
         self.assertEqual(hash_test, hash_out)
 
+    def test_calculate_vts_collection_hash_incremental(self):
+        w = DummyDaemon()
+        vthelper = VtHelper(w.nvti)
+        vts_hash_data = dict()
+
+        hash_out = vthelper.calculate_vts_collection_hash(vts_hash_data)
+
+        self.assertEqual(
+            vts_hash_data['1.3.6.1.4.1.25623.1.0.100061'][0], '1533906565'
+        )
+        self.assertEqual(w.nvti.get_nvt_metadata_raw_many.call_count, 1)
+
+        # Unchanged VT files are not read again
+        hash_out2 = vthelper.calculate_vts_collection_hash(vts_hash_data)
+
+        self.assertEqual(hash_out, hash_out2)
+        self.assertEqual(w.nvti.get_nvt_metadata_raw_many.call_count, 1)
+
+    def test_calculate_vts_collection_hash_changed_vt(self):
+        w = DummyDaemon()
+        vthelper = VtHelper(w.nvti)
+        vts_hash_data = {
+            '1.3.6.1.4.1.25623.1.0.100061': ('1000', b'old data'),
+            '1.3.6.1.4.1.25623.1.0.100062': ('1000', b'removed vt'),
+        }
+
+        hash_out = vthelper.calculate_vts_collection_hash(vts_hash_data)
+
+        vt_hash = sha256()
+        vt_hash.update(vts_hash_data['1.3.6.1.4.1.25623.1.0.100061'][1])
+        self.assertEqual(hash_out, vt_hash.hexdigest())
+        self.assertEqual(
+            vts_hash_data['1.3.6.1.4.1.25623.1.0.100061'][0], '1533906565'
+        )
+        self.assertNotIn('1.3.6.1.4.1.25623.1.0.100062', vts_hash_data)
+
     def test_get_vt_iterator(self):
         w = DummyDaemon()
         vthelper = VtHelper(w.nvti)
@@ -63,6 +107,32 @@ class VtHelperTestCase(TestCase):
         for key, _ in vthelper.get_vt_iterator():
             self.assertIn(key, vt)
 
+    def test_get_notus_driver_oids(self):
+        w = DummyDaemon()
+        w.nvti.get_notus_family_driver_linkers.return_value = {
+            'Some family': '1.2.3.4',
+            'Other family': '1.2.3.5',
+        }
+        vthelper = VtHelper(w.nvti)
+
+        drivers = vthelper.get_notus_driver_oids()
+
+        self.assertEqual(drivers, frozenset(['1.2.3.4', '1.2.3.5']))
+
+    def test_get_vt_iterator_exclude_drivers(self):
+        w = DummyDaemon()
+        w.nvti.get_notus_family_driver_linkers.return_value = {
+            'Some family': '1.3.6.1.4.1.25623.1.0.100061'
+        }
+        vthelper = VtHelper(w.nvti)
+
+        self.assertEqual(list(vthelper.get_vt_iterator()), [])
+
+        w.nvti.get_notus_family_driver_linkers.assert_called_once()
+
+        vts = list(vthelper.get_vt_iterator(exclude_drivers=False))
+        self.assertEqual(vts[0][0], '1.3.6.1.4.1.25623.1.0.100061')
+
     def test_get_vt_iterator_with_filter(self):
         w = DummyDaemon()
         vthelper = VtHelper(w.nvti)
@@ -79,20 +149,26 @@ class VtHelperTestCase(TestCase):
     def test_get_vt_iterator_with_filter_no_vt(self):
         w = DummyDaemon()
         vthelper = VtHelper(w.nvti)
-        w.nvti.get_nvt_metadata.return_value = None
+        w.nvti.get_nvt_metadata_raw_many.side_effect = lambda oids: (
+            (oid, None) for oid in oids
+        )
         vt = ["1.3.6.1.4.1.25623.1.0.100065"]
 
-        for _, values in vthelper.get_vt_iterator(vt_selection=vt):
-            self.assertIs(values, None)
+        vts = list(vthelper.get_vt_iterator(vt_selection=vt))
+
+        self.assertEqual(vts, [("1.3.6.1.4.1.25623.1.0.100065", None)])
 
     def test_get_vt_iterator_with_filter_no_vt(self):
         w = DummyDaemon()
         vthelper = VtHelper(w.nvti)
-        w.nvti.get_nvt_metadata.return_value = None
+        w.nvti.get_nvt_metadata_raw_many.side_effect = lambda oids: (
+            (oid, None) for oid in oids
+        )
         vt = ["1.3.6.1.4.1.25623.1.0.100065"]
 
-        for _, values in vthelper.get_vt_iterator(vt_selection=vt):
-            self.assertIs(values, None)
+        vts = list(vthelper.get_vt_iterator(vt_selection=vt))
+
+        self.assertEqual(vts, [("1.3.6.1.4.1.25623.1.0.100065", None)])
 
     def test_get_single_vt_severity_cvssv3(self):
         w = DummyDaemon()
@@ -212,3 +288,225 @@ class VtHelperTestCase(TestCase):
         self.assertEqual("cvss_base_v2", severities.get('severity_type'))
         self.assertEqual(None, severities.get('severity_origin'))
         self.assertEqual("1237458156", severities.get('severity_date'))
+
+    def test_get_result_vt(self):
+        w = DummyDaemon()
+        vthelper = VtHelper(w.nvti)
+        res = vthelper.get_result_vt("1.3.6.1.4.1.25623.1.0.100061")
+
+        self.assertEqual(
+            {
+                'name': 'Mantis Detection',
+                'qod_type': 'remote_banner',
+                'severities': {
+                    'severity_base_vector': 'AV:N/AC:L/Au:N/C:N/I:N/A:N',
+                    'severity_type': 'cvss_base_v2',
+                    'severity_date': '1237458156',
+                },
+                'severity_score': 0.0,
+            },
+            res,
+        )
+
+    def test_get_vt_summary(self):
+        w = DummyDaemon()
+        w.nvti.get_nvt_summary.side_effect = None
+        w.nvti.get_nvt_summary.return_value = {
+            'creation_date': '1237458156',
+            'severity_vector': 'CVSS:3.0/AV:L/AC:H/PR:H/UI:R/S:U/C:N/I:L/A:L',
+            'severity_date': '1237458157',
+            'qod': '80',
+            'name': 'Foo',
+        }
+        vthelper = VtHelper(w.nvti)
+
+        res = vthelper.get_vt_summary("1.3.6.1.4.1.25623.1.0.100061")
+
+        self.assertEqual(
+            res,
+            {
+                'name': 'Foo',
+                'qod': '80',
+                'severities': {
+                    'severity_base_vector': 'CVSS:3.0/AV:L/AC:H/PR:H/UI:R/S:U/C:N/I:L/A:L',
+                    'severity_type': 'cvss_base_v3',
+                    'severity_date': '1237458157',
+                },
+                'severity_score': 2.9,
+            },
+        )
+        w.nvti.get_nvt_metadata.assert_not_called()
+        w.nvti.get_nvt_prefs.assert_not_called()
+
+    def test_get_result_vt_cached(self):
+        w = DummyDaemon()
+        vthelper = VtHelper(w.nvti, VtCache())
+
+        res = vthelper.get_result_vt("1.3.6.1.4.1.25623.1.0.100061", '123')
+        res2 = vthelper.get_result_vt("1.3.6.1.4.1.25623.1.0.100061", '123')
+
+        assert_called_once(w.nvti.get_nvt_summary)
+        self.assertIs(res, res2)
+
+    def test_get_result_vt_not_found(self):
+        w = DummyDaemon()
+        vt_cache = VtCache()
+        vthelper = VtHelper(w.nvti, vt_cache)
+        w.nvti.get_nvt_summary.side_effect = None
+        w.nvti.get_nvt_summary.return_value = None
+
+        res = vthelper.get_result_vt("1.3.6.1.4.1.25623.1.0.100065", '123')
+
+        self.assertIsNone(res)
+        self.assertEqual(len(vt_cache), 0)
+
+
+class VtRecordTestCase(TestCase):
+    def setUp(self):
+        w = DummyDaemon()
+        self.oid = '1.3.6.1.4.1.25623.1.0.100061'
+        self.resp, self.prefs = next(
+            w.nvti.get_nvt_metadata_raw_many([self.oid])
+        )[1]
+        self.oids = {'mantis_detect.nasl': self.oid}
+
+    def test_equal_to_vt(self):
+        custom = NVTICache(None)._parse_nvt_metadata(
+            self.oid, self.resp, self.prefs
+        )
+        vt = VtHelper.get_vt_from_metadata(custom, self.oids)
+
+        vt_record = VtRecord(self.oid, self.resp, self.prefs, self.oids)
+
+        self.assertEqual(vt_record, vt)
+        self.assertEqual(dict(vt_record), vt)
+        self.assertEqual(len(vt_record), len(vt))
+        self.assertEqual(vt_record.get('name'), 'Mantis Detection')
+        self.assertIsNone(vt_record.get('foo'))
+
+    @patch('ospd_openvas.vthelper.parse_nvt_refs')
+    @patch('ospd_openvas.vthelper.parse_nvt_vt_params')
+    @patch('ospd_openvas.vthelper.parse_nvt_fields')
+    def test_lazy(self, mock_fields, mock_vt_params, mock_refs):
+        mock_fields.return_value = {
+            'name': 'foo',
+            'cvss_base_vector': 'AV:N/AC:L/Au:N/C:N/I:N/A:N',
+            'creation_date': '1237458156',
+            'last_modification': '1533906565',
+        }
+        vt_record = VtRecord(self.oid, self.resp, self.prefs)
+
+        self.assertTrue('vt_params' in vt_record)
+        mock_fields.assert_not_called()
+
+        vt_record.get('vt_params')
+        vt_record.get('vt_params')
+        mock_vt_params.assert_called_once_with(self.resp, self.prefs)
+        mock_fields.assert_not_called()
+        mock_refs.assert_not_called()
+
+        self.assertEqual(vt_record['modification_time'], '1533906565')
+        self.assertEqual(vt_record['name'], 'foo')
+        mock_fields.assert_called_once_with(self.oid, self.resp)
+        mock_refs.assert_not_called()
+
+    def test_read_only(self):
+        vt_record = VtRecord(self.oid, self.resp, self.prefs)
+
+        with self.assertRaises(TypeError):
+            vt_record[
+                'name'
+            ] = 'foo'  # pylint: disable=unsupported-assignment-operation
+
+        with self.assertRaises(AttributeError):
+            vt_record.foo = 'bar'  # pylint: disable=assigning-non-slot
+
+
+class GetSeverityScoreTestCase(TestCase):
+    def test_get_severity_score(self):
+        self.assertEqual(
+            get_severity_score('cvss_base_v2', 'AV:N/AC:L/Au:N/C:P/I:N/A:N'),
+            5.0,
+        )
+        self.assertEqual(
+            get_severity_score(
+                'cvss_base_v3', 'CVSS:3.0/AV:L/AC:H/PR:H/UI:R/S:U/C:N/I:L/A:L'
+            ),
+            2.9,
+        )
+        self.assertIsNone(get_severity_score('cvss_base_v2', None))
+        self.assertIsNone(get_severity_score('foo', 'AV:N/AC:L/Au:N/C:P'))
+
+    @patch('ospd_openvas.vthelper.CVSS')
+    def test_get_severity_score_memoized(self, mock_cvss):
+        get_severity_score.cache_clear()
+        mock_cvss.cvss_base_v2_value.return_value = 7.5
+        vector = 'AV:N/AC:L/Au:N/C:P/I:P/A:N'
+
+        self.assertEqual(get_severity_score('cvss_base_v2', vector), 7.5)
+        self.assertEqual(get_severity_score('cvss_base_v2', vector), 7.5)
+
+        mock_cvss.cvss_base_v2_value.assert_called_once_with(vector)
+
+
+class VtCacheTestCase(TestCase):
+    def test_get_not_cached(self):
+        vt_cache = VtCache()
+
+        self.assertIsNone(vt_cache.get('1.2.3', '123'))
+
+    def test_add_and_get(self):
+        vt_cache = VtCache()
+        vt_cache.add('1.2.3', '123', {'name': 'foo'})
+
+        self.assertEqual(vt_cache.get('1.2.3', '123'), {'name': 'foo'})
+
+    def test_feed_version_changed(self):
+        vt_cache = VtCache()
+        vt_cache.add('1.2.3', '123', {'name': 'foo'})
+
+        self.assertIsNone(vt_cache.get('1.2.3', '124'))
+        self.assertEqual(len(vt_cache), 0)
+
+    def test_least_recently_used_dropped(self):
+        vt_cache = VtCache(maxsize=2)
+        vt_cache.add('1.2.1', '123', {'name': 'foo'})
+        vt_cache.add('1.2.2', '123', {'name': 'bar'})
+
+        vt_cache.get('1.2.1', '123')
+        vt_cache.add('1.2.3', '123', {'name': 'baz'})
+
+        self.assertEqual(len(vt_cache), 2)
+        self.assertIsNone(vt_cache.get('1.2.2', '123'))
+        self.assertEqual(vt_cache.get('1.2.1', '123'), {'name': 'foo'})
+
+    def test_clear(self):
+        vt_cache = VtCache()
+        vt_cache.add('1.2.3', '123', {'name': 'foo'})
+        vt_cache.clear()
+
+        self.assertEqual(len(vt_cache), 0)
+
+    def test_shared_between_threads(self):
+        vt_cache = VtCache(maxsize=10)
+        errors = []
+
+        def use_cache(feed_version):
+            try:
+                for i in range(2000):
+                    vt_id = str(i % 20)
+                    vt_cache.add(vt_id, feed_version, {'name': vt_id})
+                    vt_cache.get(vt_id, feed_version)
+                    if i % 100 == 0:
+                        vt_cache.clear()
+            except Exception as e:  # pylint: disable=broad-except
+                errors.append(e)
+
+        threads = [Thread(target=use_cache, args=('123',)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(vt_cache), 10)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-2021 Greenbone Networks GmbH
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import shutil
+import tempfile
+
+from pathlib import Path
+from unittest import TestCase
+
+from ospd_openvas.vtstore import VtStore
+
+
+class VtStoreTestCase(TestCase):
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.path = self.temp_dir / 'vts.store'
+
+    def tearDown(self):
+        shutil.rmtree(str(self.temp_dir))
+
+    def test_build_open(self):
+        vts = [
+            ('1.2.3.1', (['a.nasl', 'foo'], ['1|||pref|||entry|||'])),
+            ('1.2.3.2', None),
+            ('1.2.3.3', (['b.nasl', 'bär'], None)),
+        ]
+
+        self.assertTrue(VtStore.build(self.path, '202101010000', vts))
+
+        store = VtStore.open(self.path)
+        self.addCleanup(store.close)
+
+        self.assertEqual(store.feed_version, '202101010000')
+        self.assertEqual(len(store), 2)
+        self.assertIn('1.2.3.1', store)
+        self.assertNotIn('1.2.3.2', store)
+        self.assertEqual(
+            store.get('1.2.3.1'), (['a.nasl', 'foo'], ['1|||pref|||entry|||'])
+        )
+        self.assertEqual(store.get('1.2.3.3'), (['b.nasl', 'bär'], None))
+        self.assertIsNone(store.get('1.2.3.2'))
+
+        self.assertEqual(
+            sorted(p.name for p in self.temp_dir.iterdir()), ['vts.store']
+        )
+
+    def test_build_replace(self):
+        VtStore.build(self.path, '202101010000', [('1.2.3.1', (['a'], None))])
+        old_store = VtStore.open(self.path)
+        self.addCleanup(old_store.close)
+
+        VtStore.build(self.path, '202101020000', [('1.2.3.2', (['b'], None))])
+        store = VtStore.open(self.path)
+        self.addCleanup(store.close)
+
+        self.assertEqual(store.feed_version, '202101020000')
+        self.assertIsNone(store.get('1.2.3.1'))
+
+        # The previous store can still be read
+        self.assertEqual(old_store.get('1.2.3.1'), (['a'], None))
+
+    def test_build_records(self):
+        records = [('1.2.3.1', b'<vt id="1.2.3.1"/>')]
+
+        self.assertTrue(
+            VtStore.build_records(self.path, '202101010000', records)
+        )
+
+        store = VtStore.open(self.path)
+        self.addCleanup(store.close)
+
+        self.assertEqual(store.get_record('1.2.3.1'), b'<vt id="1.2.3.1"/>')
+        self.assertIsNone(store.get_record('1.2.3.2'))
+
+    def test_get_closed(self):
+        VtStore.build(self.path, '202101010000', [('1.2.3.1', (['a'], None))])
+        store = VtStore.open(self.path)
+        store.close()
+
+        self.assertIsNone(store.get('1.2.3.1'))
+
+    def test_build_error(self):
+        path = self.temp_dir / 'foo' / 'vts.store'
+
+        self.assertFalse(VtStore.build(path, '202101010000', []))
+
+    def test_open_no_file(self):
+        self.assertIsNone(VtStore.open(self.path))
+
+    def test_open_empty_file(self):
+        self.path.write_bytes(b'')
+
+        self.assertIsNone(VtStore.open(self.path))
+
+    def test_open_invalid_file(self):
+        self.path.write_bytes(b'foo bar baz')
+
+        self.assertIsNone(VtStore.open(self.path))